@@ -0,0 +1,105 @@
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.db import models
+from app.schemas import analytics as analytics_schema
+from app.auth import get_current_admin, get_current_teacher
+from app.api.v1 import deps
+from app.services.rollup_service import rollup_engine, GRANULARITIES
+from app.services.math_service import adaptive_engine
+from app.services.teacher_dashboard import class_mastery_dashboard
+from app.services.classroom_feed import classroom_feed
+from app.services.review_scheduler import review_scheduler
+
+router = APIRouter()
+
+def _since(granularity: str, days: int) -> int:
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown granularity: {granularity}")
+    return int(time.time()) - days * GRANULARITIES["day"]
+
+@router.get("/analytics/classes/{classroom}/topics", response_model=list[analytics_schema.TopicBucket])
+def class_topic_accuracy(
+    classroom: str,
+    granularity: str = "day",
+    days: int = 7,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_teacher)
+):
+    """Точність класу по темах у часі (з погодинних/щоденних агрегатів)"""
+    return rollup_engine.class_topic_summary(db, classroom, granularity, _since(granularity, days))
+
+@router.get("/analytics/classes/{classroom}/misconceptions", response_model=analytics_schema.MisconceptionSummary)
+def class_misconceptions(
+    classroom: str,
+    granularity: str = "day",
+    days: int = 30,
+    limit: int = 5,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_teacher)
+):
+    """Найчастіші заблудження класу та їх динаміка"""
+    return rollup_engine.class_misconception_summary(
+        db, classroom, granularity, _since(granularity, days), limit
+    )
+
+@router.get("/analytics/classes/{classroom}/mastery", response_model=analytics_schema.MasteryDashboard)
+def class_mastery(
+    classroom: str,
+    bins: int = Query(10, ge=1, le=100),
+    top: int = Query(5, ge=1, le=50),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_teacher)
+):
+    """Розподіл алгебраїчної майстерності класу (гістограми, рівні, заблудження, готовність)"""
+    students = (
+        db.query(models.User.id, models.User.username)
+        .filter(models.User.classroom == classroom)
+        .all()
+    )
+    return class_mastery_dashboard(adaptive_engine, students, bins=bins, top_n=top)
+
+@router.post("/analytics/rollups/rebuild")
+def rebuild_rollups(
+    days: int | None = Query(None, ge=1),
+    current_user: models.User = Depends(get_current_admin)
+):
+    """Ідемпотентно перераховує агрегати з журналу відповідей (лише адміністратор - перебирає весь журнал)"""
+    since = int(time.time()) - days * GRANULARITIES["day"] if days else None
+    rollup_engine.rebuild(since=since)
+    return {"status": "ok", "since": since}
+
+@router.get("/analytics/classes/{classroom}/live")
+def class_live_feed(
+    classroom: str,
+    request: Request,
+    current_user: models.User = Depends(get_current_teacher)
+):
+    """Жива стрічка класу (SSE): знімок учнів, далі об'єднані оновлення раз на секунду"""
+    return StreamingResponse(
+        classroom_feed.stream(classroom, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/analytics/reviews/due", response_model=list[analytics_schema.DueStudent])
+def due_reviews(
+    limit: int = 100,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_teacher)
+):
+    """Учні, яким уже час повторити помилки, від найпрострочених (з черги, без перебору всіх)"""
+    due = review_scheduler.due_players(limit=min(max(limit, 1), 1000))
+    if not due:
+        return []
+    users = {
+        user.id: user
+        for user in db.query(models.User).filter(models.User.id.in_([player_id for player_id, _ in due]))
+    }
+    return [
+        {"player_id": player_id, "username": users[player_id].username,
+         "classroom": users[player_id].classroom, "due_at": due_at}
+        for player_id, due_at in due
+        if player_id in users
+    ]
@@ -1,296 +1,257 @@
-from fastapi import APIRouter, Depends, HTTPException
+import math
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy.sql.expression import func
+from sqlalchemy.orm.exc import StaleDataError
 from app.db import models
 from app.schemas import battle as battle_schema
-from app.services import math_service
-from app.auth import get_current_user
+from app.services import battle_service, offline_service
+from app.auth import decode_token_username, get_current_user, get_token_username, load_user
 from app.api.v1 import deps
-from app.services.math_service import generate_special_encounter
+from app.core.negotiation import NegotiatedRoute
+from app.core.fields import FieldSelection, field_selector
+from app.core.idempotency import answer_idempotency, MAX_KEY_LENGTH
+from app.core.ratelimit import (
+    answer_limiter, enforce_rate_limit, generation_limiter, rate_limit, write_gate, write_limiter, write_slot
+)
+from app.core.responses import dumps
+from app.services.hint_service import CachedHint, hint_catalog
 
-router = APIRouter()
+router = APIRouter(route_class=NegotiatedRoute)
 
-@router.get("/battle/start", response_model=battle_schema.BattleState)
-def start_battle(db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
+HINT_MAX_AGE = 86400  # Підказки статичні до перезапуску сервера
+
+@router.get("/battle/start", response_model=battle_schema.BattleState, dependencies=[Depends(rate_limit(generation_limiter))])
+def start_battle(
+    difficulty: float | None = None,
+    selection: FieldSelection = Depends(field_selector(battle_schema.BATTLE_STATE_PROFILES, default="lean")),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     """Розпочинає бій з випадковим ворогом з підтримкою спеціальних зустрічей"""
     
-    # Отримуємо випадкового ворога
-    enemy = db.query(models.Enemy).order_by(func.random()).first()
-    if not enemy:
-        raise HTTPException(status_code=404, detail="No enemies found in database")
-
-    # Отримуємо або створюємо статистики гравця
-    player_stats = db.query(models.PlayerStats).filter(models.PlayerStats.owner_id == current_user.id).first()
-    if not player_stats:
-        player_stats = models.PlayerStats(owner_id=current_user.id)
-        db.add(player_stats)
-        db.commit()
-        db.refresh(player_stats)
+    try:
+        enemy, player_stats, problem = battle_service.start_encounter(db, current_user.id, difficulty)
+    except battle_service.BattleNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
 
-    # Перевіряємо, чи це спеціальний ворог
-    if enemy.name == "Geometric Gargoyle" or "geometric" in enemy.name.lower():
-        problem, encounter_data = generate_special_encounter(enemy.name, player_stats.level)
-        
-        # Оновлюємо дані ворога з encounter_data якщо потрібно
-        enemy.description = encounter_data.get("description", enemy.name)
-        
-    else:
-        # Генеруємо звичайну задачу
-        problem = math_service.generate_problem(
-            topic=enemy.math_topic, 
-            level=player_stats.level,
-            player_id=current_user.id
-        )
-
-    return battle_schema.BattleState(
+    return selection.render(battle_schema.BattleState(
         player_stats=player_stats,
         enemy=enemy,
         enemy_current_hp=enemy.max_hp,
         problem=problem
-    )
+    ))
 
 
 @router.post("/battle/answer", response_model=battle_schema.AnswerResult)
-def submit_answer(payload: battle_schema.AnswerPayload, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    """Обробляє відповідь гравця з концептуальним фідбеком"""
-    
+def submit_answer(
+    payload: battle_schema.AnswerPayload,
+    selection: FieldSelection = Depends(field_selector(battle_schema.ANSWER_RESULT_PROFILES, default="lean")),
+    idempotency_key: str | None = Header(None, max_length=MAX_KEY_LENGTH),
+    username: str = Depends(get_token_username),
+    db: Session = Depends(deps.get_db)
+):
+    """
+    Обробляє відповідь гравця з концептуальним фідбеком.
+    Повтор з тим самим Idempotency-Key отримує збережений результат
+    без звернень до бази та движків, не витрачаючи ліміт частоти і слот запису;
+    вибірка полів застосовується до нього заново.
+    """
+
+    def process():
+        enforce_rate_limit(answer_limiter, username)
+        with write_slot():
+            return _process_answer(payload, db, load_user(db, username))
+
+    if idempotency_key is None:
+        result = process()
+    else:
+        result = answer_idempotency.execute((username, idempotency_key), process)
+    return selection.render(result)
+
+def _process_answer(payload: battle_schema.AnswerPayload, db: Session,
+                    current_user: models.User) -> battle_schema.AnswerResult:
     enemy = db.query(models.Enemy).filter(models.Enemy.id == payload.enemy_id).first()
     player_stats = db.query(models.PlayerStats).filter(models.PlayerStats.owner_id == current_user.id).first()
 
     if not enemy or not player_stats:
         raise HTTPException(status_code=404, detail="Player or Enemy not found")
 
-    problem = payload.problem
-    is_correct = False
-    problem_data = problem.data or {}
-    problem_type = problem_data.get("type") or enemy.math_topic
+    return battle_service.resolve_answer(db, current_user.id, enemy, player_stats, payload)
 
-    # Визначаємо правильність відповіді
-    if problem_type == "progressive_equation" and payload.operation:
-        # Нова прогресивна алгебра
-        from app.services.math_service import adaptive_engine
-        
-        response_analysis = adaptive_engine.process_student_response(
-            current_user.id,
-            problem_data,
-            payload.operation
+# Пакет офлайн-задач коштує як кілька генерацій - займає все відро одразу
+@router.get(
+    "/battle/offline-pack",
+    response_model=battle_schema.OfflinePack,
+    dependencies=[Depends(rate_limit(generation_limiter, cost=generation_limiter.burst))]
+)
+def get_offline_pack(
+    size: int = Query(50, ge=1, le=offline_service.MAX_PACK_SIZE),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Підписаний пакет задач для гри без мережі"""
+    try:
+        return offline_service.build_pack(db, current_user.id, size)
+    except battle_service.BattleNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+@router.post(
+    "/battle/offline-sync",
+    response_model=battle_schema.OfflineSyncResult,
+    dependencies=[Depends(write_gate())]
+)
+def sync_offline_answers(
+    payload: battle_schema.OfflineSync,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Застосовує відповіді, дані без мережі, одним запитом і однією транзакцією.
+    Ліміт частоти списується за кожну застосовану відповідь, а не за запит.
+    """
+    try:
+        return offline_service.sync_pack(db, current_user.id, payload)
+    except offline_service.OfflineRateLimited as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
         )
-        
-        is_correct = response_analysis["is_correct"]
-        
-        # Оновлюємо problem_data для наступного кроку
-        if "next_step" in response_analysis and response_analysis["next_step"] is not None:
-            problem_data["current_step"] = response_analysis["next_step"]
-            new_problem_obj = problem  # Оновлюємо існуючу задачу
-            new_problem_obj.data = problem_data
-        elif response_analysis.get("is_equation_solved", False):
-            # Генеруємо нову задачу після завершення поточної
-            new_problem_obj = math_service.generate_problem(
-                topic=enemy.math_topic, 
-                level=player_stats.level,
-                player_id=current_user.id
-            )
-        else:
-            new_problem_obj = problem  # Повторюємо той самий крок
-            new_problem_obj.data = problem_data
-            
-        # Використовуємо детальний фідбек з адаптивної системи
-        feedback_message = response_analysis.get("feedback", "")
-        concept_reinforcement = response_analysis.get("mastery_update", {})
-        mistake_analysis = response_analysis.get("error_analysis", {}).get("pattern", "")
-        encouragement = response_analysis.get("encouragement", "")
-        
-    elif problem_type == "equation" and payload.operation:
-        # Стара система алгебри (fallback)
-        steps = problem_data.get("solution_steps", [])
-        index = problem_data.get("current_step_index", 0)
-        if index < len(steps) and payload.operation.strip() == steps[index].get("operation", "").strip():
-            is_correct = True
-    elif payload.answer is not None and problem.answer is not None:
-        if payload.answer == problem.answer:
-            is_correct = True
+    except offline_service.OfflinePackExpired as exc:
+        raise HTTPException(status_code=410, detail=str(exc))
+    except offline_service.OfflinePackError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except battle_service.BattleNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
 
-    # Генеруємо концептуальний фідбек
-    feedback_message = ""
-    concept_reinforcement = ""
-    mistake_analysis = ""
-    encouragement = ""
+@router.websocket("/battle/ws")
+async def battle_socket(websocket: WebSocket, token: str = Query(...), difficulty: float | None = None):
+    """
+    Бій через одне з'єднання: автентифікація один раз, далі короткі кадри.
+    Клієнт: {"type": "answer", "id", "answer" | "operation", "response_time_ms"} або {"type": "start", "id", "difficulty"}.
+    Сервер: {"type": "state" | "result" | "error", "id", ...}.
+    """
+    try:
+        username = decode_token_username(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
-    xp_gained = 0
-    damage_dealt = 0
-    new_problem_obj = problem
+    await websocket.accept()
+    try:
+        battle = await run_in_threadpool(battle_service.BattleSession.open, username)
+    except battle_service.BattleNotFound:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
-    if is_correct:
-        # Розрахунок шкоди з урахуванням vulnerability/resistance
-        base_damage = 15 + player_stats.math_power
-        if enemy.vulnerability and enemy.vulnerability == problem_type:
-            damage_dealt = base_damage * 2
-            feedback_message = f"Критичний удар! Ворог слабкий до {problem_type}!"
-        elif enemy.resistance and enemy.resistance == problem_type:
-            damage_dealt = base_damage // 2
-            feedback_message = f"Ворог стійкий до {problem_type}. Спробуйте інший тип задач."
-        else:
-            damage_dealt = base_damage
-            feedback_message = f"Влучний удар! Завдано {damage_dealt} шкоди."
+    state_fields = battle_schema.BATTLE_STATE_PROFILES["lean"]
+    result_fields = battle_schema.ANSWER_RESULT_PROFILES["lean"]
 
-        # Нараховуємо досвід
-        xp_gained = 10
-        player_stats.xp += xp_gained
+    async def send(message: dict):
+        await websocket.send_text(dumps(message).decode("utf-8"))
 
-        # Перевірка підвищення рівня
-        xp_for_next_level = 100 * player_stats.level
-        if player_stats.xp >= xp_for_next_level:
-            player_stats.level += 1
-            player_stats.max_hp += 10
-            player_stats.hp = player_stats.max_hp
-            player_stats.math_power += 5
-            encouragement = f"🌟 Рівень підвищено до {player_stats.level}! Ваша математична сила зросла!"
+    async def send_error(frame_id, detail: str, **extra):
+        await send({"type": "error", "id": frame_id, "detail": detail, **extra})
 
-        # Концептуальне підкріплення
-        concept_reinforcement = problem_data.get("concept_hint", "")
-        if not concept_reinforcement and problem_data.get("context_explanation"):
-            concept_reinforcement = problem_data["context_explanation"]
+    try:
+        try:
+            state = await run_in_threadpool(battle.start, difficulty)
+            await send({"type": "state", "id": None, "state": state_fields.dump(state)})
+        except battle_service.BattleNotFound as exc:
+            await send_error(None, str(exc))
 
-        # Генеруємо нову задачу
-        if problem_type == "equation":
-            # Логіка для алгебри (залишаємо без змін)
-            problem_data["current_step_index"] += 1
-            parts = problem_data.get("equation_parts", {})
-            if problem_data["current_step_index"] == 1:
-                parts["c"] -= parts["b"]
-                parts["b"] = 0
-            elif problem_data["current_step_index"] == 2:
-                parts["c"] //= parts["a"]
-                parts["a"] = 1
-                parts["x_isolated"] = True
-            
-            if parts.get("x_isolated"):
-                new_problem_obj = math_service.generate_problem(topic=enemy.math_topic, level=player_stats.level)
-            else:
-                new_problem_obj.data = problem_data
-        else:
-            new_problem_obj = math_service.generate_problem(topic=enemy.math_topic, level=player_stats.level)
+        while True:
+            try:
+                frame = await websocket.receive_json()
+            except ValueError:
+                await send_error(None, "Invalid JSON frame")
+                continue
+            if not isinstance(frame, dict):
+                await send_error(None, "Invalid frame")
+                continue
 
-    else:
-        # Неправильна відповідь
-        player_damage = 10
-        player_stats.hp = max(0, player_stats.hp - player_damage)
-        
-        feedback_message = f"Неправильно! Ви отримали {player_damage} шкоди."
-        
-        # Аналіз помилки на основі контексту
-        context = problem_data.get("context", "")
-        if context == "magic_crystals" and problem_type == "addition":
-            mistake_analysis = "Пам'ятайте: кристали можна об'єднувати в будь-якому порядку!"
-        elif context == "army_formation" and problem_type == "multiplication":
-            mistake_analysis = "Спробуйте уявити воїнів у рядах та стовпцях - це допоможе з множенням."
-        elif context == "depleted_mana" and problem_type == "subtraction":
-            mistake_analysis = "Віднімання не комутативне - порядок має значення!"
-        else:
-            mistake_analysis = "Перечитайте задачу уважно та спробуйте ще раз."
-            
-        encouragement = "Не здавайтесь! Кожна помилка - це крок до розуміння."
+            frame_id = frame.get("id")
+            kind = frame.get("type")
+
+            if kind == "answer":
+                try:
+                    answer = battle_schema.AnswerFrame.model_validate(frame)
+                except ValidationError:
+                    await send_error(frame_id, "Invalid answer frame")
+                    continue
+
+                retry_after = answer_limiter.acquire(username)
+                if retry_after:
+                    await send_error(frame_id, "Too many requests", retry_after=retry_after)
+                    continue
+                if not write_limiter.try_acquire():
+                    await send_error(frame_id, "Server is busy, retry shortly", retry_after=1)
+                    continue
+                try:
+                    result = await run_in_threadpool(battle.answer, answer)
+                except StaleDataError:
+                    await send_error(frame_id, "Player stats changed, resend the answer")
+                    continue
+                except battle_service.BattleNotFound as exc:
+                    await send_error(frame_id, str(exc))
+                    continue
+                finally:
+                    write_limiter.release()
+                await send({"type": "result", "id": frame_id, "result": result_fields.dump(result)})
 
-    # Оновлюємо базу даних
-    db.commit()
-    db.refresh(player_stats)
+            elif kind == "start":
+                try:
+                    start = battle_schema.StartFrame.model_validate(frame)
+                except ValidationError:
+                    await send_error(frame_id, "Invalid start frame")
+                    continue
 
-    return battle_schema.AnswerResult(
-        is_correct=is_correct,
-        new_player_stats=player_stats,
-        xp_gained=xp_gained,
-        damage_dealt=damage_dealt,
-        new_problem=new_problem_obj,
-        feedback_message=feedback_message,
-        concept_reinforcement=concept_reinforcement,
-        mistake_analysis=mistake_analysis,
-        encouragement=encouragement
-    )
+                retry_after = generation_limiter.acquire(username)
+                if retry_after:
+                    await send_error(frame_id, "Too many requests", retry_after=retry_after)
+                    continue
+                try:
+                    state = await run_in_threadpool(battle.start, start.difficulty)
+                except battle_service.BattleNotFound as exc:
+                    await send_error(frame_id, str(exc))
+                    continue
+                await send({"type": "state", "id": frame_id, "state": state_fields.dump(state)})
+
+            else:
+                await send_error(frame_id, f"Unknown frame type: {kind}")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await run_in_threadpool(battle.close)
 
 # Додаємо новий endpoint для отримання підказки
+def _hint_response(hint: CachedHint, if_none_match: str | None) -> Response:
+    headers = {"ETag": hint.etag, "Cache-Control": f"private, max-age={HINT_MAX_AGE}"}
+    if if_none_match == hint.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=hint.body, media_type="application/json", headers=headers)
+
 @router.get("/battle/hint/{enemy_id}")
-def get_concept_hint(enemy_id: int, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    """Повертає концептуальну підказку для поточної задачі"""
-    
-    enemy = db.query(models.Enemy).filter(models.Enemy.id == enemy_id).first()
-    if not enemy:
+def get_concept_hint(
+    enemy_id: int,
+    if_none_match: str | None = Header(None),
+    username: str = Depends(get_token_username)
+):
+    """Повертає концептуальну підказку для теми ворога (підготовлену при старті)"""
+    hint = hint_catalog.concept_hint(enemy_id)
+    if hint is None:
         raise HTTPException(status_code=404, detail="Enemy not found")
-    
-    player_stats = db.query(models.PlayerStats).filter(models.PlayerStats.owner_id == current_user.id).first()
-    if not player_stats:
-        raise HTTPException(status_code=404, detail="Player stats not found")
-    
-    # Генеруємо приклад задачі для демонстрації концепції
-    sample_problem = math_service.generate_problem(topic=enemy.math_topic, level=1)  # Простий приклад
-    
-    return {
-        "topic": enemy.math_topic,
-        "concept_explanation": sample_problem.data.get("context_explanation", ""),
-        "example": sample_problem.display_text,
-        "hint": sample_problem.data.get("concept_hint", "")
-    }
+    return _hint_response(hint, if_none_match)
 
 # Додати новий endpoint для геометричних підказок
 @router.get("/battle/geometry-hint/{problem_type}")
 def get_geometry_hint(
     problem_type: str, 
     shape_type: str = "rectangle",
-    db: Session = Depends(deps.get_db), 
-    current_user: models.User = Depends(get_current_user)
+    if_none_match: str | None = Header(None),
+    username: str = Depends(get_token_username)
 ):
     """Повертає інтерактивну підказку для геометричних задач"""
-    
-    hints = {
-        "area": {
-            "rectangle": {
-                "formula": "Площа = довжина × ширина",
-                "visualization_tip": "Уявіть прямокутник поділеним на квадратні одиниці",
-                "common_mistakes": ["Плутати площу з периметром", "Забувати одиниці вимірювання"],
-                "interactive_demo": True
-            },
-            "circle": {
-                "formula": "Площа = π × радіус²",
-                "visualization_tip": "Уявіть коло вписане в квадрат",
-                "common_mistakes": ["Використовувати діаметр замість радіуса", "Забувати возводити в квадрат"],
-                "interactive_demo": True
-            },
-            "triangle": {
-                "formula": "Площа = ½ × основа × висота або формула Герона",
-                "visualization_tip": "Висота завжди перпендикулярна до основи",
-                "common_mistakes": ["Використовувати сторону замість висоти", "Забувати ділити на 2"],
-                "interactive_demo": True
-            }
-        },
-        "perimeter": {
-            "rectangle": {
-                "formula": "Периметр = 2 × (довжина + ширина)",
-                "visualization_tip": "Уявіть, що йдете навколо фігури",
-                "common_mistakes": ["Забувати помножити на 2", "Плутати з площею"]
-            },
-            "triangle": {
-                "formula": "Периметр = сторона₁ + сторона₂ + сторона₃",
-                "visualization_tip": "Просто додайте всі сторони",
-                "common_mistakes": ["Використовувати висоту замість сторони"]
-            }
-        },
-        "pythagorean": {
-            "triangle": {
-                "formula": "a² + b² = c², де c - гіпотенуза",
-                "visualization_tip": "Гіпотенуза - найдовша сторона, протилежна прямому куту",
-                "common_mistakes": ["Плутати катети з гіпотенузою", "Забувати брати квадратний корінь"],
-                "theorem_proof": "Можна довести через площі квадратів на сторонах"
-            }
-        }
-    }
-    
-    hint_data = hints.get(problem_type, {}).get(shape_type, {
-        "formula": "Перевірте правильність типу задачі",
-        "visualization_tip": "Основи геометрії завжди допоможуть"
-    })
-    
-    return {
-        "problem_type": problem_type,
-        "shape_type": shape_type,
-        **hint_data,
-        "interactive_tools": ["ruler", "protractor", "grid"] if hint_data.get("interactive_demo") else []
-    }
\ No newline at end of file
+    return _hint_response(hint_catalog.geometry_hint(problem_type, shape_type), if_none_match)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from app.db import models
+from app.auth import get_current_teacher, get_current_user, get_token_username
+from app.core.ratelimit import answer_limiter, rate_limit
+from app.schemas import daily as daily_schema
+from app.services.daily_challenge import daily_challenge
+
+router = APIRouter()
+
+@router.get("/daily")
+def get_daily_challenge(
+    if_none_match: str | None = Header(None),
+    username: str = Depends(get_token_username)
+):
+    """Задачі дня без відповідей - готові байти, однакові для всіх"""
+    challenge = daily_challenge.current()
+    headers = {"ETag": challenge.etag, "Cache-Control": f"private, max-age={challenge.seconds_left()}"}
+    if if_none_match == challenge.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=challenge.body, media_type="application/json", headers=headers)
+
+@router.post("/daily/submit", response_model=daily_schema.DailyResult,
+             dependencies=[Depends(rate_limit(answer_limiter))])
+def submit_daily_challenge(
+    payload: daily_schema.DailySubmission,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Одна спроба на день; результат рахується в пам'яті, запис у базу - пакетом у фоні"""
+    try:
+        return daily_challenge.submit(current_user.id, payload.day, payload.answers)
+    except LookupError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/daily/stats", response_model=daily_schema.DailyStats)
+def daily_challenge_stats(current_user: models.User = Depends(get_current_teacher)):
+    """Агрегати дня з пам'яті"""
+    return daily_challenge.stats()
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from app.db import models
+from app.auth import get_current_admin
+from app.core.negotiation import wants_gzip
+from app.services import export_service
+
+router = APIRouter()
+
+@router.get("/export/{dataset}")
+def export_dataset(
+    dataset: str,
+    format: str = "ndjson",
+    gzip: bool = False,
+    accept_encoding: str | None = Header(None),
+    current_user: models.User = Depends(get_current_admin)
+):
+    """
+    Потоковий експорт users / stats / mastery / answers у NDJSON або CSV.
+    gzip=true: Content-Encoding: gzip, якщо клієнт його приймає, інакше файл .gz
+    """
+    if dataset not in export_service.DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    if format not in export_service.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+    filename = f"{dataset}.{format}"
+    media_type = export_service.FORMATS[format]
+    headers = {"Vary": "Accept-Encoding"}
+    if gzip and wants_gzip(accept_encoding or ""):
+        headers["Content-Encoding"] = "gzip"
+    elif gzip:
+        # Клієнт не розпакує потік сам - віддаємо стиснений файл як є
+        filename += ".gz"
+        media_type = "application/gzip"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    return StreamingResponse(
+        export_service.stream_export(dataset, format, gzip),
+        media_type=media_type,
+        headers=headers
+    )
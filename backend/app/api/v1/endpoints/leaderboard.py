@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.auth import get_token_username, load_user
+from app.api.v1 import deps
+from app.core.negotiation import NegotiatedRoute
+from app.schemas import leaderboard as leaderboard_schema
+from app.services.leaderboard import leaderboards
+
+router = APIRouter(route_class=NegotiatedRoute)
+
+@router.get("/leaderboard", response_model=leaderboard_schema.Leaderboard)
+def global_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    username: str = Depends(get_token_username)
+):
+    """Загальна таблиця лідерів і місце гравця (з пам'яті, без бази)"""
+    return leaderboards.board(None, limit, username)
+
+@router.get("/leaderboard/class", response_model=leaderboard_schema.Leaderboard)
+def class_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    username: str = Depends(get_token_username),
+    db: Session = Depends(deps.get_db)
+):
+    """Таблиця лідерів класу гравця"""
+    classroom = leaderboards.classroom_of(username)
+    if classroom is None:
+        # Гравець ще не грав - клас беремо з профілю
+        classroom = load_user(db, username).classroom
+    if not classroom:
+        raise HTTPException(status_code=404, detail="Player is not in a classroom")
+    return leaderboards.board(classroom, limit, username)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+from app.db import models
+from app.auth import get_current_admin
+from app.core.idempotency import answer_idempotency
+from app.core.ratelimit import answer_limiter, generation_limiter, offline_answer_limiter, write_limiter
+from app.core.singleflight import single_flight_stats
+from app.services.raid_service import raid_hub
+
+router = APIRouter()
+
+@router.get("/metrics/coalescing")
+def coalescing_metrics(current_user: models.User = Depends(get_current_admin)):
+    """Лічильники об'єднання запитів: single-flight завантажувачі та ключі ідемпотентності"""
+    return {
+        "single_flight": single_flight_stats(),
+        "idempotency": answer_idempotency.stats(),
+    }
+
+@router.get("/metrics/limits")
+def limit_metrics(current_user: models.User = Depends(get_current_admin)):
+    """Лічильники обмеження частоти та скидання навантаження"""
+    return {
+        "answers": answer_limiter.stats(),
+        "offline_answers": offline_answer_limiter.stats(),
+        "generation": generation_limiter.stats(),
+        "writes": write_limiter.stats(),
+    }
+
+@router.get("/metrics/raids")
+def raid_metrics(current_user: models.User = Depends(get_current_admin)):
+    """Лічильники рейдів: удари, контрольні точки, перемоги"""
+    return raid_hub.stats()
@@ -1,21 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.orm import Session
 from app.db import models
 from app.schemas import battle as battle_schema # Ми можемо перевикористати схему PlayerStats
-from app.auth import get_current_user
+from app.auth import get_current_user, get_token_username, load_user
 from app.api.v1 import deps
+from app.core.negotiation import NegotiatedRoute
+from app.core.ratelimit import write_gate
+from app.core.responses import FastJSONResponse
+from app.core.singleflight import single_flight
+from app.services.achievements import achievement_engine
+from app.services.player_cache import player_stats_cache, stats_etag
+from app.services.review_scheduler import review_scheduler
 from app.schemas import user as user_schema
+from app.schemas import analytics as analytics_schema
 
-router = APIRouter()
+router = APIRouter(route_class=NegotiatedRoute)
 
-@router.get("/player/me", response_model=battle_schema.PlayerStats)
-def read_player_me(
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(get_current_user)
-):
-    """
-    Отримати статистику для поточного авторизованого гравця.
-    """
+def _get_or_create_stats(db: Session, current_user: models.User) -> models.PlayerStats:
     player_stats = (
         db.query(models.PlayerStats)
         .filter(models.PlayerStats.owner_id == current_user.id)
@@ -29,33 +31,69 @@ def read_player_me(
         db.add(player_stats)
         db.commit()
         db.refresh(player_stats)
-
     return player_stats
-@router.post("/player/heal", response_model=battle_schema.PlayerStats)
+
+def _dump_stats(player_stats: models.PlayerStats) -> dict:
+    return battle_schema.PlayerStats.model_validate(player_stats).model_dump()
+
+def _stats_response(content: dict, etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+@single_flight("player_me", key=lambda db, username: username)
+def _load_player_me(db: Session, username: str) -> tuple[str, dict]:
+    """Одне читання статистики на всі одночасні запити гравця"""
+    player_stats = _get_or_create_stats(db, load_user(db, username))
+    return player_stats_cache.put(username, player_stats), _dump_stats(player_stats)
+
+@router.get("/player/me", response_model=battle_schema.PlayerStats)
+def read_player_me(
+    if_none_match: str | None = Header(None),
+    username: str = Depends(get_token_username),
+    db: Session = Depends(deps.get_db)
+):
+    """
+    Отримати статистику для поточного авторизованого гравця.
+    Якщо If-None-Match збігається з ETag відомої версії - 304 без звернення до бази.
+    """
+    cached_etag = player_stats_cache.current_etag(username)
+    if cached_etag is not None and if_none_match == cached_etag:
+        return Response(status_code=304, headers={"ETag": cached_etag, "Cache-Control": "private, no-cache"})
+
+    etag, content = _load_player_me(db, username)
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return _stats_response(content, etag)
+
+@router.post("/player/heal", response_model=battle_schema.PlayerStats, dependencies=[Depends(write_gate())])
 def heal_player(
+    if_match: str | None = Header(None),
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """
     Повністю відновлює здоров'я поточного гравця.
     Якщо статистики не існує - створює її.
+    З If-Match зміна застосовується лише до очікуваної версії статистики.
     """
-    player_stats = (
-        db.query(models.PlayerStats)
-        .filter(models.PlayerStats.owner_id == current_user.id)
-        .first()
-    )
+    player_stats = _get_or_create_stats(db, current_user)
 
-    # START: ВИПРАВЛЕННЯ
-    # Якщо статистики не існує - створюємо її, замість того щоб повертати помилку.
-    if not player_stats:
-        player_stats = models.PlayerStats(owner_id=current_user.id)
-        db.add(player_stats)
-        db.commit()
-        db.refresh(player_stats)
-    # END: ВИПРАВЛЕННЯ
+    if if_match is not None and if_match != stats_etag(player_stats.id, player_stats.version):
+        raise HTTPException(status_code=412, detail="Player stats have changed")
 
     player_stats.hp = player_stats.max_hp  # Встановлюємо HP на максимум
     db.commit()
     db.refresh(player_stats)
-    return player_stats
\ No newline at end of file
+    return _stats_response(_dump_stats(player_stats), player_stats_cache.put(current_user.username, player_stats))
+
+@router.get("/player/achievements", response_model=list[battle_schema.AchievementStatus])
+def player_achievements(current_user: models.User = Depends(get_current_user)):
+    """Усі досягнення з позначкою, які вже відкриті (з пам'яті рушія)"""
+    return achievement_engine.catalog(current_user.id)
+
+@router.get("/player/reviews/next", response_model=analytics_schema.NextReview | None)
+def next_review(current_user: models.User = Depends(get_current_user)):
+    """Найближче повторення помилок гравця; None - повторювати нічого"""
+    review = review_scheduler.next_review(current_user.id)
+    if review is None:
+        return None
+    return {**review, "is_due": review["due_at"] <= time.time()}
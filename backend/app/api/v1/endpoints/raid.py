@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.db import models
+from app.auth import get_current_teacher, get_current_user
+from app.api.v1 import deps
+from app.core.ratelimit import generation_limiter, rate_limit
+from app.schemas import battle as battle_schema
+from app.schemas import raid as raid_schema
+from app.services import math_service
+from app.services.battle_service import get_or_create_stats
+from app.services.raid_service import LiveRaid, RaidConflict, raid_hub
+
+router = APIRouter()
+
+def _raid_for(raid_id: int, current_user: models.User) -> LiveRaid:
+    raid = raid_hub.get(raid_id)
+    if raid is None:
+        raise HTTPException(status_code=404, detail="Raid not found")
+    if current_user.role == "student" and current_user.classroom != raid.classroom:
+        raise HTTPException(status_code=403, detail="Raid belongs to another classroom")
+    return raid
+
+@router.post("/raids", response_model=raid_schema.RaidState, status_code=201)
+def start_raid(
+    payload: raid_schema.RaidCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_teacher)
+):
+    """Вчитель запускає рейд класу проти одного ворога"""
+    enemy = db.query(models.Enemy).filter(models.Enemy.id == payload.enemy_id).first()
+    if not enemy:
+        raise HTTPException(status_code=404, detail="Enemy not found")
+
+    max_hp = payload.max_hp
+    if max_hp is None:
+        students = db.query(models.User).filter(models.User.classroom == payload.classroom).count()
+        max_hp = enemy.max_hp * max(1, students)
+
+    try:
+        raid = raid_hub.open(db, payload.classroom, enemy, max_hp)
+    except RaidConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return raid_hub.state(raid)
+
+@router.get("/raids/current", response_model=raid_schema.RaidState)
+def current_raid(current_user: models.User = Depends(get_current_user)):
+    """Активний рейд класу гравця"""
+    raid = raid_hub.active_for(current_user.classroom)
+    if raid is None:
+        raise HTTPException(status_code=404, detail="No active raid")
+    return raid_hub.state(raid)
+
+@router.get("/raids/{raid_id}/battle", response_model=battle_schema.BattleState,
+            dependencies=[Depends(rate_limit(generation_limiter))])
+def raid_battle(
+    raid_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Задача проти ворога рейду. Відповіді - звичайним POST /battle/answer
+    з raid_id: шкода йде у спільне HP класу.
+    """
+    raid = _raid_for(raid_id, current_user)
+    if raid.defeated:
+        raise HTTPException(status_code=410, detail="Raid is over")
+
+    player_stats = get_or_create_stats(db, current_user.id)
+    problem = math_service.generate_problem(
+        topic=raid.enemy.math_topic,
+        level=player_stats.level,
+        player_id=current_user.id
+    )
+    return battle_schema.BattleState(
+        player_stats=player_stats,
+        enemy=raid.enemy,
+        enemy_current_hp=raid.hp,
+        problem=problem
+    )
+
+@router.get("/raids/{raid_id}/live")
+def raid_live(
+    raid_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Спільне HP рейду (SSE) з фіксованою частотою; останній кадр - defeated"""
+    raid = _raid_for(raid_id, current_user)
+    return StreamingResponse(
+        raid_hub.stream(raid, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -20,9 +20,27 @@ def create_user(user: user_schema.UserCreate, db: Session = Depends(deps.get_db)
     new_user = models.User(
         email=user.email,
         username=user.username, # Додаємо username
+        classroom=user.classroom,
         hashed_password=hashed_password
     )
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
-    return new_user
\ No newline at end of file
+    return new_user
+
+
+@router.put("/users/{user_id}/role", response_model=user_schema.User)
+def set_user_role(
+    user_id: int,
+    payload: user_schema.RoleUpdate,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(auth.get_current_admin)
+):
+    """Призначає роль (вчитель, адміністратор); першого адміністратора створює manage.py"""
+    db_user = db.get(models.User, user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db_user.role = payload.role
+    db.commit()
+    db.refresh(db_user)
+    return db_user
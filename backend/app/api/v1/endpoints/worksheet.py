@@ -0,0 +1,39 @@
+import random
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.db import models
+from app.auth import get_current_teacher
+from app.services import worksheet_service
+
+router = APIRouter()
+
+@router.get("/worksheets/{topic}")
+def generate_worksheet(
+    topic: str,
+    level: int = 1,
+    count: int = 100,
+    seed: int | None = None,
+    challenge_type: str | None = None,
+    current_user: models.User = Depends(get_current_teacher)
+):
+    """Потоково генерує аркуш унікальних задач (NDJSON) для друку"""
+    if topic not in worksheet_service.TOPICS:
+        raise HTTPException(status_code=404, detail=f"Unknown topic: {topic}")
+    if challenge_type is not None and (
+        topic != "geometry" or challenge_type not in worksheet_service.GEOMETRY_CHALLENGES
+    ):
+        raise HTTPException(status_code=400, detail=f"Unsupported challenge type: {challenge_type}")
+    if not 1 <= count <= worksheet_service.MAX_PROBLEMS:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {worksheet_service.MAX_PROBLEMS}")
+    if level < 1:
+        raise HTTPException(status_code=400, detail="level must be positive")
+
+    # Без seed обираємо власний і повертаємо його, щоб аркуш можна було відтворити
+    if seed is None:
+        seed = random.getrandbits(31)
+
+    return StreamingResponse(
+        worksheet_service.stream_worksheet(topic, level, count, seed, challenge_type),
+        media_type="application/x-ndjson",
+        headers={"X-Worksheet-Seed": str(seed)}
+    )
@@ -32,21 +32,45 @@ from .api.v1 import deps # <-- ПРАВИЛЬНИЙ ІМПОРТ
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(deps.get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def get_token_username(token: str = Depends(oauth2_scheme)) -> str:
+    """Ім'я користувача з JWT без звернення до бази"""
+    return decode_token_username(token)
+
+def decode_token_username(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return username
 
+def load_user(db: Session, username: str) -> models.User:
     user = db.query(models.User).filter(models.User.username == username).first()
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    return user
+
+def get_current_user(username: str = Depends(get_token_username), db: Session = Depends(deps.get_db)):
+    return load_user(db, username)
+
+def get_current_teacher(current_user: models.User = Depends(get_current_user)):
+    """Пропускає лише вчителів та адміністраторів"""
+    if current_user.role not in ("teacher", "admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Teacher access required")
+    return current_user
+
+
+def get_current_admin(current_user: models.User = Depends(get_current_user)):
+    """Пропускає лише адміністраторів"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
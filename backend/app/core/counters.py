@@ -0,0 +1,47 @@
+"""
+Шардовані лічильники для гарячих точок запису з багатьох потоків
+"""
+
+import itertools
+import threading
+from typing import Dict, Hashable, Tuple
+
+class _Shard:
+    __slots__ = ("lock", "values")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values: Dict[Hashable, int] = {}
+
+class ShardedCounter:
+    """
+    Сума по ключах, розкладена на шарди: кожен потік пулу закріплений за
+    своїм шардом, тож одночасні записувачі беруть різні блокування.
+    drain() забирає накопичене з усіх шардів і обнуляє їх.
+    """
+
+    def __init__(self, shards: int = 16):
+        self._shards = [_Shard() for _ in range(shards)]
+        self._local = threading.local()
+        self._next = itertools.count()
+
+    def _shard(self) -> _Shard:
+        index = getattr(self._local, "index", None)
+        if index is None:
+            index = self._local.index = next(self._next) % len(self._shards)
+        return self._shards[index]
+
+    def add(self, key: Hashable, amount: int) -> None:
+        shard = self._shard()
+        with shard.lock:
+            shard.values[key] = shard.values.get(key, 0) + amount
+
+    def drain(self) -> Tuple[int, Dict[Hashable, int]]:
+        """(загальна сума, сума за ключами) з моменту попереднього drain"""
+        merged: Dict[Hashable, int] = {}
+        for shard in self._shards:
+            with shard.lock:
+                values, shard.values = shard.values, {}
+            for key, amount in values.items():
+                merged[key] = merged.get(key, 0) + amount
+        return sum(merged.values()), merged
@@ -0,0 +1,68 @@
+"""
+Вибірка полів відповіді: ?fields=<профіль> або ?fields=шлях.до.поля,інше_поле
+"""
+
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from .responses import FastJSONResponse
+
+def parse_field_paths(fields: str) -> Dict[str, Any]:
+    """'problem.data.num1,enemy_current_hp' -> дерево include для model_dump"""
+    tree: Dict[str, Any] = {}
+    for path in fields.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break  # Предок уже обраний повністю
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return tree
+
+class FieldSelection:
+    """
+    Як серіалізувати модель відповіді. Обрізання відбувається у model_dump,
+    тож непотрібні частини взагалі не будуються.
+    """
+
+    def __init__(self, include: Optional[Dict[str, Any]] = None, exclude: Optional[Dict[str, Any]] = None,
+                 exclude_none: bool = False):
+        self.include = include
+        self.exclude = exclude
+        self.exclude_none = exclude_none
+
+    def dump(self, model: BaseModel) -> Dict[str, Any]:
+        return model.model_dump(include=self.include, exclude=self.exclude, exclude_none=self.exclude_none)
+
+    def render(self, model: BaseModel) -> FastJSONResponse:
+        """
+        Готова відповідь: модель спершу повністю перевіряється (як це зробив би
+        response_model, який готову відповідь уже не бачить), потім обрізається
+        """
+        validated = type(model).model_validate(model.model_dump(round_trip=True))
+        return FastJSONResponse(self.dump(validated))
+
+def field_selector(profiles: Dict[str, FieldSelection], default: str):
+    """
+    Залежність для ендпоінта: профілі моделі відповіді та профіль за замовчуванням.
+    Невідоме значення ?fields= трактується як перелік шляхів полів.
+    """
+    def select_fields(
+        fields: Optional[str] = Query(None, description=f"Профіль ({', '.join(profiles)}) або перелік полів через кому")
+    ) -> FieldSelection:
+        if not fields:
+            return profiles[default]
+        if fields in profiles:
+            return profiles[fields]
+
+        include = parse_field_paths(fields)
+        if not include:
+            raise HTTPException(status_code=400, detail="Invalid fields selection")
+        return FieldSelection(include=include)
+
+    return select_fields
@@ -0,0 +1,96 @@
+"""
+Кеш ключів ідемпотентності: повтори запиту отримують збережену відповідь,
+а одночасні дублікати чекають на одне обчислення
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+MAX_KEY_LENGTH = 200
+
+class _Entry:
+    __slots__ = ("done", "value", "error", "expires_at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.expires_at = float("inf")  # Поки обчислюється - не застаріває
+
+class IdempotencyCache:
+    """
+    Обмежений LRU-кеш з TTL. Перший запит з ключем обчислює результат,
+    дублікати під час обчислення блокуються на його Event, а пізніші
+    повтори до закінчення TTL відповідають зі збереженого значення.
+    Помилки не кешуються: після невдачі ключ можна повторити.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.collapsed = 0
+        self.misses = 0
+
+    def execute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                entry = _Entry()
+                self._entries[key] = entry
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self.misses += 1
+                owner = True
+            else:
+                self._entries.move_to_end(key)
+                if entry.done.is_set():
+                    self.hits += 1
+                else:
+                    self.collapsed += 1
+                owner = False
+
+        if owner:
+            return self._compute(key, entry, compute)
+
+        entry.done.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def _compute(self, key: Hashable, entry: _Entry, compute: Callable[[], Any]) -> Any:
+        try:
+            entry.value = compute()
+        except BaseException as exc:
+            entry.error = exc
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            entry.expires_at = time.monotonic() + self.ttl
+            entry.done.set()
+        return entry.value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "collapsed": self.collapsed,
+                "misses": self.misses,
+            }
+
+# Збережені результати POST /battle/answer: модель AnswerResult, а не готова
+# відповідь - вибірка полів (?fields=) застосовується до кожного повтору окремо
+answer_idempotency = IdempotencyCache()
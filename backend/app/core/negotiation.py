@@ -0,0 +1,92 @@
+"""
+Узгодження формату відповіді: MessagePack за заголовком Accept та gzip за Accept-Encoding
+"""
+
+import gzip
+import json
+from typing import Callable, Dict
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+try:
+    import msgpack
+except ImportError:  # msgpack - необов'язкова залежність
+    msgpack = None
+
+COMPRESSION_THRESHOLD = 1024  # Менші відповіді не варті витрат на стиснення
+COMPRESSION_LEVEL = 6
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+def parse_quality(header: str) -> Dict[str, float]:
+    """'application/msgpack;q=0.9, */*;q=0.1' -> {тип: q}"""
+    qualities = {}
+    for item in header.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        qualities[parts[0].lower()] = q
+    return qualities
+
+def wants_msgpack(accept: str) -> bool:
+    if msgpack is None or not accept:
+        return False
+    qualities = parse_quality(accept)
+    msgpack_q = max((qualities.get(media, 0.0) for media in MSGPACK_TYPES), default=0.0)
+    json_q = max(qualities.get("application/json", 0.0), qualities.get("*/*", 0.0))
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+def wants_gzip(accept_encoding: str) -> bool:
+    if not accept_encoding:
+        return False
+    return parse_quality(accept_encoding).get("gzip", 0.0) > 0
+
+def negotiate(request: Request, response: Response) -> Response:
+    """Перекодовує готову JSON-відповідь відповідно до заголовків запиту"""
+    if response.media_type != "application/json":
+        return response
+
+    body = response.body
+    media_type = response.media_type
+
+    if wants_msgpack(request.headers.get("accept", "")):
+        # FastJSONResponse зберігає вихідні дані; інакше розбираємо вже закодований JSON
+        content = getattr(response, "raw_content", None)
+        if content is None:
+            content = json.loads(body)
+        body = msgpack.packb(content, use_bin_type=True)
+        media_type = MSGPACK_TYPES[0]
+
+    encoding = None
+    if len(body) >= COMPRESSION_THRESHOLD and wants_gzip(request.headers.get("accept-encoding", "")):
+        body = gzip.compress(body, compresslevel=COMPRESSION_LEVEL)
+        encoding = "gzip"
+
+    headers = {
+        key: value for key, value in response.headers.items()
+        if key not in ("content-length", "content-type", "content-encoding")
+    }
+    headers["vary"] = "Accept, Accept-Encoding"
+    if encoding:
+        headers["content-encoding"] = encoding
+
+    return Response(content=body, status_code=response.status_code, headers=headers, media_type=media_type)
+
+class NegotiatedRoute(APIRoute):
+    """Маршрут, відповіді якого узгоджуються за Accept/Accept-Encoding"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            response = await handler(request)
+            return negotiate(request, response)
+
+        return negotiated_handler
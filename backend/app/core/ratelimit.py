@@ -0,0 +1,140 @@
+"""
+Обмеження частоти запитів гравців (token bucket) та скидання навантаження на записі
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Hashable, Tuple
+from fastapi import Depends, HTTPException, status
+from app.auth import get_token_username
+
+class TokenBucketLimiter:
+    """
+    Відро на ключ - лише пара (токени, час останнього звернення) у словнику.
+    Поповнення ліниве: рахується при зверненні, фонових таймерів немає.
+    Повне відро рівнозначне відсутньому, тож такі записи можна викидати.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[Hashable, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: Hashable, cost: float = 1.0) -> float:
+        """0.0 - дозволено; інакше скільки секунд чекати до потрібної кількості токенів"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                if len(self._buckets) > self.max_keys:
+                    self._sweep(now)
+                self.allowed += 1
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            self.rejected += 1
+            return (cost - tokens) / self.rate
+
+    def _sweep(self, now: float) -> None:
+        # Прибираємо відра, які вже поповнилися до краю
+        self._buckets = {
+            key: state for key, state in self._buckets.items()
+            if state[0] + (now - state[1]) * self.rate < self.burst
+        }
+        if len(self._buckets) > self.max_keys:
+            # Усі відра активні - відкидаємо найстаріші записи
+            keys = list(self._buckets)[: len(self._buckets) - self.max_keys // 2]
+            for key in keys:
+                del self._buckets[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"buckets": len(self._buckets), "allowed": self.allowed, "rejected": self.rejected}
+
+class ConcurrencyLimiter:
+    """Глобальна межа одночасних операцій; понад неї запит відхиляється одразу"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.shed = 0
+
+    def try_acquire(self) -> bool:
+        if not self._semaphore.acquire(blocking=False):
+            with self._lock:
+                self.shed += 1
+            return False
+        with self._lock:
+            self.active += 1
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"limit": self.limit, "active": self.active, "shed": self.shed}
+
+# Відповіді в бою: до 10 поспіль, далі 3 на секунду
+answer_limiter = TokenBucketLimiter(rate=3.0, burst=10)
+# Офлайн-відповіді: та сама швидкість, що й у бою, але запас на цілий пакет
+# (вони накопичуються на пристрої і приходять одним запитом). Ключ - id гравця
+offline_answer_limiter = TokenBucketLimiter(rate=3.0, burst=500)
+# Генерація задач та підказок: до 5 поспіль, далі 1 на секунду
+generation_limiter = TokenBucketLimiter(rate=1.0, burst=5)
+# Одночасні записи в базу (SQLite має одного записувача)
+write_limiter = ConcurrencyLimiter(limit=8)
+
+def enforce_rate_limit(limiter: TokenBucketLimiter, key: Hashable, cost: float = 1.0) -> None:
+    """429 з Retry-After, якщо відро порожнє"""
+    retry_after = limiter.acquire(key, cost)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+def rate_limit(limiter: TokenBucketLimiter, cost: float = 1.0):
+    """Залежність: 429 з Retry-After, якщо відро гравця порожнє"""
+    def check_rate(username: str = Depends(get_token_username)):
+        enforce_rate_limit(limiter, username, cost)
+    return check_rate
+
+@contextmanager
+def write_slot(limiter: ConcurrencyLimiter = write_limiter):
+    """Слот запису на час блоку; 503 з Retry-After, якщо всі слоти зайняті"""
+    if not limiter.try_acquire():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        yield
+    finally:
+        limiter.release()
+
+def write_gate(limiter: ConcurrencyLimiter = write_limiter):
+    """Залежність: write_slot на весь запит"""
+    def hold_slot():
+        with write_slot(limiter):
+            yield
+    return hold_slot
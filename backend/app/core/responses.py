@@ -0,0 +1,29 @@
+"""
+Швидка JSON-відповідь: orjson, якщо встановлений, інакше стандартний json
+"""
+
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson - необов'язкова залежність
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Серіалізує вже підготовлені дані (dict/list/примітиви) у байти UTF-8"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    Відповідь для довірених даних: вміст не проходить jsonable_encoder
+    і не перевіряється повторно, лише кодується.
+    """
+
+    def render(self, content: Any) -> bytes:
+        # Зберігаємо дані для узгодження формату (MessagePack) без повторного розбору JSON
+        self.raw_content = content
+        return dumps(content)
@@ -0,0 +1,87 @@
+"""
+Single-flight: одночасні однакові запити поділяють одне виконання завантажувача
+"""
+
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Перший виклик з ключем виконує функцію, решта чекають і отримують
+    той самий результат (або ту саму помилку). Після завершення ключ
+    звільняється - результат не кешується.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executions": self.executions, "shared": self.shared, "in_flight": len(self._calls)}
+
+# Усі групи за назвами (для метрик)
+_groups: Dict[str, SingleFlight] = {}
+
+def single_flight(name: str, key: Callable[..., Hashable]):
+    """
+    Декоратор завантажувача. key отримує ті самі аргументи і повертає ключ
+    запиту, наприклад (гравець, ресурс). Завантажувач має повертати прості
+    дані, а не ORM-об'єкти сесії ведучого запиту.
+    """
+    flight = _groups.setdefault(name, SingleFlight(name))
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return flight.do(key(*args, **kwargs), lambda: fn(*args, **kwargs))
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator
+
+def single_flight_stats() -> Dict[str, Dict[str, int]]:
+    return {name: flight.stats() for name, flight in _groups.items()}
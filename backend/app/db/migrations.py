@@ -0,0 +1,35 @@
+"""
+Доповнення схеми наявної бази. create_all створює лише відсутні таблиці,
+а колонки, додані до вже наявних таблиць, дописуються тут через ALTER TABLE.
+Нова колонка в таблиці, що могла існувати раніше, - новий рядок у ADDED_COLUMNS.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# (таблиця, колонка, DDL колонки); NOT NULL потребує DEFAULT для наявних рядків
+ADDED_COLUMNS = [
+    ("users", "classroom", "VARCHAR"),
+    ("users", "role", "VARCHAR NOT NULL DEFAULT 'student'"),
+    ("player_stats", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("offline_pack_syncs", "answered", "VARCHAR NOT NULL DEFAULT '{}'"),
+]
+
+ADDED_INDEXES = [
+    ("ix_users_classroom", "users", "classroom"),
+]
+
+def upgrade_schema(engine: Engine) -> None:
+    """Додає відсутні колонки та індекси; повторний виклик нічого не змінює"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+                print(f"Adding column {table}.{column}...")
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        for name, table, column in ADDED_INDEXES:
+            if table in tables:
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, Float, String, Boolean, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -11,6 +11,8 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    classroom = Column(String, nullable=True, index=True)  # Код класу
+    role = Column(String, default="student", nullable=False)  # student | teacher | admin
 
     # Зв'язок з характеристиками гравця
     stats = relationship("PlayerStats", back_populates="owner", uselist=False)
@@ -25,10 +27,15 @@ class PlayerStats(Base):
     level = Column(Integer, default=1)
     xp = Column(Integer, default=0)
     math_power = Column(Integer, default=10) # <-- ОСЬ ЦЕЙ ВАЖЛИВИЙ РЯДОК
+    version = Column(Integer, nullable=False, default=1)  # Зростає з кожним UPDATE
 
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="stats")
 
+    # Оптимістична конкурентність: UPDATE ... WHERE version = <прочитана>,
+    # конфліктний запис завершується StaleDataError
+    __mapper_args__ = {"version_id_col": version}
+
 # Нова модель для ворогів
 class Enemy(Base):
     __tablename__ = "enemies"
@@ -41,4 +48,127 @@ class Enemy(Base):
     # START: НОВІ ПОЛЯ
     vulnerability = Column(String, nullable=True) # Вразливість
     resistance = Column(String, nullable=True)  # Опір
-    # END: НОВІ ПОЛЯ
\ No newline at end of file
+    # END: НОВІ ПОЛЯ
+
+# Журнал відповідей гравців (тільки додавання, пишеться пакетами)
+class AnswerEvent(Base):
+    __tablename__ = "answer_events"
+    __table_args__ = (
+        Index("ix_answer_events_player_time", "player_id", "created_at"),
+        Index("ix_answer_events_topic_time", "topic", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(BigInteger, nullable=False)  # Мілісекунди від epoch
+    player_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    enemy_id = Column(Integer, nullable=False)
+    topic = Column(String, nullable=False)
+    level = Column(SmallInteger, nullable=False)
+    problem_id = Column(BigInteger, nullable=True)  # Відбиток задачі (problem_identity)
+    is_correct = Column(Boolean, nullable=False)
+    operation = Column(String, nullable=True)       # Обрана операція (алгебра)
+    misconception = Column(String, nullable=True)   # MisconceptionType.value
+    latency_ms = Column(Integer, nullable=True)     # Час відповіді учня
+
+
+# Погодинні та щоденні агрегати відповідей (гравець × тема)
+class AnswerRollup(Base):
+    __tablename__ = "answer_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "player_id", "topic", name="uq_answer_rollups_key"),
+        Index("ix_answer_rollups_class_bucket", "classroom", "granularity", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String, nullable=False)        # hour | day
+    bucket_start = Column(BigInteger, nullable=False)   # Секунди від epoch
+    player_id = Column(Integer, nullable=False)
+    classroom = Column(String, nullable=True)
+    topic = Column(String, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    correct = Column(Integer, default=0, nullable=False)
+    latency_total_ms = Column(BigInteger, default=0, nullable=False)
+    latency_samples = Column(Integer, default=0, nullable=False)
+
+# Агрегати заблуджень (гравець × тема × MisconceptionType)
+class MisconceptionRollup(Base):
+    __tablename__ = "misconception_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "player_id", "topic", "misconception",
+                         name="uq_misconception_rollups_key"),
+        Index("ix_misconception_rollups_class_bucket", "classroom", "granularity", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String, nullable=False)
+    bucket_start = Column(BigInteger, nullable=False)
+    player_id = Column(Integer, nullable=False)
+    classroom = Column(String, nullable=True)
+    topic = Column(String, nullable=False)
+    misconception = Column(String, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+# Прогрес синхронізації офлайн-пакета: скільки відповідей уже застосовано
+class OfflinePackSync(Base):
+    __tablename__ = "offline_pack_syncs"
+
+    pack_id = Column(String, primary_key=True)
+    player_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    applied = Column(Integer, default=0, nullable=False)
+    answered = Column(String, default="{}", nullable=False)  # JSON: номер задачі -> {"n": зараховані відповіді, "step": крок рівняння}
+    synced_at = Column(BigInteger, nullable=False)  # Мілісекунди від epoch
+
+# Спільний бій класу з великим ворогом; шкода накопичується в пам'яті й періодично зберігається
+class Raid(Base):
+    __tablename__ = "raids"
+
+    id = Column(Integer, primary_key=True)
+    classroom = Column(String, nullable=False, index=True)
+    enemy_id = Column(Integer, ForeignKey("enemies.id"), nullable=False)
+    max_hp = Column(Integer, nullable=False)
+    damage = Column(Integer, default=0, nullable=False)         # Остання контрольна точка
+    status = Column(String, default="active", nullable=False)   # active | defeated
+    started_at = Column(BigInteger, nullable=False)             # Мілісекунди від epoch
+    defeated_at = Column(BigInteger, nullable=True)
+
+# Результати щоденного випробування (пишуться пакетами у фоні)
+class DailyResult(Base):
+    __tablename__ = "daily_results"
+    __table_args__ = (
+        UniqueConstraint("day", "player_id", name="uq_daily_results_day_player"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(String, nullable=False)            # YYYY-MM-DD
+    player_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    score = Column(SmallInteger, nullable=False)
+    correct_mask = Column(String, nullable=False)   # "1" / "0" на кожну задачу по порядку
+    submitted_at = Column(BigInteger, nullable=False)  # Мілісекунди від epoch
+
+# Відкриті досягнення гравців
+class PlayerAchievement(Base):
+    __tablename__ = "player_achievements"
+    __table_args__ = (
+        UniqueConstraint("player_id", "code", name="uq_player_achievements_player_code"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    player_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    code = Column(String, nullable=False)             # Rule.code
+    unlocked_at = Column(BigInteger, nullable=False)  # Мілісекунди від epoch
+
+# Елементи інтервального повторення (гравець × тема × заблудження), SM-2
+class ReviewItem(Base):
+    __tablename__ = "review_items"
+    __table_args__ = (
+        UniqueConstraint("player_id", "topic", "misconception", name="uq_review_items_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    player_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic = Column(String, nullable=False)
+    misconception = Column(String, nullable=False, default="")  # "" - тема загалом
+    easiness = Column(Float, nullable=False, default=2.5)
+    interval = Column(Integer, nullable=False, default=0)       # Секунди
+    repetitions = Column(Integer, nullable=False, default=0)
+    due_at = Column(BigInteger, nullable=False, index=True)     # Секунди від epoch
@@ -0,0 +1,56 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class TopicBucket(BaseModel):
+    bucket_start: int
+    topic: str
+    players: int
+    attempts: int
+    correct: int
+    accuracy: float
+    mean_response_ms: Optional[float] = None
+
+class MisconceptionCount(BaseModel):
+    misconception: str
+    count: int
+
+class MisconceptionBucket(BaseModel):
+    bucket_start: int
+    misconception: str
+    count: int
+
+class MisconceptionSummary(BaseModel):
+    top: list[MisconceptionCount]
+    series: list[MisconceptionBucket]
+
+class MisconceptionRecurrence(BaseModel):
+    misconception: str
+    count: int
+    recurring_students: int
+
+class FlaggedStudent(BaseModel):
+    player_id: int
+    username: str
+
+class MasteryDashboard(BaseModel):
+    students_tracked: int
+    bin_edges: list[float]
+    histograms: dict[str, list[int]]
+    means: dict[str, float]
+    stage_counts: dict[str, int]
+    top_misconceptions: list[MisconceptionRecurrence]
+    ready_for_next_level: list[FlaggedStudent]
+
+class NextReview(BaseModel):
+    topic: str
+    misconception: Optional[str] = None
+    due_at: int  # Секунди від epoch
+    repetitions: int
+    interval: int  # Секунди
+    is_due: bool
+
+class DueStudent(BaseModel):
+    player_id: int
+    username: str
+    classroom: Optional[str] = None
+    due_at: int
@@ -1,7 +1,17 @@
-from pydantic import BaseModel
-from typing import Any, Optional
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Any, Optional
+from app.core.fields import FieldSelection
 from .user import UserBase
 
+# Час відповіді від клієнта (мс): від'ємний відхиляється, надто довгий обрізається -
+# він визначає якість відповіді для інтервального повторення
+MAX_RESPONSE_TIME_MS = 30 * 60 * 1000
+ResponseTimeMs = Annotated[
+    int | None,
+    Field(ge=0),
+    AfterValidator(lambda value: value if value is None else min(value, MAX_RESPONSE_TIME_MS)),
+]
+
 class Problem(BaseModel):
     display_text: str
     data: dict[str, Any]
@@ -15,6 +25,7 @@ class PlayerStats(BaseModel):
     math_power: int
     combo_meter: int = 0
     max_combo_meter: int = 100
+    version: int | None = None
     owner: UserBase
     
     class Config:
@@ -43,6 +54,34 @@ class AnswerPayload(BaseModel):
     problem: Problem
     answer: int | None = None
     operation: str | None = None
+    response_time_ms: ResponseTimeMs = None  # Скільки учень думав над задачею
+    raid_id: int | None = None  # Удар по спільному HP рейду класу
+
+# Кадр відповіді у WebSocket-каналі бою (задача вже на сервері)
+class AnswerFrame(BaseModel):
+    answer: int | None = None
+    operation: str | None = None
+    response_time_ms: ResponseTimeMs = None
+
+# Кадр початку бою у WebSocket-каналі
+class StartFrame(BaseModel):
+    difficulty: float | None = None
+
+# Компактна зміна прогресивного рівняння між кроками
+class ProblemDelta(BaseModel):
+    current_step: int
+    options: list[dict[str, Any]] = []
+    mastery_delta: dict[str, Any] = {}
+
+# Досягнення, відкрите цією відповіддю
+class AchievementUnlock(BaseModel):
+    code: str
+    title: str
+    description: str
+
+class AchievementStatus(AchievementUnlock):
+    unlocked: bool
+    unlocked_at: int | None = None  # Мілісекунди від epoch
 
 # Розширена схема результату для додаткової інформації
 class AnswerResult(BaseModel):
@@ -51,9 +90,72 @@ class AnswerResult(BaseModel):
     xp_gained: int
     damage_dealt: int = 0
     new_problem: Problem | None = None
+    problem_delta: ProblemDelta | None = None  # Замість new_problem для проміжних кроків алгебри
     
     # Нові поля для навчального фідбеку
     feedback_message: Optional[str] = None
     concept_reinforcement: Optional[str] = None
     mistake_analysis: Optional[str] = None
-    encouragement: Optional[str] = None
\ No newline at end of file
+    encouragement: Optional[str] = None
+    achievements_unlocked: list[AchievementUnlock] = []
+
+# Профілі вибірки полів. lean - лише те, що клієнт показує в бою, плюс поля,
+# які сервер читає з надісланої назад задачі при відповіді (операнди, контекст,
+# кроки рівняння з варіантами та їх поясненнями). Решта - серверні метадані:
+# аналіз складності, стадія навчання, правильна операція кроку, тип помилки варіанта
+LEAN_PROBLEM_EXCLUDE = {"data": {
+    "difficulty_factors": True,
+    "theorem_visualization": True,
+    "learning_stage": True,
+    "concept_level": True,
+    "hint": True,  # Геометрія: підказку клієнт бере з /battle/geometry-hint
+    "balance_steps": {"__all__": {
+        "correct_operation": True,
+        "stage_guidance": {"stage"},
+        "options": {"__all__": {"error_type"}},
+    }},
+}}
+
+BATTLE_STATE_PROFILES = {
+    "full": FieldSelection(),
+    "lean": FieldSelection(exclude={"problem": LEAN_PROBLEM_EXCLUDE}),
+}
+
+ANSWER_RESULT_PROFILES = {
+    "full": FieldSelection(),
+    "lean": FieldSelection(exclude={"new_problem": LEAN_PROBLEM_EXCLUDE}, exclude_none=True),
+}
+
+# Офлайн-гра: підписаний пакет задач і пакетна синхронізація відповідей
+class OfflineProblem(BaseModel):
+    index: int
+    enemy_id: int
+    problem: Problem
+    seal: str  # Підписана копія задачі - повертається при синхронізації без змін
+
+class OfflinePack(BaseModel):
+    pack_id: str
+    expires_at: int  # Секунди від epoch
+    problems: list[OfflineProblem]
+
+class OfflineAnswer(BaseModel):
+    seq: int    # Порядковий номер відповіді в пакеті, з 0
+    index: int  # Номер задачі в пакеті
+    answer: int | None = None
+    operation: str | None = None
+    response_time_ms: ResponseTimeMs = None
+    answered_at: int | None = None  # Мілісекунди від epoch на пристрої учня
+
+class OfflineSync(BaseModel):
+    pack_id: str
+    seals: list[str] = Field(max_length=100)      # Печатки задач, на які є відповіді
+    answers: list[OfflineAnswer] = Field(max_length=2000)
+
+class OfflineSyncResult(BaseModel):
+    applied: int
+    skipped: int  # Уже застосовані раніше (повтор синхронізації)
+    correct: int
+    xp_gained: int
+    levels_gained: int
+    new_player_stats: PlayerStats
+    achievements_unlocked: list[AchievementUnlock] = []
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class DailySubmission(BaseModel):
+    day: str  # YYYY-MM-DD з отриманого набору
+    answers: list[Optional[int]] = Field(max_length=200)  # По порядку задач; None - пропущено
+
+class DailyResult(BaseModel):
+    day: str
+    score: int
+    total: int
+    results: list[bool]
+    rank: int  # Місце серед тих, хто вже здав сьогодні (рівний бал - рівне місце)
+    participants: int
+
+class DailyStats(BaseModel):
+    day: str
+    participants: int
+    mean_score: Optional[float] = None
+    histogram: list[int]                      # Кількість учнів з балом 0..N
+    problem_accuracy: list[Optional[float]]   # Частка правильних на кожну задачу
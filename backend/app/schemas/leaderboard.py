@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    username: str
+    xp: int
+    level: int
+
+class Leaderboard(BaseModel):
+    classroom: Optional[str] = None  # None - загальна таблиця
+    total: int
+    entries: list[LeaderboardEntry]
+    me: Optional[LeaderboardEntry] = None
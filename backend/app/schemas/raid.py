@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from .battle import Enemy
+
+class RaidCreate(BaseModel):
+    classroom: str
+    enemy_id: int
+    max_hp: Optional[int] = Field(None, ge=1)  # Типово - HP ворога на кожного учня класу
+
+class RaidState(BaseModel):
+    raid_id: int
+    classroom: str
+    enemy: Enemy
+    max_hp: int
+    hp: int
+    attackers: int
+    status: str
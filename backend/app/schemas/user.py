@@ -1,5 +1,8 @@
+from typing import Literal
 from pydantic import BaseModel, EmailStr
 
+Role = Literal["student", "teacher", "admin"]
+
 # Нова базова схема
 class UserBase(BaseModel):
     username: str
@@ -12,12 +15,19 @@ class UserCreate(BaseModel):
     username: str  # Додаємо username
     email: EmailStr
     password: str
+    classroom: str | None = None  # Код класу від вчителя
 
 # Схема для відображення користувача
 class User(BaseModel):
     id: int
     username: str  # Додаємо username
     email: EmailStr
+    classroom: str | None = None
+    role: Role = "student"
 
     class Config:
-        from_attributes = True # Стара назва orm_mode
\ No newline at end of file
+        from_attributes = True # Стара назва orm_mode
+
+# Зміна ролі адміністратором
+class RoleUpdate(BaseModel):
+    role: Role
\ No newline at end of file
@@ -0,0 +1,275 @@
+"""
+Досягнення: правила, проіндексовані за подією та темою, і лічильники гравців у пам'яті
+"""
+
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import func
+from app.db import models, session
+from app.schemas.battle import AchievementUnlock
+from .rollup_service import _upsert
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ["addition", "subtraction", "multiplication", "geometry", "algebra"]
+TOPIC_NAMES = {
+    "addition": "додавання",
+    "subtraction": "віднімання",
+    "multiplication": "множення",
+    "geometry": "геометрії",
+    "algebra": "алгебри",
+}
+
+# Події, які бачить рушій
+ANSWER = "answer"                  # subject - тема задачі
+ENEMY_DEFEATED = "enemy_defeated"  # subject - ім'я ворога
+LEVEL_UP = "level_up"              # subject - None
+
+class Rule:
+    """
+    Умова "лічильник >= поріг" (або "<=", якщо at_most) на подію event.
+    subject=None - правило спрацьовує для будь-якої теми чи ворога.
+    """
+
+    __slots__ = ("code", "title", "description", "event", "subject", "counter", "threshold", "at_most")
+
+    def __init__(self, code: str, title: str, description: str, event: str, counter: str,
+                 threshold: int, subject: Optional[str] = None, at_most: bool = False):
+        self.code = code
+        self.title = title
+        self.description = description
+        self.event = event
+        self.subject = subject
+        self.counter = counter
+        self.threshold = threshold
+        self.at_most = at_most
+
+    def matches(self, counters: Dict[str, int]) -> bool:
+        value = counters[self.counter]
+        return value <= self.threshold if self.at_most else value >= self.threshold
+
+def default_rules() -> List[Rule]:
+    rules = [
+        Rule("first_hit", "Перший удар", "Перша правильна відповідь", ANSWER, "total_correct", 1),
+        Rule("hundred_hits", "Сотня влучань", "100 правильних відповідей", ANSWER, "total_correct", 100),
+        Rule("first_victory", "Перша перемога", "Переможіть будь-якого ворога", ENEMY_DEFEATED, "victories", 1),
+        Rule("flawless_victory", "Без подряпин", "Переможіть ворога, не отримавши шкоди",
+             ENEMY_DEFEATED, "damage_taken", 0, at_most=True),
+        Rule("gargoyle_flawless", "Камінь не б'є", "Переможіть Geometric Gargoyle без жодної шкоди",
+             ENEMY_DEFEATED, "damage_taken", 0, subject="Geometric Gargoyle", at_most=True),
+    ]
+    for level in (5, 10, 20):
+        rules.append(Rule(f"level_{level}", f"Рівень {level}", f"Досягніть {level} рівня", LEVEL_UP, "level", level))
+    for topic in TOPICS:
+        name = TOPIC_NAMES[topic]
+        for streak in (5, 10, 25):
+            rules.append(Rule(f"streak_{streak}_{topic}", f"Серія {streak}: {name}",
+                              f"{streak} правильних відповідей поспіль з {name}", ANSWER, "streak", streak, topic))
+        for total in (10, 50, 200):
+            rules.append(Rule(f"correct_{total}_{topic}", f"Знавець {name} ({total})",
+                              f"{total} правильних відповідей з {name}", ANSWER, "correct", total, topic))
+    return rules
+
+class _Progress:
+    """Лічильники одного гравця; оновлюються раз на подію, історія не переглядається"""
+
+    __slots__ = ("streaks", "correct", "total_correct", "victories", "encounter")
+
+    def __init__(self):
+        self.streaks: Dict[str, int] = {}
+        self.correct: Dict[str, int] = {}
+        self.total_correct = 0
+        self.victories = 0
+        self.encounter: Optional[list] = None  # [ворог, завдана шкода, отримана шкода]
+
+class _CompiledKey:
+    """
+    Правила однієї пари (подія, тема/ворог). Правила "лічильник >= поріг"
+    відсортовані за порогом окремо для кожного лічильника; правила "<=" -
+    простим списком (їх одиниці).
+    """
+
+    __slots__ = ("chains", "at_most")
+
+    def __init__(self):
+        self.chains: Dict[str, Tuple[List[int], List[Rule]]] = {}
+        self.at_most: List[Rule] = []
+
+    def add(self, rule: Rule) -> None:
+        if rule.at_most:
+            self.at_most.append(rule)
+            return
+        thresholds, rules = self.chains.setdefault(rule.counter, ([], []))
+        position = bisect.bisect_right(thresholds, rule.threshold)
+        thresholds.insert(position, rule.threshold)
+        rules.insert(position, rule)
+
+class AchievementEngine:
+    """
+    Правила компілюються в індекс (подія, тема/ворог) -> пороги за
+    лічильниками, тож подія перевіряється лише проти правил, що можуть
+    спрацювати: бінарний пошук по порогах замість перебору правил.
+    Відкриті досягнення зберігаються в player_achievements; лічильники
+    живуть у пам'яті й відновлюються при старті з агрегатів відповідей
+    (серії починаються з нуля).
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self._lock = threading.Lock()
+        self.rules: Dict[str, Rule] = {}
+        self._index: Dict[Tuple[str, Optional[str]], _CompiledKey] = {}
+        for rule in rules:
+            self.add_rule(rule)
+        self._progress: Dict[int, _Progress] = {}
+        self._unlocked: Dict[int, Dict[str, int]] = {}  # гравець -> код -> час відкриття
+        self._claimed: Dict[int, Set[str]] = {}  # гравець -> коди, що саме записуються в persist
+
+    def add_rule(self, rule: Rule) -> None:
+        self.rules[rule.code] = rule
+        self._index.setdefault((rule.event, rule.subject), _CompiledKey()).add(rule)
+
+    def _state(self, player_id: int) -> _Progress:
+        progress = self._progress.get(player_id)
+        if progress is None:
+            progress = self._progress[player_id] = _Progress()
+        return progress
+
+    def _fire(self, player_id: int, event: str, subject: Optional[str],
+              counters: Dict[str, int], unlocked: List[Rule]) -> None:
+        # Правило стає відкритим лише після запису в persist; до того воно
+        # "зайняте", щоб паралельна відповідь не відкрила його вдруге
+        done = self._unlocked.get(player_id, {})
+        claimed = self._claimed.setdefault(player_id, set())
+        for key in ((event, subject), (event, None)):
+            compiled = self._index.get(key)
+            if compiled is None:
+                continue
+            for counter, (thresholds, rules) in compiled.chains.items():
+                # Відкриваємо всі досягнуті пороги від найвищого; нижчі за вже
+                # відкритий поріг були відкриті разом з ним або раніше
+                position = bisect.bisect_right(thresholds, counters[counter])
+                while position:
+                    position -= 1
+                    rule = rules[position]
+                    if rule.code in done or rule.code in claimed:
+                        break
+                    unlocked.append(rule)
+                    claimed.add(rule.code)
+            for rule in compiled.at_most:
+                if rule.code not in done and rule.code not in claimed and rule.matches(counters):
+                    unlocked.append(rule)
+                    claimed.add(rule.code)
+
+    def battle_started(self, player_id: int, enemy_id: int) -> None:
+        with self._lock:
+            self._state(player_id).encounter = [enemy_id, 0, 0]
+
+    def record_answer(self, player_id: int, topic: str, is_correct: bool, damage_dealt: int,
+                      enemy_id: int, enemy_name: str, enemy_max_hp: int,
+                      level_before: int, level_after: int, in_battle: bool = True) -> List[Rule]:
+        """Оновлює лічильники і повертає щойно відкриті правила (кілька мікросекунд)"""
+        unlocked: List[Rule] = []
+        with self._lock:
+            progress = self._state(player_id)
+            if is_correct:
+                streak = progress.streaks[topic] = progress.streaks.get(topic, 0) + 1
+                correct = progress.correct[topic] = progress.correct.get(topic, 0) + 1
+                progress.total_correct += 1
+                self._fire(player_id, ANSWER, topic, {
+                    "streak": streak, "correct": correct, "total_correct": progress.total_correct,
+                }, unlocked)
+            else:
+                progress.streaks[topic] = 0
+
+            encounter = progress.encounter
+            if in_battle and encounter is not None and encounter[0] == enemy_id:
+                if is_correct:
+                    encounter[1] += damage_dealt
+                else:
+                    encounter[2] += 1
+                if encounter[1] >= enemy_max_hp:
+                    progress.encounter = None
+                    progress.victories += 1
+                    self._fire(player_id, ENEMY_DEFEATED, enemy_name, {
+                        "victories": progress.victories, "damage_taken": encounter[2],
+                    }, unlocked)
+
+            if level_after > level_before:
+                self._fire(player_id, LEVEL_UP, None, {"level": level_after}, unlocked)
+        return unlocked
+
+    def persist(self, player_id: int, rules: List[Rule]) -> List[AchievementUnlock]:
+        """
+        Записує відкриті досягнення (рідкісна подія - окрема коротка транзакція).
+        Якщо запис не вдався, правила звільняються і спрацюють на наступній
+        відповіді; сама відповідь уже зафіксована, тож помилка лише логується.
+        """
+        if not rules:
+            return []
+        now = int(time.time() * 1000)
+        try:
+            with session.engine.begin() as conn:
+                stmt = _upsert(conn, models.PlayerAchievement.__table__)
+                conn.execute(
+                    stmt.on_conflict_do_nothing(index_elements=["player_id", "code"]),
+                    [{"player_id": player_id, "code": rule.code, "unlocked_at": now} for rule in rules]
+                )
+        except Exception:
+            logger.exception("Failed to persist achievements %s of player %s",
+                             [rule.code for rule in rules], player_id)
+            with self._lock:
+                self._claimed.get(player_id, set()).difference_update(rule.code for rule in rules)
+            return []
+
+        with self._lock:
+            done = self._unlocked.setdefault(player_id, {})
+            claimed = self._claimed.get(player_id, set())
+            for rule in rules:
+                done[rule.code] = now
+                claimed.discard(rule.code)
+        return [AchievementUnlock(code=rule.code, title=rule.title, description=rule.description) for rule in rules]
+
+    def catalog(self, player_id: int) -> List[dict]:
+        with self._lock:
+            done = dict(self._unlocked.get(player_id, {}))
+        return [
+            {"code": rule.code, "title": rule.title, "description": rule.description,
+             "unlocked": rule.code in done, "unlocked_at": done.get(rule.code) or None}
+            for rule in self.rules.values()
+        ]
+
+    def load(self) -> None:
+        """Відкриті досягнення та кількість правильних відповідей за темами - з бази"""
+        db = session.SessionLocal()
+        try:
+            unlocked = db.query(models.PlayerAchievement.player_id, models.PlayerAchievement.code,
+                                models.PlayerAchievement.unlocked_at).all()
+            totals = (
+                db.query(models.AnswerRollup.player_id, models.AnswerRollup.topic,
+                         func.sum(models.AnswerRollup.correct))
+                .filter(models.AnswerRollup.granularity == "day")
+                .group_by(models.AnswerRollup.player_id, models.AnswerRollup.topic)
+                .all()
+            )
+        finally:
+            db.close()
+
+        with self._lock:
+            self._progress = {}
+            self._unlocked = {}
+            self._claimed = {}
+            for player_id, code, unlocked_at in unlocked:
+                self._unlocked.setdefault(player_id, {})[code] = unlocked_at
+            for player_id, topic, correct in totals:
+                progress = self._state(player_id)
+                progress.correct[topic] = int(correct or 0)
+                progress.total_correct += int(correct or 0)
+
+# Глобальний рушій досягнень
+achievement_engine = AchievementEngine(default_rules())
+
+def warm_achievements() -> None:
+    achievement_engine.load()
@@ -0,0 +1,172 @@
+"""
+Журнал подій відповідей: кільцевий буфер у пам'яті з пакетним записом у БД
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Optional, List, Dict, Any, Callable
+from app.db import models, session
+
+logger = logging.getLogger(__name__)
+
+MAX_FLUSH_ATTEMPTS = 3  # Після стількох невдалих спроб пакет пишеться в лог і відкидається
+
+class AnswerEventLog:
+    """
+    Приймає події відповідей без звернення до БД.
+    Події накопичуються у кільцевому буфері фіксованого розміру, а фоновий
+    потік записує їх пакетами одним executemany.
+    """
+
+    def __init__(self, capacity: int = 8192, batch_size: int = 256, flush_interval: float = 2.0):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._head = 0    # Індекс найстарішої події
+        self._count = 0   # Кількість подій у буфері
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_listeners: List[Callable] = []
+
+        self._failed_attempts = 0  # Невдалі спроби записати поточний пакет поспіль
+        self._dropped_reported = 0
+
+        self.dropped = 0  # Події, витіснені через переповнення буфера
+
+    def add_flush_listener(self, listener: Callable) -> None:
+        """Реєструє обробник listener(conn, rows), що викликається у транзакції запису пакета"""
+        if listener not in self._flush_listeners:
+            self._flush_listeners.append(listener)
+
+    def record(self, player_id: int, enemy_id: int, topic: str, level: int,
+               is_correct: bool, problem_id: int = None, operation: str = None,
+               misconception: str = None, latency_ms: int = None, created_at: int = None) -> None:
+        """Додає подію у буфер. O(1), без вводу-виводу. created_at - мс від epoch (типово зараз)"""
+        event = {
+            "created_at": created_at or int(time.time() * 1000),
+            "player_id": player_id,
+            "enemy_id": enemy_id,
+            "topic": topic,
+            "level": level,
+            "problem_id": problem_id,
+            "is_correct": bool(is_correct),
+            "operation": operation,
+            "misconception": misconception,
+            "latency_ms": latency_ms,
+        }
+
+        with self._lock:
+            tail = (self._head + self._count) % self.capacity
+            self._slots[tail] = event
+            if self._count == self.capacity:
+                # Буфер повний - витісняємо найстарішу подію
+                self._head = (self._head + 1) % self.capacity
+                self.dropped += 1
+            else:
+                self._count += 1
+            should_flush = self._count >= self.batch_size
+
+        if should_flush:
+            self._wakeup.set()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        """Забирає всі події з буфера"""
+        with self._lock:
+            rows = []
+            for i in range(self._count):
+                idx = (self._head + i) % self.capacity
+                rows.append(self._slots[idx])
+                self._slots[idx] = None
+            self._head = 0
+            self._count = 0
+        return rows
+
+    def _requeue(self, rows: List[Dict[str, Any]]) -> None:
+        """Повертає незаписані події на початок буфера; нові події мають пріоритет перед найстарішими"""
+        with self._lock:
+            room = self.capacity - self._count
+            if len(rows) > room:
+                self.dropped += len(rows) - room
+                rows = rows[len(rows) - room:]
+            for event in reversed(rows):
+                self._head = (self._head - 1) % self.capacity
+                self._slots[self._head] = event
+            self._count += len(rows)
+
+    def flush(self) -> int:
+        """
+        Записує накопичені події одним пакетом. Повертає кількість записаних.
+        Якщо запис не вдався, події повертаються в буфер для наступної спроби,
+        а після MAX_FLUSH_ATTEMPTS невдач пишуться в лог і відкидаються.
+        """
+        rows = self._drain()
+        if not rows:
+            return 0
+
+        try:
+            with session.engine.begin() as conn:
+                conn.execute(models.AnswerEvent.__table__.insert(), rows)
+                for listener in self._flush_listeners:
+                    listener(conn, rows)
+        except Exception:
+            self._failed_attempts += 1
+            if self._failed_attempts < MAX_FLUSH_ATTEMPTS:
+                logger.warning("Answer log flush failed (attempt %d), %d events requeued",
+                               self._failed_attempts, len(rows), exc_info=True)
+                self._requeue(rows)
+            else:
+                self._failed_attempts = 0
+                logger.error("Answer log flush failed %d times, dropping %d events: %s",
+                             MAX_FLUSH_ATTEMPTS, len(rows), json.dumps(rows), exc_info=True)
+            raise
+        self._failed_attempts = 0
+        return len(rows)
+
+    def _report_dropped(self) -> None:
+        dropped = self.dropped
+        if dropped > self._dropped_reported:
+            logger.warning("Answer log buffer overflowed, %d events dropped (%d total)",
+                           dropped - self._dropped_reported, dropped)
+            self._dropped_reported = dropped
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # Уже записано в лог у flush
+            self._report_dropped()
+
+    def start(self):
+        """Запускає фоновий потік запису"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="answer-log-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Зупиняє фоновий потік та дописує залишок буфера"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for _ in range(MAX_FLUSH_ATTEMPTS):
+            try:
+                self.flush()
+                break
+            except Exception:
+                continue
+        self._report_dropped()
+
+# Глобальний екземпляр журналу
+answer_log = AnswerEventLog()
@@ -0,0 +1,379 @@
+"""
+Логіка бою, спільна для REST-ендпоінтів та WebSocket-каналу
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql.expression import func
+from app.db import models, session
+from app.schemas import battle as battle_schema
+from app.schemas.battle import Problem
+from . import math_service
+from .math_service import adaptive_engine, generate_special_encounter
+from .progressive_algebra_engine import StudentMastery
+from .difficulty_index import difficulty_score, difficulty_targets
+from .achievements import achievement_engine
+from .answer_log import answer_log
+from .classroom_feed import classroom_feed
+from .leaderboard import leaderboards
+from .raid_service import raid_hub
+from .review_scheduler import review_scheduler
+from .problem_identity import problem_fingerprint
+
+class BattleNotFound(LookupError):
+    """Немає ворога або статистики гравця"""
+
+def get_or_create_stats(db: Session, player_id: int) -> models.PlayerStats:
+    player_stats = db.query(models.PlayerStats).filter(models.PlayerStats.owner_id == player_id).first()
+    if not player_stats:
+        player_stats = models.PlayerStats(owner_id=player_id)
+        db.add(player_stats)
+        db.commit()
+        db.refresh(player_stats)
+    return player_stats
+
+def start_encounter(db: Session, player_id: int,
+                    difficulty: Optional[float] = None) -> Tuple[models.Enemy, models.PlayerStats, Problem]:
+    """Ворог (для теми, яку час повторити, інакше випадковий), статистика гравця та перша задача бою"""
+    enemy = None
+    review_topic = review_scheduler.due_topic(player_id)
+    if review_topic is not None:
+        enemy = (
+            db.query(models.Enemy)
+            .filter(models.Enemy.math_topic == review_topic)
+            .order_by(func.random())
+            .first()
+        )
+    if enemy is None:
+        # Отримуємо випадкового ворога
+        enemy = db.query(models.Enemy).order_by(func.random()).first()
+    if not enemy:
+        raise BattleNotFound("No enemies found in database")
+
+    # Отримуємо або створюємо статистики гравця
+    player_stats = get_or_create_stats(db, player_id)
+    achievement_engine.battle_started(player_id, enemy.id)
+
+    # Перевіряємо, чи це спеціальний ворог
+    if enemy.name == "Geometric Gargoyle" or "geometric" in enemy.name.lower():
+        problem, encounter_data = generate_special_encounter(
+            enemy.name, player_stats.level, player_id=player_id, difficulty=difficulty
+        )
+        
+        # Оновлюємо дані ворога з encounter_data якщо потрібно
+        enemy.description = encounter_data.get("description", enemy.name)
+        
+    else:
+        # Генеруємо звичайну задачу
+        problem = math_service.generate_problem(
+            topic=enemy.math_topic, 
+            level=player_stats.level,
+            player_id=player_id,
+            difficulty=difficulty
+        )
+
+    return enemy, player_stats, problem
+
+def resolve_answer(db: Session, player_id: int, enemy: models.Enemy, player_stats: models.PlayerStats,
+                   payload: battle_schema.AnswerPayload) -> battle_schema.AnswerResult:
+    """Перевіряє відповідь, оновлює статистику гравця та готує наступну задачу"""
+    outcome, event = apply_answer(player_id, enemy, player_stats, payload)
+    enemy_name, enemy_max_hp = enemy.name, enemy.max_hp  # Після commit атрибути перечитувалися б з бази
+
+    # Оновлюємо базу даних (атрибути перечитуються при доступі, якщо сесія їх скидає після commit)
+    db.commit()
+
+    publish_answer(player_stats, event)
+    outcome["achievements_unlocked"] = track_achievements(
+        event, outcome, enemy_name, enemy_max_hp, player_stats.level
+    )
+    if payload.raid_id is not None and outcome["damage_dealt"]:
+        owner = player_stats.owner
+        raid_hub.hit(payload.raid_id, owner.classroom, event["enemy_id"],
+                     player_id, owner.username, outcome["damage_dealt"])
+    # Статистика - після commit, щоб клієнт отримав нову версію запису
+    return battle_schema.AnswerResult(new_player_stats=player_stats, **outcome)
+
+def apply_answer(player_id: int, enemy: models.Enemy, player_stats: models.PlayerStats,
+                 payload: battle_schema.AnswerPayload, generate_next: bool = True,
+                 mastery: Optional[StudentMastery] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Оцінює відповідь і змінює статистику гравця без commit. Повертає поля
+    AnswerResult (крім статистики) та подію для журналу відповідей, яку
+    слід опублікувати після commit.
+    Задача з payload не змінюється (оцінюється копія), а нова майстерність
+    AdaptiveAlgebraEngine лише кладеться в подію і фіксується в publish_answer:
+    якщо commit не вдасться, повтор відповіді оцінюється з того самого стану.
+    generate_next=False - наступна задача не генерується (пакетне відтворення).
+    mastery - ще не зафіксована майстерність попередньої відповіді того ж пакета.
+    """
+    problem = payload.problem
+    is_correct = False
+    problem_data = copy.deepcopy(problem.data or {})
+    problem_type = problem_data.get("type") or enemy.math_topic
+    progressive = problem_type == "progressive_equation" and bool(payload.operation)
+    answered_level = player_stats.level
+    problem_id = problem_fingerprint(enemy.math_topic, problem_data)
+    misconception = None
+    problem_delta = None
+    new_mastery = None
+
+    feedback_message = ""
+    concept_reinforcement = ""
+    mistake_analysis = ""
+    encouragement = ""
+
+    xp_gained = 0
+    damage_dealt = 0
+    new_problem_obj = problem
+
+    def next_problem() -> Optional[Problem]:
+        if not generate_next:
+            return None
+        return math_service.generate_problem(topic=enemy.math_topic, level=player_stats.level, player_id=player_id)
+
+    # Визначаємо правильність відповіді
+    if progressive:
+        # Нова прогресивна алгебра
+        mastery_before = adaptive_engine.mastery_snapshot(player_id, mastery)
+        response_analysis, new_mastery = adaptive_engine.grade_student_response(
+            player_id,
+            problem_data,
+            payload.operation,
+            mastery
+        )
+        is_correct = bool(response_analysis.get("is_correct"))
+
+        next_step = response_analysis.get("next_step")
+        if next_step is not None:
+            # Наступний або той самий крок: клієнт уже має всю задачу - надсилаємо лише зміну кроку
+            problem_delta = battle_schema.ProblemDelta(
+                current_step=next_step,
+                options=problem_data["balance_steps"][next_step].get("options", []),
+                mastery_delta=adaptive_engine.mastery_delta(player_id, mastery_before, new_mastery)
+            )
+            new_problem_obj = None
+        # Розв'язане рівняння отримує нову задачу нижче, як і решта правильних відповідей
+
+        # Використовуємо детальний фідбек з адаптивної системи
+        error_analysis = response_analysis.get("error_analysis", {})
+        feedback_message = response_analysis.get("feedback", "")
+        mistake_analysis = error_analysis.get("pattern", "")
+        misconception = error_analysis.get("error_type")
+        encouragement = response_analysis.get("encouragement", "")
+
+    elif problem_type == "equation" and payload.operation:
+        # Стара система алгебри (fallback)
+        steps = problem_data.get("solution_steps", [])
+        index = problem_data.get("current_step_index", 0)
+        if index < len(steps) and payload.operation.strip() == steps[index].get("operation", "").strip():
+            is_correct = True
+    elif payload.answer is not None and problem.answer is not None:
+        if payload.answer == problem.answer:
+            is_correct = True
+
+    if is_correct:
+        # Розрахунок шкоди з урахуванням vulnerability/resistance
+        base_damage = 15 + player_stats.math_power
+        if enemy.vulnerability and enemy.vulnerability == problem_type:
+            damage_dealt = base_damage * 2
+            strike_message = f"Критичний удар! Ворог слабкий до {problem_type}!"
+        elif enemy.resistance and enemy.resistance == problem_type:
+            damage_dealt = base_damage // 2
+            strike_message = f"Ворог стійкий до {problem_type}. Спробуйте інший тип задач."
+        else:
+            damage_dealt = base_damage
+            strike_message = f"Влучний удар! Завдано {damage_dealt} шкоди."
+        # Пояснення кроку алгебри лишається першим
+        feedback_message = " ".join(filter(None, (feedback_message, strike_message)))
+
+        # Нараховуємо досвід
+        xp_gained = 10
+        player_stats.xp += xp_gained
+
+        # Перевірка підвищення рівня
+        xp_for_next_level = 100 * player_stats.level
+        if player_stats.xp >= xp_for_next_level:
+            player_stats.level += 1
+            player_stats.max_hp += 10
+            player_stats.hp = player_stats.max_hp
+            player_stats.math_power += 5
+            encouragement = f"🌟 Рівень підвищено до {player_stats.level}! Ваша математична сила зросла!"
+
+        # Концептуальне підкріплення
+        concept_reinforcement = problem_data.get("concept_hint", "")
+        if not concept_reinforcement and problem_data.get("context_explanation"):
+            concept_reinforcement = problem_data["context_explanation"]
+
+        # Генеруємо нову задачу
+        if problem_type == "equation":
+            # Логіка для алгебри (залишаємо без змін)
+            problem_data["current_step_index"] += 1
+            parts = problem_data.get("equation_parts", {})
+            if problem_data["current_step_index"] == 1:
+                parts["c"] -= parts["b"]
+                parts["b"] = 0
+            elif problem_data["current_step_index"] == 2:
+                parts["c"] //= parts["a"]
+                parts["a"] = 1
+                parts["x_isolated"] = True
+            
+            if parts.get("x_isolated"):
+                new_problem_obj = next_problem()
+            else:
+                new_problem_obj = problem.model_copy(update={"data": problem_data})
+        elif problem_delta is None:
+            new_problem_obj = next_problem()
+
+    else:
+        # Неправильна відповідь
+        player_damage = 10
+        player_stats.hp = max(0, player_stats.hp - player_damage)
+        
+        feedback_message = " ".join(filter(None, (
+            feedback_message, f"Неправильно! Ви отримали {player_damage} шкоди."
+        )))
+        
+        # Аналіз помилки на основі контексту (якщо адаптивна система його не дала)
+        context = problem_data.get("context", "")
+        if not mistake_analysis:
+            if context == "magic_crystals" and problem_type == "addition":
+                mistake_analysis = "Пам'ятайте: кристали можна об'єднувати в будь-якому порядку!"
+            elif context == "army_formation" and problem_type == "multiplication":
+                mistake_analysis = "Спробуйте уявити воїнів у рядах та стовпцях - це допоможе з множенням."
+            elif context == "depleted_mana" and problem_type == "subtraction":
+                mistake_analysis = "Віднімання не комутативне - порядок має значення!"
+            else:
+                mistake_analysis = "Перечитайте задачу уважно та спробуйте ще раз."
+            
+        encouragement = encouragement or "Не здавайтесь! Кожна помилка - це крок до розуміння."
+
+    event = {
+        "player_id": player_id,
+        "enemy_id": enemy.id,
+        "topic": enemy.math_topic,
+        "level": answered_level,
+        "is_correct": is_correct,
+        "problem_id": problem_id,
+        "operation": payload.operation,
+        "misconception": misconception,
+        "latency_ms": payload.response_time_ms,
+        "mastery": new_mastery,
+        "difficulty": difficulty_score(problem_data),
+    }
+    outcome = dict(
+        is_correct=is_correct,
+        xp_gained=xp_gained,
+        damage_dealt=damage_dealt,
+        new_problem=new_problem_obj,
+        problem_delta=problem_delta,
+        feedback_message=feedback_message,
+        concept_reinforcement=concept_reinforcement,
+        mistake_analysis=mistake_analysis,
+        encouragement=encouragement
+    )
+    return outcome, event
+
+def publish_answer(player_stats: models.PlayerStats, event: Dict[str, Any],
+                   created_at: Optional[int] = None) -> None:
+    """Після commit: майстерність алгебри, ціль складності, журнал відповідей (запис у БД - пакетами у фоні), жива стрічка класу і таблиці лідерів"""
+    mastery = event.pop("mastery", None)
+    if mastery is not None:
+        adaptive_engine.commit_mastery(event["player_id"], mastery)
+    difficulty_targets.record(event["player_id"], event["topic"], event.pop("difficulty"), event["is_correct"])
+    answer_log.record(created_at=created_at, **event)
+
+    # Жива стрічка класу для вчителів (лише пам'ять, без БД)
+    owner = player_stats.owner
+    classroom_feed.publish(
+        classroom=owner.classroom,
+        player_id=event["player_id"],
+        username=owner.username,
+        topic=event["topic"],
+        is_correct=event["is_correct"],
+        misconception=event["misconception"],
+        hp=player_stats.hp,
+        max_hp=player_stats.max_hp,
+        xp=player_stats.xp,
+        level=player_stats.level
+    )
+    leaderboards.update(event["player_id"], owner.username, owner.classroom, player_stats.xp, player_stats.level)
+
+def track_achievements(event: Dict[str, Any], outcome: Dict[str, Any], enemy_name: str, enemy_max_hp: int,
+                       level_after: int, in_battle: bool = True) -> List[battle_schema.AchievementUnlock]:
+    """Після commit: лічильники досягнень і запис щойно відкритих"""
+    unlocked = achievement_engine.record_answer(
+        player_id=event["player_id"],
+        topic=event["topic"],
+        is_correct=outcome["is_correct"],
+        damage_dealt=outcome["damage_dealt"],
+        enemy_id=event["enemy_id"],
+        enemy_name=enemy_name,
+        enemy_max_hp=enemy_max_hp,
+        level_before=event["level"],
+        level_after=level_after,
+        in_battle=in_battle
+    )
+    return achievement_engine.persist(event["player_id"], unlocked)
+
+class BattleSession:
+    """
+    Бій одного WebSocket-з'єднання. Гравець, ворог і поточна задача живуть
+    у пам'яті; сесія БД не скидає атрибути після commit, тож відповідь
+    коштує лише UPDATE статистики без повторних SELECT.
+    """
+
+    def __init__(self, db: Session, user: models.User):
+        self.db = db
+        self.user = user
+        self.enemy: Optional[models.Enemy] = None
+        self.player_stats: Optional[models.PlayerStats] = None
+        self.problem: Optional[Problem] = None
+
+    @classmethod
+    def open(cls, username: str) -> "BattleSession":
+        db = session.SessionLocal(expire_on_commit=False)
+        user = db.query(models.User).filter(models.User.username == username).first()
+        if user is None:
+            db.close()
+            raise BattleNotFound("User not found")
+        return cls(db, user)
+
+    def start(self, difficulty: Optional[float] = None) -> battle_schema.BattleState:
+        self.enemy, self.player_stats, self.problem = start_encounter(self.db, self.user.id, difficulty)
+        return battle_schema.BattleState(
+            player_stats=self.player_stats,
+            enemy=self.enemy,
+            enemy_current_hp=self.enemy.max_hp,
+            problem=self.problem
+        )
+
+    def answer(self, frame: battle_schema.AnswerFrame) -> battle_schema.AnswerResult:
+        if self.problem is None:
+            raise BattleNotFound("Battle has not started")
+
+        payload = battle_schema.AnswerPayload(
+            enemy_id=self.enemy.id,
+            problem=self.problem,
+            answer=frame.answer,
+            operation=frame.operation,
+            response_time_ms=frame.response_time_ms
+        )
+        try:
+            result = resolve_answer(self.db, self.user.id, self.enemy, self.player_stats, payload)
+        except StaleDataError:
+            # Статистику змінив інший запит (наприклад, REST) - перечитуємо її
+            self.db.rollback()
+            self.db.refresh(self.player_stats)
+            raise
+
+        if result.new_problem is not None:
+            self.problem = result.new_problem
+        elif result.problem_delta is not None:
+            self.problem.data["current_step"] = result.problem_delta.current_step
+        return result
+
+    def close(self) -> None:
+        self.db.close()
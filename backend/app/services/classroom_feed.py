@@ -0,0 +1,173 @@
+"""
+Жива стрічка класу (Server-Sent Events) з подій відповідей у процесі
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+FLUSH_INTERVAL = 1.0      # Вікно об'єднання оновлень, с
+HEARTBEAT_INTERVAL = 15.0 # Коментар-пінг, щоб проксі не закривали з'єднання
+SUBSCRIBER_QUEUE = 8      # Кадрів у черзі одного глядача
+STUCK_STREAK = 3          # Стільки помилок поспіль - учень "застряг"
+RECENT_MISCONCEPTIONS = 5
+
+def _sse(event: str, payload: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+class _Subscriber:
+    __slots__ = ("queue", "wakeup", "resync")
+
+    def __init__(self):
+        self.queue: deque = deque()
+        self.wakeup = asyncio.Event()
+        self.resync = False
+
+class ClassroomFeedHub:
+    """
+    Відповіді публікуються з потоків обробки запитів: оновлюється знімок
+    учня в пам'яті, а сам учень позначається "зміненим". Раз на
+    FLUSH_INTERVAL цикл подій формує один кадр на клас лише зі змінених
+    учнів (скільки б відповідей не було у вікні) і роздає його глядачам.
+    Переповнена черга глядача очищується, і він отримує свіжий повний знімок
+    замість застарілих кадрів. База даних не використовується взагалі.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._students: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._dirty: Dict[str, Set[int]] = {}
+        self._subscribers: Dict[str, Set[_Subscriber]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.frames_sent = 0
+        self.resyncs = 0
+
+    def publish(self, classroom: Optional[str], player_id: int, username: str, topic: str,
+                is_correct: bool, misconception: Optional[str], hp: int, max_hp: int, xp: int, level: int) -> None:
+        if not classroom:
+            return
+        with self._lock:
+            students = self._students.setdefault(classroom, {})
+            student = students.get(player_id)
+            if student is None:
+                student = students[player_id] = {
+                    "player_id": player_id,
+                    "username": username,
+                    "attempts": 0,
+                    "correct": 0,
+                    "wrong_streak": 0,
+                    "misconceptions": [],
+                }
+
+            student["attempts"] += 1
+            if is_correct:
+                student["correct"] += 1
+                student["wrong_streak"] = 0
+            else:
+                student["wrong_streak"] += 1
+            if misconception:
+                recent = student["misconceptions"]
+                recent.append(misconception)
+                del recent[:-RECENT_MISCONCEPTIONS]
+
+            student.update(
+                topic=topic, hp=hp, max_hp=max_hp, xp=xp, level=level,
+                stuck=student["wrong_streak"] >= STUCK_STREAK,
+                updated_at=int(time.time() * 1000),
+            )
+            self._dirty.setdefault(classroom, set()).add(player_id)
+
+    def _snapshot_frame(self, classroom: str) -> bytes:
+        with self._lock:
+            students = [dict(s, misconceptions=list(s["misconceptions"]))
+                        for s in self._students.get(classroom, {}).values()]
+        return _sse("snapshot", {"classroom": classroom, "students": students})
+
+    def flush(self) -> int:
+        """Роздає накопичені зміни; викликається в циклі подій. Повертає кількість кадрів"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            updates = {
+                classroom: [dict(self._students[classroom][pid],
+                                 misconceptions=list(self._students[classroom][pid]["misconceptions"]))
+                            for pid in player_ids]
+                for classroom, player_ids in dirty.items()
+                if self._subscribers.get(classroom)
+            }
+
+        frames = 0
+        for classroom, students in updates.items():
+            frame = _sse("students", {"classroom": classroom, "students": students})
+            for subscriber in self._subscribers.get(classroom, ()):
+                if len(subscriber.queue) >= SUBSCRIBER_QUEUE:
+                    # Глядач не встигає - старі кадри вже неактуальні
+                    subscriber.queue.clear()
+                    subscriber.resync = True
+                    self.resyncs += 1
+                elif not subscriber.resync:
+                    subscriber.queue.append(frame)
+                subscriber.wakeup.set()
+                frames += 1
+        self.frames_sent += frames
+        return frames
+
+    async def stream(self, classroom: str, is_disconnected: Callable[[], Awaitable[bool]]):
+        """Генератор байтів SSE для одного глядача"""
+        subscriber = _Subscriber()
+        self._subscribers.setdefault(classroom, set()).add(subscriber)
+        try:
+            yield self._snapshot_frame(classroom)
+            while not await is_disconnected():
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                subscriber.wakeup.clear()
+
+                if subscriber.resync:
+                    subscriber.resync = False
+                    yield self._snapshot_frame(classroom)
+                    continue
+                while subscriber.queue:
+                    yield subscriber.queue.popleft()
+        finally:
+            subscribers = self._subscribers.get(classroom)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[classroom]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def start(self) -> None:
+        """Запускає цикл розсилки; викликається з lifespan (у циклі подій)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "classrooms": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "frames_sent": self.frames_sent,
+            "resyncs": self.resyncs,
+        }
+
+# Глобальний хаб живої стрічки класів
+classroom_feed = ClassroomFeedHub()
@@ -0,0 +1,211 @@
+"""
+Щоденне випробування: одна послідовність задач на всіх, підготовлена раз на день
+"""
+
+import datetime
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from app.db import models, session
+from .rollup_service import _upsert
+from .worksheet_service import generate_chunk, get_pool
+
+PROBLEMS_PER_TOPIC = 4
+DAILY_LEVEL = 3
+# Поля, з яких клієнт міг би дізнатися відповідь або які йому не потрібні
+HIDDEN_DATA_KEYS = {
+    "solution_steps", "step_by_step", "balance_steps", "story_feedback",
+    "difficulty_factors", "theorem_visualization",
+}
+
+def _seed(day: datetime.date, topic: str) -> int:
+    digest = hashlib.blake2b(f"{day.isoformat()}:{topic}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+def _public_problem(index: int, topic: str, problem: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "topic": topic,
+        "display_text": problem["display_text"],
+        "data": {key: value for key, value in problem["data"].items() if key not in HIDDEN_DATA_KEYS},
+    }
+
+class DailyChallenge:
+    """Заморожений набір задач одного дня та агрегати його результатів"""
+
+    def __init__(self, day: datetime.date, topics: List[str], problems: List[Dict[str, Any]]):
+        self.day = day.isoformat()
+        self.answers = tuple(problem["answer"] for problem in problems)
+
+        public = [_public_problem(index, topic, problem)
+                  for index, (topic, problem) in enumerate(zip(topics, problems))]
+        self.body = json.dumps({"day": self.day, "problems": public}, ensure_ascii=False).encode("utf-8")
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+
+        self.scores: Dict[int, int] = {}  # гравець -> бал
+        self.histogram = [0] * (len(problems) + 1)
+        self.problem_correct = [0] * len(problems)
+
+    def seconds_left(self) -> int:
+        """До кінця дня - стільки клієнт може тримати задачі в кеші"""
+        now = datetime.datetime.now()
+        tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+        return max(1, int((tomorrow - now).total_seconds()))
+
+    def count(self, player_id: int, mask: str) -> int:
+        score = mask.count("1")
+        self.scores[player_id] = score
+        self.histogram[score] += 1
+        for index, flag in enumerate(mask):
+            if flag == "1":
+                self.problem_correct[index] += 1
+        return score
+
+class DailyChallengeService:
+    """
+    Набір дня генерується один раз через generate_chunk у пулі процесів
+    (seed з дати і теми - однаковий для всіх і відтворюваний), серіалізується
+    один раз і віддається готовими байтами. Результати рахуються в пам'яті,
+    а в базу потрапляють пакетами з фонового потоку.
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._current: Optional[DailyChallenge] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _build(self, day: datetime.date) -> DailyChallenge:
+        db = session.SessionLocal()
+        try:
+            topics = sorted({topic for (topic,) in db.query(models.Enemy.math_topic).distinct()})
+            restored = db.query(models.DailyResult.player_id, models.DailyResult.correct_mask).filter(
+                models.DailyResult.day == day.isoformat()
+            ).all()
+        finally:
+            db.close()
+
+        pool = get_pool()
+        futures = [pool.submit(generate_chunk, topic, DAILY_LEVEL, PROBLEMS_PER_TOPIC, _seed(day, topic))
+                   for topic in topics]
+        sequence, problems = [], []
+        for topic, future in zip(topics, futures):
+            for _, payload in future.result():
+                sequence.append(topic)
+                problems.append(json.loads(payload))
+
+        challenge = DailyChallenge(day, sequence, problems)
+        # Після перезапуску сервера агрегати дня відновлюються з уже записаних результатів
+        for player_id, mask in restored:
+            if len(mask) == len(problems):
+                challenge.count(player_id, mask)
+        return challenge
+
+    def current(self) -> DailyChallenge:
+        """Набір на сьогодні; лише перший запит нового дня чекає на генерацію"""
+        today = datetime.date.today()
+        challenge = self._current
+        if challenge is not None and challenge.day == today.isoformat():
+            return challenge
+        with self._build_lock:
+            challenge = self._current
+            if challenge is None or challenge.day != today.isoformat():
+                challenge = self._current = self._build(today)
+        return challenge
+
+    def submit(self, player_id: int, day: str, answers: List[Optional[int]]) -> Dict[str, Any]:
+        """Перевіряє відповіді; ValueError - не той день або кількість, LookupError - повторна спроба"""
+        challenge = self.current()
+        if day != challenge.day:
+            raise ValueError("Daily challenge has changed, reload it")
+        if len(answers) != len(challenge.answers):
+            raise ValueError(f"Expected {len(challenge.answers)} answers")
+
+        results = [answer is not None and answer == expected for answer, expected in zip(answers, challenge.answers)]
+        mask = "".join("1" if ok else "0" for ok in results)
+        with self._lock:
+            if player_id in challenge.scores:
+                raise LookupError("Daily challenge already submitted")
+            score = challenge.count(player_id, mask)
+            participants = len(challenge.scores)
+            better = sum(challenge.histogram[score + 1:])
+            self._pending.append({
+                "day": challenge.day,
+                "player_id": player_id,
+                "score": score,
+                "correct_mask": mask,
+                "submitted_at": int(time.time() * 1000),
+            })
+            should_flush = len(self._pending) >= self.batch_size
+
+        if should_flush:
+            self._wakeup.set()
+        return {
+            "day": challenge.day,
+            "score": score,
+            "total": len(results),
+            "results": results,
+            "rank": better + 1,
+            "participants": participants,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        challenge = self.current()
+        with self._lock:
+            participants = len(challenge.scores)
+            total_score = sum(score * count for score, count in enumerate(challenge.histogram))
+            return {
+                "day": challenge.day,
+                "participants": participants,
+                "mean_score": round(total_score / participants, 2) if participants else None,
+                "histogram": list(challenge.histogram),
+                "problem_accuracy": [round(correct / participants, 3) if participants else None
+                                     for correct in challenge.problem_correct],
+            }
+
+    def flush(self) -> int:
+        """Записує накопичені результати одним INSERT; повтори того ж дня ігноруються"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        with session.engine.begin() as conn:
+            stmt = _upsert(conn, models.DailyResult.__table__)
+            conn.execute(stmt.on_conflict_do_nothing(index_elements=["day", "player_id"]), rows)
+        return len(rows)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                print(f"Daily results flush failed: {exc}")
+
+    def start(self):
+        """Готує набір дня та запускає фоновий потік запису"""
+        self.current()
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="daily-results-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+# Глобальне щоденне випробування
+daily_challenge = DailyChallengeService()
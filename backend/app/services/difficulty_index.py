@@ -0,0 +1,162 @@
+"""
+Індекс задач за складністю: пули задач, розкладені по кошиках скалярної складності
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from app.schemas.battle import Problem
+
+NUM_BUCKETS = 20      # Кошики по 0.05 на шкалі [0, 1]
+POOL_SIZE = 64        # Задач у кошику (кільце, старі витісняються новими)
+MAX_NUMBER_SIZE = 50  # Найбільший операнд серед генераторів
+
+INDEXED_TOPICS = ["addition", "subtraction", "multiplication", "geometry"]
+
+# Сходи цільової складності: вгору за правильну відповідь, вниз за помилку.
+# Рівновага при p * STEP_UP = (1 - p) * STEP_DOWN, тобто ~67% правильних
+TARGET_STEP_UP = 0.05
+TARGET_STEP_DOWN = 0.1
+MAX_TRACKED_TARGETS = 100000
+
+# Складність геометричних викликів за шкалою operation_complexity
+GEOMETRY_COMPLEXITY = {"perimeter": 2, "area": 3, "pythagorean": 4}
+
+def difficulty_factors(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Фактори складності задачі. Сюжетні задачі мають їх з
+    StoryBasedProblem._analyze_difficulty; для геометрії виводимо аналогічні.
+    """
+    factors = data.get("difficulty_factors")
+    if factors:
+        return factors
+
+    if data.get("type") == "geometry":
+        shape = data.get("shape", {})
+        numbers = [v for v in data.get("given_values", {}).values()]
+        numbers += [v for k, v in shape.items() if k in ("width", "height", "radius")]
+        numbers += list(shape.get("sides", {}).values())
+        return {
+            "number_size": max(numbers, default=0),
+            "operation_complexity": GEOMETRY_COMPLEXITY.get(data.get("challenge_type"), 3),
+            "context_complexity": 4 if data.get("context") == "fortress_blueprints" else 1,
+        }
+
+    return {"number_size": 0, "operation_complexity": 1, "context_complexity": 1}
+
+def difficulty_score(data: Dict[str, Any]) -> float:
+    """Скалярна складність у [0, 1]: розмір чисел, складність операції та контексту"""
+    factors = difficulty_factors(data)
+    size = min(1.0, factors.get("number_size", 0) / MAX_NUMBER_SIZE)
+    operation = (factors.get("operation_complexity", 1) - 1) / 3
+    context = (factors.get("context_complexity", 1) - 1) / 3
+    return min(1.0, max(0.0, 0.5 * size + 0.3 * operation + 0.2 * context))
+
+class DifficultyIndex:
+    """
+    Для кожної теми - NUM_BUCKETS кільцевих пулів задач. Запит
+    "тема t, складність d ± ε" дивиться лише у фіксовану кількість
+    кошиків навколо d, тож відповідає за O(1).
+    """
+
+    def __init__(self):
+        self._pools: Dict[str, List[List[Problem]]] = {}
+        self._cursors: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, score: float) -> int:
+        return min(NUM_BUCKETS - 1, int(score * NUM_BUCKETS))
+
+    def observe(self, topic: str, problem: Problem) -> None:
+        """Додає щойно згенеровану задачу до пулу її кошика (інкрементальне оновлення)"""
+        if topic not in INDEXED_TOPICS:
+            return
+        bucket = self._bucket(difficulty_score(problem.data))
+
+        with self._lock:
+            pools = self._pools.setdefault(topic, [[] for _ in range(NUM_BUCKETS)])
+            cursors = self._cursors.setdefault(topic, [0] * NUM_BUCKETS)
+            pool = pools[bucket]
+            if len(pool) < POOL_SIZE:
+                pool.append(problem)
+            else:
+                pool[cursors[bucket]] = problem
+                cursors[bucket] = (cursors[bucket] + 1) % POOL_SIZE
+
+    def problem_at(self, topic: str, difficulty: float, tolerance: float = 0.1,
+                   accept: Callable[[Problem], bool] = None) -> Optional[Problem]:
+        """
+        Задача теми зі складністю в [d - ε, d + ε]; найближчі кошики першими.
+        accept дозволяє відкинути кандидата (наприклад, нещодавно бачену задачу).
+        """
+        center = self._bucket(min(1.0, max(0.0, difficulty)))
+        reach = max(0, int(tolerance * NUM_BUCKETS))
+
+        with self._lock:
+            pools = self._pools.get(topic)
+            if pools is None:
+                return None
+
+            for offset in range(reach + 1):
+                for bucket in {center - offset, center + offset}:
+                    if not 0 <= bucket < NUM_BUCKETS or not pools[bucket]:
+                        continue
+                    pool = pools[bucket]
+                    for _ in range(3):
+                        candidate = pool[random.randrange(len(pool))]
+                        if accept is None or accept(candidate):
+                            # Копія: пули спільні для всіх гравців
+                            return candidate.model_copy(deep=True)
+        return None
+
+    def warm(self, generator: Callable[..., Problem], levels=range(1, 6), per_level: int = 200) -> None:
+        """Початкове наповнення пулів із генераторів задач"""
+        for topic in INDEXED_TOPICS:
+            for level in levels:
+                for _ in range(per_level):
+                    self.observe(topic, generator(topic, level))
+
+    def stats(self) -> Dict[str, List[int]]:
+        with self._lock:
+            return {topic: [len(pool) for pool in pools] for topic, pools in self._pools.items()}
+
+class DifficultyTargets:
+    """
+    Адаптивна цільова складність на (гравець, тема): наступна ціль - складність
+    щойно розв'язаної задачі плюс/мінус крок сходів. Прив'язка до фактичної задачі
+    (а не до попередньої цілі) не дає цілі піти туди, де в індексі немає задач.
+    Обмежений LRU у пам'яті; до першої відповіді цілі немає (задача за рівнем).
+    """
+
+    def __init__(self, max_entries: int = MAX_TRACKED_TARGETS):
+        self.max_entries = max_entries
+        self._targets: "OrderedDict[Tuple[int, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def target(self, player_id: int, topic: str) -> Optional[float]:
+        if topic not in INDEXED_TOPICS:
+            return None
+        key = (player_id, topic)
+        with self._lock:
+            value = self._targets.get(key)
+            if value is not None:
+                self._targets.move_to_end(key)
+            return value
+
+    def record(self, player_id: int, topic: str, difficulty: float, is_correct: bool) -> None:
+        """Після відповіді на задачу складності difficulty"""
+        if topic not in INDEXED_TOPICS:
+            return
+        key = (player_id, topic)
+        with self._lock:
+            self._targets.pop(key, None)
+            value = difficulty + (TARGET_STEP_UP if is_correct else -TARGET_STEP_DOWN)
+            self._targets[key] = min(1.0, max(0.0, value))
+            if len(self._targets) > self.max_entries:
+                self._targets.popitem(last=False)
+
+# Глобальний індекс складності
+difficulty_index = DifficultyIndex()
+# Цілі складності гравців для звичайної гри
+difficulty_targets = DifficultyTargets()
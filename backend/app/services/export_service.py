@@ -0,0 +1,140 @@
+"""
+Потоковий експорт прогресу та відповідей у NDJSON/CSV з постійним споживанням пам'яті
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Dict, List, Any, Iterator, Callable, Optional
+from sqlalchemy import select
+from app.db import models, session
+from .math_service import adaptive_engine
+
+PAGE_SIZE = 1000
+
+# Набори даних для експорту: таблиця та стовпці (паролі не експортуються)
+TABLE_DATASETS = {
+    "users": (models.User.__table__, ["id", "username", "email", "classroom", "role"]),
+    "stats": (models.PlayerStats.__table__, ["id", "owner_id", "hp", "max_hp", "level", "xp", "math_power", "version"]),
+    "answers": (models.AnswerEvent.__table__, [
+        "id", "created_at", "player_id", "enemy_id", "topic", "level", "problem_id",
+        "is_correct", "operation", "misconception", "latency_ms"
+    ]),
+}
+
+MASTERY_COLUMNS = [
+    "player_id", "balance_understanding", "inverse_operations", "equation_solving",
+    "consecutive_correct", "total_attempts", "error_patterns"
+]
+
+DATASETS = list(TABLE_DATASETS) + ["mastery"]
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def dataset_columns(dataset: str) -> List[str]:
+    if dataset == "mastery":
+        return MASTERY_COLUMNS
+    return TABLE_DATASETS[dataset][1]
+
+def _table_pages(dataset: str, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Keyset-пагінація по первинному ключу; кожна сторінка - коротка транзакція"""
+    table, columns = TABLE_DATASETS[dataset]
+    selected = [table.c[name] for name in columns]
+    last_id = 0
+
+    while True:
+        with session.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=page_size).execute(
+                select(*selected)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(page_size)
+            )
+            page = [dict(row._mapping) for row in result]
+
+        if not page:
+            return
+        yield page
+        last_id = page[-1]["id"]
+        if len(page) < page_size:
+            return
+
+def _mastery_pages(page_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Сторінки даних адаптивного движка в пам'яті в порядку player_id"""
+    # Ключі сортуються один раз (знімок захищає від змін словника); записи читаємо лише для однієї сторінки
+    all_ids = sorted(list(adaptive_engine.student_data))
+
+    for start in range(0, len(all_ids), page_size):
+        player_ids = all_ids[start:start + page_size]
+        page = []
+        for pid in player_ids:
+            student = adaptive_engine.student_data.get(pid)
+            if student is None:
+                continue
+            page.append({
+                "player_id": pid,
+                "balance_understanding": student.balance_understanding,
+                "inverse_operations": student.inverse_operations,
+                "equation_solving": student.equation_solving,
+                "consecutive_correct": student.consecutive_correct,
+                "total_attempts": student.total_attempts,
+                "error_patterns": dict(student.error_patterns),
+            })
+        if page:
+            yield page
+
+def _encode_ndjson(columns: List[str]) -> Callable[[Optional[List[Dict[str, Any]]]], str]:
+    def encode(page):
+        if page is None:
+            return ""
+        return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in page)
+    return encode
+
+def _encode_csv(columns: List[str]) -> Callable[[Optional[List[Dict[str, Any]]]], str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(page):
+        if page is None:
+            writer.writerow(columns)
+        else:
+            for row in page:
+                writer.writerow([
+                    json.dumps(row[c], ensure_ascii=False) if isinstance(row[c], dict) else row[c]
+                    for c in columns
+                ])
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+    return encode
+
+def stream_export(dataset: str, fmt: str = "ndjson", gzip: bool = False,
+                  page_size: int = PAGE_SIZE) -> Iterator[bytes]:
+    """Генератор байтів експорту: одна сторінка в пам'яті, опційне стиснення gzip на льоту"""
+    columns = dataset_columns(dataset)
+    encode = (_encode_csv if fmt == "csv" else _encode_ndjson)(columns)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits=31 -> формат gzip
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    header = encode(None)
+    if header:
+        chunk = emit(header)
+        if chunk:
+            yield chunk
+
+    pages = _mastery_pages(page_size) if dataset == "mastery" else _table_pages(dataset, page_size)
+    for page in pages:
+        chunk = emit(encode(page))
+        if chunk:
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
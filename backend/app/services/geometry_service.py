@@ -5,8 +5,9 @@
 
 import random
 import math
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 from app.schemas.battle import Problem
+from .problem_space import ProblemSpace, SpaceSegment
 
 class GeometricShape:
     """Базовий клас для геометричних фігур"""
@@ -146,31 +147,91 @@ class GeometryPuzzleGenerator:
         else:
             return self._generate_area_challenge(range_vals, context, level)
     
+    def problem_space(self, level: int, challenge_types: List[str]) -> ProblemSpace:
+        """Перелічений простір задач рівня: розміри з difficulty_ranges × контексти"""
+        
+        difficulty = min(max(level, 1), 4)
+        low, high = self.difficulty_ranges[difficulty]["min"], self.difficulty_ranges[difficulty]["max"]
+        sides = range(low, high + 1)
+        contexts = list(self.STORY_CONTEXTS.keys())
+        is_triangle = lambda v: abs(v[0] - v[1]) < v[2] < v[0] + v[1]
+        
+        # Ваги відтворюють розподіл випадкового генератора: тип виклику, потім фігура
+        segments = []
+        if "area" in challenge_types:
+            segments += [
+                SpaceSegment("area:rectangle", [sides, sides, contexts], weight=1 / 3),
+                SpaceSegment("area:circle", [range(low, high // 2 + 1), contexts], weight=1 / 3),
+                SpaceSegment("area:triangle", [sides, sides, range(1, 2 * high), contexts],
+                             valid=is_triangle, weight=1 / 3),
+            ]
+        if "perimeter" in challenge_types:
+            segments += [
+                SpaceSegment("perimeter:rectangle", [sides, sides, contexts], weight=1 / 2),
+                SpaceSegment("perimeter:triangle", [sides, sides, range(1, 2 * high), contexts],
+                             valid=is_triangle, weight=1 / 2),
+            ]
+        if "pythagorean" in challenge_types:
+            segments.append(SpaceSegment(
+                "pythagorean",
+                [range(3, high // 2 + 1), range(4, high // 2 + 1), ["a", "b", "c"], contexts]
+            ))
+        
+        return ProblemSpace(("geometry", difficulty, tuple(challenge_types)), segments)
+    
+    def build_from_space(self, tag: str, values: tuple, level: int) -> Problem:
+        """Будує задачу з точки простору, отриманої від problem_space"""
+        
+        *params, context = values
+        if tag == "pythagorean":
+            a, b, unknown = params
+            return self.build_pythagorean_challenge(a, b, unknown, context, level)
+        
+        challenge_type, shape_choice = tag.split(":")
+        if challenge_type == "area":
+            return self.build_area_challenge(shape_choice, tuple(params), context, level)
+        return self.build_perimeter_challenge(shape_choice, tuple(params), context, level)
+    
     def _generate_area_challenge(self, range_vals: Dict, context: str, level: int) -> Problem:
         """Генерує задачу на обчислення площі"""
         
         shape_choice = random.choice(["rectangle", "circle", "triangle"])
+        
+        if shape_choice == "rectangle":
+            dims = (
+                random.randint(range_vals["min"], range_vals["max"]),
+                random.randint(range_vals["min"], range_vals["max"])
+            )
+        elif shape_choice == "circle":
+            dims = (random.randint(range_vals["min"], range_vals["max"] // 2),)
+        else:  # triangle
+            # Генеруємо валідний трикутник
+            a = random.randint(range_vals["min"], range_vals["max"])
+            b = random.randint(range_vals["min"], range_vals["max"]) 
+            c = random.randint(max(1, abs(a-b)+1), a+b-1)  # Забезпечуємо нерівність трикутника
+            dims = (a, b, c)
+        
+        return self.build_area_challenge(shape_choice, dims, context, level)
+    
+    def build_area_challenge(self, shape_choice: str, dims: Tuple[int, ...], context: str, level: int) -> Problem:
+        """Будує задачу на площу із заданих розмірів фігури"""
+        
         story_data = self.STORY_CONTEXTS[context]
         
         if shape_choice == "rectangle":
-            width = random.randint(range_vals["min"], range_vals["max"])
-            height = random.randint(range_vals["min"], range_vals["max"])
+            width, height = dims
             shape = Rectangle(width, height)
             
             problem_text = f"{story_data['setup']} Прямокутна {self._get_context_object(context)} має розміри {width} на {height} метрів. Яка її площа?"
             
         elif shape_choice == "circle":
-            radius = random.randint(range_vals["min"], range_vals["max"] // 2)
+            radius, = dims
             shape = Circle(radius)
             
             problem_text = f"{story_data['setup']} Кругла {self._get_context_object(context)} має радіус {radius} метрів. Яка її площа? (Використайте π ≈ 3.14)"
             
         else:  # triangle
-            # Генеруємо валідний трикутник
-            a = random.randint(range_vals["min"], range_vals["max"])
-            b = random.randint(range_vals["min"], range_vals["max"]) 
-            c = random.randint(max(1, abs(a-b)+1), a+b-1)  # Забезпечуємо нерівність трикутника
-            
+            a, b, c = dims
             shape = Triangle(a, b, c)
             problem_text = f"{story_data['setup']} Трикутна {self._get_context_object(context)} має сторони {a}, {b} та {c} метрів. Яка її площа? (Округліть до цілого)"
         
@@ -198,20 +259,33 @@ class GeometryPuzzleGenerator:
         """Генерує задачу на обчислення периметру"""
         
         shape_choice = random.choice(["rectangle", "triangle"])
+        
+        if shape_choice == "rectangle":
+            dims = (
+                random.randint(range_vals["min"], range_vals["max"]),
+                random.randint(range_vals["min"], range_vals["max"])
+            )
+        else:  # triangle
+            a = random.randint(range_vals["min"], range_vals["max"])
+            b = random.randint(range_vals["min"], range_vals["max"])
+            c = random.randint(max(1, abs(a-b)+1), a+b-1)
+            dims = (a, b, c)
+        
+        return self.build_perimeter_challenge(shape_choice, dims, context, level)
+    
+    def build_perimeter_challenge(self, shape_choice: str, dims: Tuple[int, ...], context: str, level: int) -> Problem:
+        """Будує задачу на периметр із заданих розмірів фігури"""
+        
         story_data = self.STORY_CONTEXTS[context]
         
         if shape_choice == "rectangle":
-            width = random.randint(range_vals["min"], range_vals["max"])
-            height = random.randint(range_vals["min"], range_vals["max"])
+            width, height = dims
             shape = Rectangle(width, height)
             
             problem_text = f"{story_data['setup']} Потрібно огородити {self._get_context_object(context)} розміром {width} на {height} метрів. Скільки метрів огорожі потрібно?"
             
         else:  # triangle
-            a = random.randint(range_vals["min"], range_vals["max"])
-            b = random.randint(range_vals["min"], range_vals["max"])
-            c = random.randint(max(1, abs(a-b)+1), a+b-1)
-            
+            a, b, c = dims
             shape = Triangle(a, b, c)
             problem_text = f"{story_data['setup']} Трикутний {self._get_context_object(context)} має сторони {a}, {b} та {c} метрів. Який його периметр?"
         
@@ -233,16 +307,21 @@ class GeometryPuzzleGenerator:
     def _generate_pythagorean_challenge(self, range_vals: Dict, context: str, level: int) -> Problem:
         """Генерує задачу на теорему Піфагора"""
         
-        story_data = self.STORY_CONTEXTS[context]
-        
         # Генеруємо прямокутний трикутник
         a = random.randint(3, range_vals["max"] // 2)
         b = random.randint(4, range_vals["max"] // 2) 
-        c = math.sqrt(a**2 + b**2)
         
         # Випадково обираємо, що шукати
         unknown = random.choice(['a', 'b', 'c'])
         
+        return self.build_pythagorean_challenge(a, b, unknown, context, level)
+    
+    def build_pythagorean_challenge(self, a: int, b: int, unknown: str, context: str, level: int) -> Problem:
+        """Будує задачу на теорему Піфагора із заданих катетів"""
+        
+        story_data = self.STORY_CONTEXTS[context]
+        c = math.sqrt(a**2 + b**2)
+        
         if unknown == 'c':
             problem_text = f"{story_data['setup']} Прямокутний трикутник має катети {a} та {b} метрів. Знайдіть гіпотенузу. (Округліть до цілого)"
             answer = int(round(c))
@@ -319,16 +398,18 @@ def generate_geometry_problem(level: int = 1, challenge_type: str = "area") -> P
     """Головна функція для генерації геометричних задач"""
     return geometry_generator.generate_geometry_challenge(level, challenge_type)
 
-def generate_geometric_titan_encounter(player_level: int) -> Tuple[Problem, Dict[str, Any]]:
-    """Генерує зустріч з Геометричним Титаном"""
-    
-    # Титан адаптується до рівня гравця
-    challenge_types = ["area", "perimeter"]
-    if player_level >= 3:
-        challenge_types.append("pythagorean")
+def generate_geometric_titan_encounter(player_level: int,
+                                       problem: Optional[Problem] = None) -> Tuple[Problem, Dict[str, Any]]:
+    """Генерує зустріч з Геометричним Титаном (problem - уже підібрана задача, наприклад за складністю)"""
     
-    challenge_type = random.choice(challenge_types)
-    problem = generate_geometry_problem(player_level, challenge_type)
+    if problem is None:
+        # Титан адаптується до рівня гравця
+        challenge_types = ["area", "perimeter"]
+        if player_level >= 3:
+            challenge_types.append("pythagorean")
+
+        challenge_type = random.choice(challenge_types)
+        problem = generate_geometry_problem(player_level, challenge_type)
     
     # Особливості Геометричного Титана
     titan_data = {
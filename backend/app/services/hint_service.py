@@ -0,0 +1,128 @@
+"""
+Підказки, підготовлені при старті: жодної генерації задач чи звернень до бази на запит
+"""
+
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+from app.db import models, session
+from .math_service import generate_problem
+
+# Геометричні підказки за типом задачі та фігурою
+GEOMETRY_HINTS = {
+    "area": {
+        "rectangle": {
+            "formula": "Площа = довжина × ширина",
+            "visualization_tip": "Уявіть прямокутник поділеним на квадратні одиниці",
+            "common_mistakes": ["Плутати площу з периметром", "Забувати одиниці вимірювання"],
+            "interactive_demo": True
+        },
+        "circle": {
+            "formula": "Площа = π × радіус²",
+            "visualization_tip": "Уявіть коло вписане в квадрат",
+            "common_mistakes": ["Використовувати діаметр замість радіуса", "Забувати возводити в квадрат"],
+            "interactive_demo": True
+        },
+        "triangle": {
+            "formula": "Площа = ½ × основа × висота або формула Герона",
+            "visualization_tip": "Висота завжди перпендикулярна до основи",
+            "common_mistakes": ["Використовувати сторону замість висоти", "Забувати ділити на 2"],
+            "interactive_demo": True
+        }
+    },
+    "perimeter": {
+        "rectangle": {
+            "formula": "Периметр = 2 × (довжина + ширина)",
+            "visualization_tip": "Уявіть, що йдете навколо фігури",
+            "common_mistakes": ["Забувати помножити на 2", "Плутати з площею"]
+        },
+        "triangle": {
+            "formula": "Периметр = сторона₁ + сторона₂ + сторона₃",
+            "visualization_tip": "Просто додайте всі сторони",
+            "common_mistakes": ["Використовувати висоту замість сторони"]
+        }
+    },
+    "pythagorean": {
+        "triangle": {
+            "formula": "a² + b² = c², де c - гіпотенуза",
+            "visualization_tip": "Гіпотенуза - найдовша сторона, протилежна прямому куту",
+            "common_mistakes": ["Плутати катети з гіпотенузою", "Забувати брати квадратний корінь"],
+            "theorem_proof": "Можна довести через площі квадратів на сторонах"
+        }
+    }
+}
+
+GEOMETRY_FALLBACK = {
+    "formula": "Перевірте правильність типу задачі",
+    "visualization_tip": "Основи геометрії завжди допоможуть"
+}
+
+class CachedHint:
+    """Готове тіло JSON-відповіді та його ETag"""
+
+    __slots__ = ("content", "body", "etag")
+
+    def __init__(self, content: dict):
+        self.content = content
+        self.body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+
+def _geometry_hint_content(problem_type: str, shape_type: str) -> dict:
+    hint_data = GEOMETRY_HINTS.get(problem_type, {}).get(shape_type, GEOMETRY_FALLBACK)
+    return {
+        "problem_type": problem_type,
+        "shape_type": shape_type,
+        **hint_data,
+        "interactive_tools": ["ruler", "protractor", "grid"] if hint_data.get("interactive_demo") else []
+    }
+
+def _concept_hint_content(topic: str) -> dict:
+    # Приклад задачі генеруємо один раз на тему
+    sample_problem = generate_problem(topic=topic, level=1)
+    return {
+        "topic": topic,
+        "concept_explanation": sample_problem.data.get("context_explanation", ""),
+        "example": sample_problem.display_text,
+        "hint": sample_problem.data.get("concept_hint", "")
+    }
+
+class HintCatalog:
+    """Підказки за темами та фігурами і відповідність ворог -> тема"""
+
+    def __init__(self):
+        self._enemy_topics: Dict[int, str] = {}
+        self._concept: Dict[str, CachedHint] = {}
+        self._geometry: Dict[Tuple[str, str], CachedHint] = {
+            (problem_type, shape_type): CachedHint(_geometry_hint_content(problem_type, shape_type))
+            for problem_type, shapes in GEOMETRY_HINTS.items()
+            for shape_type in shapes
+        }
+
+    def warm(self, enemy_topics: Dict[int, str]) -> None:
+        concept = {topic: CachedHint(_concept_hint_content(topic)) for topic in set(enemy_topics.values())}
+        # Заміна словників цілком - читачі без блокувань бачать або старий, або новий стан
+        self._concept = concept
+        self._enemy_topics = dict(enemy_topics)
+
+    def concept_hint(self, enemy_id: int) -> Optional[CachedHint]:
+        topic = self._enemy_topics.get(enemy_id)
+        return self._concept.get(topic) if topic is not None else None
+
+    def geometry_hint(self, problem_type: str, shape_type: str) -> CachedHint:
+        hint = self._geometry.get((problem_type, shape_type))
+        if hint is None:
+            # Довільні комбінації з запиту не кешуємо, щоб словник не розростався
+            hint = CachedHint(_geometry_hint_content(problem_type, shape_type))
+        return hint
+
+# Глобальний каталог підказок
+hint_catalog = HintCatalog()
+
+def warm_hint_catalog():
+    """Завантажує ворогів і готує підказки при старті застосунку"""
+    db = session.SessionLocal()
+    try:
+        enemies = db.query(models.Enemy.id, models.Enemy.math_topic).all()
+    finally:
+        db.close()
+    hint_catalog.warm({enemy_id: topic for enemy_id, topic in enemies})
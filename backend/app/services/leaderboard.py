@@ -0,0 +1,186 @@
+"""
+Таблиці лідерів за досвідом: загальна та по класах, у пам'яті
+"""
+
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.db import models, session
+
+class _FenwickTree:
+    """Кількість гравців на кожне значення XP; префіксні суми за O(log M)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.top_bit = 1 << (size.bit_length() - 1)
+
+    def add(self, position: int, delta: int) -> None:
+        position += 1
+        while position <= self.size:
+            self.tree[position] += delta
+            position += position & -position
+
+    def prefix(self, position: int) -> int:
+        """Сума значень [0, position]"""
+        total = 0
+        position += 1
+        while position > 0:
+            total += self.tree[position]
+            position -= position & -position
+        return total
+
+    def find(self, k: int) -> int:
+        """Найменша позиція, префіксна сума якої >= k (k з 1)"""
+        position = 0
+        step = self.top_bit
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self.tree[nxt] < k:
+                position = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return position
+
+class RankIndex:
+    """
+    Дерево Фенвіка над значеннями XP плюс кошики гравців з однаковим XP.
+    Оновлення, "моє місце" та пошук k-го гравця - O(log M), де M - найбільший XP;
+    перші N - O(N log M). Рівний XP - рівне місце (1, 2, 2, 4).
+    """
+
+    def __init__(self, size: int = 1024):
+        self._tree = _FenwickTree(size)
+        self._xp: Dict[int, int] = {}
+        self._buckets: Dict[int, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._xp)
+
+    def _grow(self, xp: int) -> None:
+        size = self._tree.size
+        while size <= xp:
+            size *= 2
+        self._tree = _FenwickTree(size)
+        for value, players in self._buckets.items():
+            self._tree.add(value, len(players))
+
+    def set(self, player_id: int, xp: int) -> None:
+        xp = max(0, xp)
+        old = self._xp.get(player_id)
+        if old == xp:
+            return
+        if old is not None:
+            self.remove(player_id)
+        if xp >= self._tree.size:
+            self._grow(xp)
+        self._xp[player_id] = xp
+        self._buckets.setdefault(xp, set()).add(player_id)
+        self._tree.add(xp, 1)
+
+    def remove(self, player_id: int) -> None:
+        xp = self._xp.pop(player_id, None)
+        if xp is None:
+            return
+        bucket = self._buckets[xp]
+        bucket.discard(player_id)
+        if not bucket:
+            del self._buckets[xp]
+        self._tree.add(xp, -1)
+
+    def xp(self, player_id: int) -> Optional[int]:
+        return self._xp.get(player_id)
+
+    def rank(self, player_id: int) -> Optional[int]:
+        xp = self._xp.get(player_id)
+        if xp is None:
+            return None
+        return len(self._xp) - self._tree.prefix(xp) + 1
+
+    def top(self, limit: int) -> List[Tuple[int, int, int]]:
+        """(місце, гравець, XP) від найбільшого XP"""
+        entries = []
+        remaining = len(self._xp)
+        while remaining and len(entries) < limit:
+            xp = self._tree.find(remaining)
+            bucket = self._buckets[xp]
+            rank = len(self._xp) - remaining + 1
+            for player_id in sorted(bucket)[: limit - len(entries)]:
+                entries.append((rank, player_id, xp))
+            remaining -= len(bucket)
+        return entries
+
+class Leaderboards:
+    """Загальний індекс і по одному на клас; оновлюються після commit відповіді"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = RankIndex()
+        self._classes: Dict[str, RankIndex] = {}
+        self._players: Dict[int, Tuple[str, Optional[str], int]] = {}  # id -> (username, клас, рівень)
+        self._ids: Dict[str, int] = {}
+
+    def update(self, player_id: int, username: str, classroom: Optional[str], xp: int, level: int) -> None:
+        with self._lock:
+            previous = self._players.get(player_id)
+            if previous is not None and previous[1] != classroom and previous[1] in self._classes:
+                # Гравець перейшов до іншого класу
+                self._classes[previous[1]].remove(player_id)
+            self._players[player_id] = (username, classroom, level)
+            self._ids[username] = player_id
+            self._global.set(player_id, xp)
+            if classroom:
+                self._classes.setdefault(classroom, RankIndex()).set(player_id, xp)
+
+    def rebuild(self, db: Session) -> int:
+        rows = (
+            db.query(models.PlayerStats.owner_id, models.User.username, models.User.classroom,
+                     models.PlayerStats.xp, models.PlayerStats.level)
+            .join(models.User, models.User.id == models.PlayerStats.owner_id)
+            .all()
+        )
+        with self._lock:
+            self._global = RankIndex()
+            self._classes = {}
+            self._players = {}
+            self._ids = {}
+        for row in rows:
+            self.update(*row)
+        return len(rows)
+
+    def classroom_of(self, username: str) -> Optional[str]:
+        with self._lock:
+            player_id = self._ids.get(username)
+            return self._players[player_id][1] if player_id is not None else None
+
+    def _entry(self, rank: int, player_id: int, xp: int) -> dict:
+        username, _, level = self._players[player_id]
+        return {"rank": rank, "username": username, "xp": xp, "level": level}
+
+    def board(self, classroom: Optional[str], limit: int, username: Optional[str] = None) -> dict:
+        """Перші limit гравців і місце username (загальна таблиця, якщо classroom не задано)"""
+        with self._lock:
+            index = self._global if classroom is None else self._classes.get(classroom, RankIndex())
+            me = None
+            player_id = self._ids.get(username)
+            if player_id is not None:
+                rank = index.rank(player_id)
+                if rank is not None:
+                    me = self._entry(rank, player_id, index.xp(player_id))
+            return {
+                "classroom": classroom,
+                "total": len(index),
+                "entries": [self._entry(*entry) for entry in index.top(limit)],
+                "me": me,
+            }
+
+# Глобальні таблиці лідерів
+leaderboards = Leaderboards()
+
+def warm_leaderboards() -> None:
+    """Відновлює таблиці з бази при старті сервера"""
+    db = session.SessionLocal()
+    try:
+        leaderboards.rebuild(db)
+    finally:
+        db.close()
@@ -1,8 +1,13 @@
 import random
+from functools import lru_cache
 from app.schemas.battle import Problem
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .progressive_algebra_engine import AdaptiveAlgebraEngine
-from .geometry_service import generate_geometry_problem, generate_geometric_titan_encounter
+from .geometry_service import generate_geometry_problem, generate_geometric_titan_encounter, geometry_generator
+from .problem_identity import problem_fingerprint
+from .recent_problems import recent_problems
+from .problem_space import ProblemSpace, SpaceSegment, space_walker
+from .difficulty_index import difficulty_index, difficulty_targets
 
 class ConceptContext:
     """Контекст для математичних концепцій у світі MathMancers"""
@@ -137,9 +142,71 @@ class StoryBasedProblem:
             }.get(self.context, 1)
         }
 
-def generate_problem(topic: str, level: int = 1, player_id: int = None) -> Problem:
-    """Оновлений генератор з підтримкою геометрії"""
-    
+# Скільки разів перегенеровувати задачу, яку гравець щойно бачив
+MAX_DEDUP_RETRIES = 8
+
+# Допуск складності за замовчуванням для запитів до індексу
+DIFFICULTY_TOLERANCE = 0.1
+
+def generate_problem(topic: str, level: int = 1, player_id: int = None,
+                     difficulty: float = None) -> Problem:
+    """
+    Оновлений генератор з підтримкою геометрії. Без явної складності
+    гравець отримує задачу під свою адаптивну ціль (difficulty_targets)
+    """
+    if difficulty is None and player_id is not None:
+        difficulty = difficulty_targets.target(player_id, topic)
+
+    # Адаптивний запит "задача складності d" обслуговується з індексу
+    if difficulty is not None:
+        problem = _problem_at_difficulty(topic, difficulty, player_id)
+        if problem is not None:
+            return problem
+
+    problem = _generate_unique(topic, level, player_id)
+    difficulty_index.observe(topic, problem)
+    return problem
+
+def _problem_at_difficulty(topic: str, difficulty: float, player_id: int = None) -> Optional[Problem]:
+    if player_id is None:
+        return difficulty_index.problem_at(topic, difficulty, DIFFICULTY_TOLERANCE)
+
+    recent = recent_problems.for_player(player_id)
+    problem = difficulty_index.problem_at(
+        topic, difficulty, DIFFICULTY_TOLERANCE,
+        accept=lambda candidate: not recent.seen(problem_fingerprint(topic, candidate.data))
+    )
+    if problem is not None:
+        recent.add(problem_fingerprint(topic, problem.data))
+    return problem
+
+def _generate_unique(topic: str, level: int, player_id: int = None) -> Problem:
+    if player_id is None:
+        return _generate_for_topic(topic, level, player_id)
+
+    recent = recent_problems.for_player(player_id)
+
+    # Скінченні простори обходимо без повторень
+    space = problem_space_for(topic, level)
+    if space is not None:
+        problem = _generate_from_space(player_id, topic, level, space)
+        recent.add(problem_fingerprint(topic, problem.data))
+        return problem
+
+    # Уникаємо повторів: звіряємося з нещодавніми задачами гравця
+    for _ in range(MAX_DEDUP_RETRIES):
+        problem = _generate_for_topic(topic, level, player_id)
+        fingerprint = problem_fingerprint(topic, problem.data)
+        if not recent.seen(fingerprint):
+            break
+    recent.add(fingerprint)
+    return problem
+
+def warm_difficulty_index():
+    """Наповнює індекс складності при старті застосунку"""
+    difficulty_index.warm(_generate_for_topic)
+
+def _generate_for_topic(topic: str, level: int, player_id: int = None) -> Problem:
     if topic == "addition":
         return _generate_conceptual_addition(level)
     elif topic == "subtraction":
@@ -153,19 +220,27 @@ def generate_problem(topic: str, level: int = 1, player_id: int = None) -> Probl
     else:
         return _generate_conceptual_addition(level)
 
+# Діапазони операндів за смугами рівнів: [рівень 1, рівні 2-3, рівні 4+]
+ADDITION_RANGES = [((1, 5), (1, 5)), ((3, 12), (3, 12)), ((10, 25), (10, 25))]
+MULTIPLICATION_RANGES = [((2, 5), (2, 5)), ((3, 8), (2, 7)), ((6, 12), (4, 9))]
+# Для віднімання: (діапазон num1, m), де num2 ∈ [m, num1 - m]
+SUBTRACTION_RANGES = [((6, 10), 1), ((15, 30), 5), ((25, 50), 10)]
+
+def level_band(level: int) -> int:
+    """Смуга складності арифметики: 0 - рівень 1, 1 - рівні 2-3, 2 - рівні 4+"""
+    if level == 1:
+        return 0
+    elif level <= 3:
+        return 1
+    return 2
+
 def _generate_conceptual_addition(level: int) -> Problem:
     """Генерує задачі на додавання з ігровим контекстом"""
     
     # Адаптивна складність
-    if level == 1:
-        num1 = random.randint(1, 5)
-        num2 = random.randint(1, 5)
-    elif level <= 3:
-        num1 = random.randint(3, 12)
-        num2 = random.randint(3, 12)
-    else:
-        num1 = random.randint(10, 25)
-        num2 = random.randint(10, 25)
+    (min1, max1), (min2, max2) = ADDITION_RANGES[level_band(level)]
+    num1 = random.randint(min1, max1)
+    num2 = random.randint(min2, max2)
     
     answer = num1 + num2
     
@@ -176,15 +251,9 @@ def _generate_conceptual_subtraction(level: int) -> Problem:
     """Генерує задачі на віднімання з акцентом на некомутативність"""
     
     # Завжди num1 > num2 для уникнення від'ємних результатів
-    if level == 1:
-        num1 = random.randint(6, 10)
-        num2 = random.randint(1, num1 - 1)
-    elif level <= 3:
-        num1 = random.randint(15, 30)
-        num2 = random.randint(5, num1 - 5)
-    else:
-        num1 = random.randint(25, 50)
-        num2 = random.randint(10, num1 - 10)
+    (min1, max1), margin = SUBTRACTION_RANGES[level_band(level)]
+    num1 = random.randint(min1, max1)
+    num2 = random.randint(margin, num1 - margin)
     
     answer = num1 - num2
     
@@ -194,33 +263,69 @@ def _generate_conceptual_subtraction(level: int) -> Problem:
 def _generate_conceptual_multiplication(level: int) -> Problem:
     """Генерує задачі на множення з візуальним контекстом формацій"""
     
-    if level == 1:
-        num1 = random.randint(2, 5)
-        num2 = random.randint(2, 5)
-    elif level <= 3:
-        num1 = random.randint(3, 8)
-        num2 = random.randint(2, 7)
-    else:
-        num1 = random.randint(6, 12)
-        num2 = random.randint(4, 9)
+    (min1, max1), (min2, max2) = MULTIPLICATION_RANGES[level_band(level)]
+    num1 = random.randint(min1, max1)
+    num2 = random.randint(min2, max2)
     
     answer = num1 * num2
     
     story_problem = StoryBasedProblem("multiplication", num1, num2, answer)
     return story_problem.to_problem()
 
+def _geometry_challenge_types(level: int) -> List[str]:
+    """Визначаємо тип виклику залежно від рівня"""
+    if level <= 2:
+        return ["area", "perimeter"]
+    return ["area", "perimeter", "pythagorean"]
+
 def _generate_enhanced_geometry(level: int) -> Problem:
     """Генерує складні геометричні задачі з інтерактивними елементами"""
     
-    # Визначаємо тип виклику залежно від рівня
-    if level <= 2:
-        challenge_types = ["area", "perimeter"]
-    else:
-        challenge_types = ["area", "perimeter", "pythagorean"]
-    
-    challenge_type = random.choice(challenge_types)
+    challenge_type = random.choice(_geometry_challenge_types(level))
     return generate_geometry_problem(level, challenge_type)
 
+def problem_space_for(topic: str, level: int) -> Optional[ProblemSpace]:
+    """Скінченний простір задач теми на рівні (None - тема не перелічується)"""
+    if topic in ("addition", "subtraction", "multiplication"):
+        return _arithmetic_space(topic, level_band(level))
+    if topic == "geometry":
+        return _geometry_space(min(max(level, 1), 4), tuple(_geometry_challenge_types(level)))
+    # Алгебру генерує адаптивний движок за майстерністю учня
+    return None
+
+@lru_cache(maxsize=None)
+def _arithmetic_space(topic: str, band: int) -> ProblemSpace:
+    contexts = ConceptContext.STORY_CONTEXTS[topic]
+    if topic == "subtraction":
+        (min1, max1), margin = SUBTRACTION_RANGES[band]
+        dims = [range(min1, max1 + 1), range(margin, max1 - margin + 1), contexts]
+        valid = lambda v: v[1] <= v[0] - margin
+    else:
+        ranges = ADDITION_RANGES if topic == "addition" else MULTIPLICATION_RANGES
+        (min1, max1), (min2, max2) = ranges[band]
+        dims = [range(min1, max1 + 1), range(min2, max2 + 1), contexts]
+        valid = None
+    return ProblemSpace((topic, band), [SpaceSegment(topic, dims, valid)])
+
+@lru_cache(maxsize=None)
+def _geometry_space(difficulty: int, challenge_types: tuple) -> ProblemSpace:
+    return geometry_generator.problem_space(difficulty, list(challenge_types))
+
+def _generate_from_space(player_id: int, topic: str, level: int, space: ProblemSpace) -> Problem:
+    """Наступна задача з перестановки простору гравця"""
+    tag, values = space_walker.next_values(player_id, space)
+
+    if topic == "geometry":
+        return geometry_generator.build_from_space(tag, values, level)
+
+    num1, num2, context = values
+    answer = {
+        "addition": num1 + num2,
+        "subtraction": num1 - num2,
+        "multiplication": num1 * num2,
+    }[topic]
+    return StoryBasedProblem(topic, num1, num2, answer, context).to_problem()
+
 # Створюємо глобальний екземпляр адаптивного движка
 adaptive_engine = AdaptiveAlgebraEngine()
 
@@ -296,11 +401,18 @@ def _generate_algebra_problem(level: int, player_id: int = None) -> Problem:
         answer=x
     )
 
-def generate_special_encounter(enemy_name: str, player_level: int) -> tuple:
+def generate_special_encounter(enemy_name: str, player_level: int, player_id: int = None,
+                               difficulty: float = None) -> tuple:
     """Генерує спеціальні зустрічі з унікальними ворогами"""
     
     if enemy_name == "Geometric Titan" or "geometric" in enemy_name.lower():
-        return generate_geometric_titan_encounter(player_level)
+        # Задача Титана - теж під адаптивну ціль гравця, якщо вона є
+        if difficulty is None and player_id is not None:
+            difficulty = difficulty_targets.target(player_id, "geometry")
+        problem = None
+        if difficulty is not None:
+            problem = _problem_at_difficulty("geometry", difficulty, player_id)
+        return generate_geometric_titan_encounter(player_level, problem)
     
     # Fallback для інших ворогів
     problem = generate_problem("addition", player_level)
@@ -0,0 +1,229 @@
+"""
+Офлайн-гра: підписані пакети задач і пакетне застосування відповідей
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import random
+import secrets
+import time
+from typing import Any, Dict, List, Tuple
+from sqlalchemy.orm import Session
+from app.auth import SECRET_KEY
+from app.core.ratelimit import offline_answer_limiter
+from app.db import models
+from app.schemas import battle as battle_schema
+from app.schemas.battle import Problem
+from . import math_service
+from .battle_service import BattleNotFound, apply_answer, get_or_create_stats, publish_answer, track_achievements
+
+PACK_TTL = 7 * 24 * 3600  # Пакет дійсний тиждень - учень може довго бути без мережі
+MAX_PACK_SIZE = 100
+# Поля задачі, що змінюються між кроками рівняння; зберігаються між синхронізаціями
+STEP_KEYS = ("current_step", "current_step_index", "equation_parts")
+
+class OfflinePackError(ValueError):
+    """Підроблена, чужа або неузгоджена синхронізація"""
+
+class OfflinePackExpired(OfflinePackError):
+    """Термін дії пакета минув"""
+
+class OfflineRateLimited(Exception):
+    """Забагато офлайн-відповідей за короткий час; retry_after - секунди"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many offline answers")
+        self.retry_after = retry_after
+
+def answer_allowance(problem: Problem) -> int:
+    """Скільки відповідей можна зарахувати задачі: по одній на крок рівняння, інакше одна"""
+    data = problem.data
+    if data.get("type") == "progressive_equation":
+        return max(1, sum(1 for step in data.get("balance_steps", []) if step.get("options")))
+    if data.get("type") == "equation":
+        return max(1, len(data.get("solution_steps", [])))
+    return 1
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(body: str) -> str:
+    return _b64(hmac.new(SECRET_KEY.encode("utf-8"), body.encode("ascii"), hashlib.sha256).digest())
+
+def seal(claims: Dict[str, Any]) -> str:
+    """
+    base64(JSON).HMAC-SHA256. Клієнт повертає печатку побайтно, тож підпис
+    не залежить від того, як JavaScript переформатує числа чи ключі задачі.
+    """
+    body = _b64(json.dumps(claims, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    return f"{body}.{_sign(body)}"
+
+def unseal(token: str) -> Dict[str, Any]:
+    body, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign(body)):
+        raise OfflinePackError("Invalid problem seal")
+    return json.loads(_unb64(body))
+
+def build_pack(db: Session, player_id: int, size: int) -> battle_schema.OfflinePack:
+    """Пакет задач для гри без мережі на рівні гравця; БД лише читається"""
+    enemies = db.query(models.Enemy).all()
+    if not enemies:
+        raise BattleNotFound("No enemies found in database")
+    player_stats = db.query(models.PlayerStats).filter(models.PlayerStats.owner_id == player_id).first()
+    level = player_stats.level if player_stats else 1
+
+    pack_id = secrets.token_urlsafe(12)
+    expires_at = int(time.time()) + PACK_TTL
+    generated = []
+    for _ in range(size):
+        enemy = random.choice(enemies)
+        generated.append((enemy, math_service.generate_problem(topic=enemy.math_topic, level=level, player_id=player_id)))
+
+    # Ліміти підписуються разом із задачею: a - відповідей на задачу, b - на весь пакет
+    allowances = [answer_allowance(problem) for _, problem in generated]
+    budget = sum(allowances)
+    problems = []
+    for index, ((enemy, problem), allowance) in enumerate(zip(generated, allowances)):
+        claims = {"p": pack_id, "u": player_id, "i": index, "e": enemy.id, "x": expires_at,
+                  "a": allowance, "b": budget, "q": problem.model_dump(mode="json")}
+        problems.append(battle_schema.OfflineProblem(index=index, enemy_id=enemy.id, problem=problem, seal=seal(claims)))
+
+    return battle_schema.OfflinePack(pack_id=pack_id, expires_at=expires_at, problems=problems)
+
+def _verified_problems(request: battle_schema.OfflineSync,
+                       player_id: int) -> Tuple[Dict[int, Tuple[int, Problem, int]], int]:
+    """Номер задачі -> (ворог, задача, ліміт відповідей) з перевірених печаток і ліміт пакета"""
+    now = time.time()
+    problems = {}
+    budget = 0
+    for token in request.seals:
+        claims = unseal(token)
+        if claims["p"] != request.pack_id or claims["u"] != player_id:
+            raise OfflinePackError("Seal does not belong to this pack")
+        if claims["x"] < now:
+            raise OfflinePackExpired("Offline pack has expired")
+        problems[claims["i"]] = (claims["e"], Problem.model_validate(claims["q"]), claims["a"])
+        budget = claims["b"]
+    return problems, budget
+
+def _skip_option_less_steps(problem: Problem) -> None:
+    """Кроки рівняння без варіантів (пояснення) клієнт гортає сам - робимо те саме при відтворенні"""
+    data = problem.data
+    steps = data.get("balance_steps")
+    if data.get("type") != "progressive_equation" or not steps:
+        return
+    step = data.get("current_step", 0)
+    while step < len(steps) - 1 and not steps[step].get("options"):
+        step += 1
+    data["current_step"] = step
+
+def sync_pack(db: Session, player_id: int, request: battle_schema.OfflineSync) -> battle_schema.OfflineSyncResult:
+    """
+    Відтворює офлайн-відповіді по порядку за тими самими правилами, що й
+    /battle/answer (досвід, рівні, майстерність у AdaptiveAlgebraEngine),
+    і фіксує все одним commit. Відповіді з seq, меншим за вже застосовані,
+    пропускаються, тож повтор синхронізації після обриву безпечний.
+    Кожна задача приймає не більше відповідей, ніж підписано в її печатці
+    (одну, або по одній на крок рівняння), а seq не виходить за ліміт пакета.
+    Крок рівняння зберігається разом із лічильником відповідей, тож рівняння,
+    розв'язане частинами в кількох синхронізаціях, продовжується з того ж кроку.
+    Уся перевірка виконується до першої відповіді - відхилений запит нічого не змінює.
+    """
+    problems, budget = _verified_problems(request, player_id)
+
+    progress = db.get(models.OfflinePackSync, request.pack_id)
+    if progress is not None and progress.player_id != player_id:
+        raise OfflinePackError("Seal does not belong to this pack")
+    applied_before = progress.applied if progress else 0
+    # Номер задачі -> {"n": кількість відповідей, "step": STEP_KEYS після останньої з них}
+    answered = {int(index): entry for index, entry in json.loads(progress.answered or "{}").items()} if progress else {}
+
+    answers = sorted(request.answers, key=lambda answer: answer.seq)
+    pending = [answer for answer in answers if answer.seq >= applied_before]
+    if [answer.seq for answer in pending] != list(range(applied_before, applied_before + len(pending))):
+        raise OfflinePackError(f"Answers must be consecutive starting from seq {applied_before}")
+    if any(answer.index not in problems for answer in pending):
+        raise OfflinePackError("Answer refers to a problem without a seal")
+    if pending and pending[-1].seq >= budget:
+        raise OfflinePackError(f"Pack accepts at most {budget} answers")
+    for answer in pending:
+        entry = answered.setdefault(answer.index, {"n": 0})
+        entry["n"] += 1
+        if entry["n"] > problems[answer.index][2]:
+            raise OfflinePackError(f"Too many answers for problem {answer.index}")
+
+    if pending:
+        retry_after = offline_answer_limiter.acquire(player_id, cost=len(pending))
+        if retry_after:
+            raise OfflineRateLimited(retry_after)
+
+    enemy_ids = {problems[answer.index][0] for answer in pending}
+    enemies = {enemy.id: enemy for enemy in db.query(models.Enemy).filter(models.Enemy.id.in_(enemy_ids))}
+    if len(enemies) != len(enemy_ids):
+        raise BattleNotFound("Enemy not found")
+
+    player_stats = get_or_create_stats(db, player_id)
+    start_level = player_stats.level
+    now_ms = int(time.time() * 1000)
+    correct = xp_gained = 0
+    applied: List[Tuple[Dict[str, Any], Dict[str, Any], models.Enemy, int, int]] = []
+    mastery = None  # Майстерність алгебри фіксується в publish_answer, після commit
+    for index, entry in answered.items():
+        if "step" in entry and index in problems:
+            problems[index][1].data.update(entry["step"])
+
+    for answer in pending:
+        enemy_id, problem, allowance = problems[answer.index]
+        _skip_option_less_steps(problem)
+        payload = battle_schema.AnswerPayload(
+            enemy_id=enemy_id,
+            problem=problem,
+            answer=answer.answer,
+            operation=answer.operation,
+            response_time_ms=answer.response_time_ms
+        )
+        # Наступна задача вже є в пакеті - не генеруємо її
+        outcome, event = apply_answer(player_id, enemies[enemy_id], player_stats, payload,
+                                      generate_next=False, mastery=mastery)
+        mastery = event["mastery"] or mastery
+        # apply_answer оцінює копію задачі - переносимо крок рівняння на наступну відповідь
+        if outcome["problem_delta"] is not None:
+            problem.data["current_step"] = outcome["problem_delta"].current_step
+        elif outcome["new_problem"] is not None:
+            problems[answer.index] = (enemy_id, outcome["new_problem"], allowance)
+        correct += outcome["is_correct"]
+        xp_gained += outcome["xp_gained"]
+        applied.append((event, outcome, enemies[enemy_id], player_stats.level, min(answer.answered_at or now_ms, now_ms)))
+
+    if pending:
+        if progress is None:
+            progress = models.OfflinePackSync(pack_id=request.pack_id, player_id=player_id, applied=0)
+            db.add(progress)
+        progress.applied = applied_before + len(pending)
+        for answer in pending:
+            data = problems[answer.index][1].data
+            answered[answer.index]["step"] = {key: data[key] for key in STEP_KEYS if key in data}
+        progress.answered = json.dumps(answered)
+        progress.synced_at = now_ms
+        db.commit()
+
+    unlocked = []
+    for event, outcome, enemy, level_after, answered_at in applied:
+        publish_answer(player_stats, event, created_at=answered_at)
+        # Офлайн-відповіді не належать поточному бою гравця - перемоги над ворогом не рахуються
+        unlocked += track_achievements(event, outcome, enemy.name, enemy.max_hp, level_after, in_battle=False)
+
+    return battle_schema.OfflineSyncResult(
+        applied=len(pending),
+        skipped=len(answers) - len(pending),
+        correct=correct,
+        xp_gained=xp_gained,
+        levels_gained=player_stats.level - start_level,
+        new_player_stats=player_stats,
+        achievements_unlocked=unlocked
+    )
@@ -0,0 +1,76 @@
+"""
+ETag статистики гравців: відповіді 304 на /player/me без звернення до бази
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from app.db import models
+
+def stats_etag(stats_id: int, version: int) -> str:
+    return f'"{stats_id}-{version}"'
+
+class PlayerStatsETagCache:
+    """
+    username -> (owner_id, ETag останньої відданої версії), LRU.
+    Кожна зміна PlayerStats піднімає "нижню межу" версії власника, тож
+    запис зі старішою версією (прочитаний паралельно із записом) не
+    потрапить у кеш і не дасть хибного 304. Межі - теж LRU на max_entries:
+    витіснити межу встигають лише max_entries новіших записів,
+    а паралельне читання закінчується значно раніше.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._owners: Dict[int, str] = {}
+        self._min_versions: "OrderedDict[int, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current_etag(self, username: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            self._entries.move_to_end(username)
+            return entry[2]
+
+    def put(self, username: str, stats: models.PlayerStats) -> str:
+        etag = stats_etag(stats.id, stats.version)
+        with self._lock:
+            if stats.version < self._min_versions.get(stats.owner_id, 0):
+                return etag
+
+            self._entries[username] = (stats.owner_id, stats.version, etag)
+            self._entries.move_to_end(username)
+            self._owners[stats.owner_id] = username
+            if len(self._entries) > self.max_entries:
+                _, (owner_id, _, _) = self._entries.popitem(last=False)
+                self._owners.pop(owner_id, None)
+                self._min_versions.pop(owner_id, None)
+        return etag
+
+    def invalidate(self, owner_id: int, new_version: int) -> None:
+        with self._lock:
+            if new_version > self._min_versions.get(owner_id, 0):
+                self._min_versions[owner_id] = new_version
+            self._min_versions.move_to_end(owner_id)
+            if len(self._min_versions) > self.max_entries:
+                self._min_versions.popitem(last=False)
+            username = self._owners.pop(owner_id, None)
+            if username is not None:
+                self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._min_versions.clear()
+
+# Глобальний кеш ETag статистики
+player_stats_cache = PlayerStatsETagCache()
+
+@event.listens_for(models.PlayerStats, "after_update")
+def _invalidate_on_update(mapper, connection, target):
+    player_stats_cache.invalidate(target.owner_id, target.version)
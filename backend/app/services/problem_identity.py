@@ -0,0 +1,59 @@
+"""
+Канонічна ідентичність задач: операнди та компактний відбиток (fingerprint)
+"""
+
+import hashlib
+from typing import Dict, Any, Tuple
+
+def problem_operands(data: Dict[str, Any]) -> Tuple:
+    """Повертає кортеж операндів, що однозначно задають математичну суть задачі"""
+
+    data = data or {}
+
+    # Сюжетні задачі (додавання, віднімання, множення)
+    if "num1" in data and "num2" in data:
+        return (data["num1"], data["num2"])
+
+    # Рівняння (стара та прогресивна алгебра)
+    parts = data.get("equation_parts")
+    if parts:
+        return (parts.get("a"), parts.get("b"), parts.get("c"))
+
+    # Геометрія
+    if data.get("type") == "geometry":
+        if "given_values" in data:
+            given = data["given_values"]
+            return (data.get("unknown_side"),) + tuple(sorted(given.items()))
+
+        shape = data.get("shape", {})
+        shape_type = shape.get("type")
+        if shape_type == "rectangle":
+            return (shape_type, shape.get("width"), shape.get("height"))
+        if shape_type == "circle":
+            return (shape_type, shape.get("radius"))
+        if shape_type == "triangle":
+            sides = shape.get("sides", {})
+            return (shape_type, sides.get("a"), sides.get("b"), sides.get("c"))
+
+    # Стара геометрія (fallback)
+    if "width" in data and "height" in data:
+        return (data.get("shape"), data["width"], data["height"])
+
+    return ()
+
+def problem_context(data: Dict[str, Any]) -> str:
+    """Повертає сюжетний контекст задачі (для геометрії - разом з типом виклику)"""
+    data = data or {}
+    context = data.get("context", "")
+    if data.get("challenge_type"):
+        return f"{data['challenge_type']}:{context}"
+    return context
+
+def problem_fingerprint(topic: str, data: Dict[str, Any]) -> int:
+    """
+    Стабільний 63-бітний відбиток задачі за (тема, операнди, контекст).
+    Вміщується у SQLite INTEGER і не залежить від тексту чи порядку ключів.
+    """
+    key = repr((topic, problem_operands(data), problem_context(data))).encode("utf-8")
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
@@ -0,0 +1,157 @@
+"""
+Перелічені простори задач і обхід без повторень через повноперіодну перестановку
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+class SpaceSegment:
+    """
+    Добуток незалежних вимірів (діапазони операндів, контексти) з
+    необов'язковою умовою валідності для залежних операндів.
+    """
+
+    def __init__(self, tag: str, dims: Sequence[Sequence], valid: Optional[Callable[[tuple], bool]] = None,
+                 weight: float = 1.0):
+        self.tag = tag
+        self.dims = [tuple(dim) for dim in dims]
+        self.valid = valid
+        self.weight = weight
+
+        self.size = 1
+        for dim in self.dims:
+            self.size *= len(dim)
+
+    def decode(self, index: int) -> Optional[tuple]:
+        """Індекс -> значення вимірів (змішана система числення) або None, якщо точка невалідна"""
+        values = []
+        for dim in reversed(self.dims):
+            index, digit = divmod(index, len(dim))
+            values.append(dim[digit])
+        values.reverse()
+        values = tuple(values)
+
+        if self.valid is not None and not self.valid(values):
+            return None
+        return values
+
+class ProblemSpace:
+    """Простір задач (тема, смуга рівня) як набір сегментів з вагами вибору"""
+
+    def __init__(self, key: tuple, segments: List[SpaceSegment]):
+        self.key = key
+        self.segments = segments
+        self._weights = [segment.weight for segment in segments]
+
+    def pick_segment(self) -> SpaceSegment:
+        if len(self.segments) == 1:
+            return self.segments[0]
+        return random.choices(self.segments, weights=self._weights)[0]
+
+def _splitmix64(value: int) -> int:
+    value = (value + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+class FullPeriodPermutation:
+    """
+    Бієкція позицій [0, m) -> індекси [0, m), m = 2^k >= size.
+    LCG з a ≡ 1 (mod 4) та непарним c має повний період (Hull–Dobell),
+    а непарне множення і xorshift додатково перемішують молодші біти.
+    Індекси >= size пропускаються (cycle walking).
+    """
+
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.modulus = 1 << bits
+        self._mask = self.modulus - 1
+        self._shift = max(1, bits // 2)
+
+        h1 = _splitmix64(seed)
+        h2 = _splitmix64(h1)
+        h3 = _splitmix64(h2)
+        self.a = ((h1 & self._mask) & ~3) | 1
+        self.c = (h2 & self._mask) | 1
+        self.mult = (h3 & self._mask) | 1
+        self.start = (h3 >> 32) & self._mask
+
+    def state_at(self, position: int) -> int:
+        """Стан LCG після position кроків за O(log position)"""
+        # Степінь афінного відображення x -> a*x + c
+        mul, add = 1, 0
+        base_mul, base_add = self.a, self.c
+        while position:
+            if position & 1:
+                mul, add = (base_mul * mul) & self._mask, (base_mul * add + base_add) & self._mask
+            base_mul, base_add = (base_mul * base_mul) & self._mask, (base_mul * base_add + base_add) & self._mask
+            position >>= 1
+        return (mul * self.start + add) & self._mask
+
+    def step(self, state: int) -> int:
+        return (self.a * state + self.c) & self._mask
+
+    def scramble(self, state: int) -> int:
+        value = (state * self.mult) & self._mask
+        return value ^ (value >> self._shift)
+
+class ProblemSpaceWalker:
+    """
+    Стан гравця для кожного сегмента - лише (seed, position).
+    Гравець проходить увесь сегмент, перш ніж будь-яка задача повториться;
+    після повного кола seed збільшується і порядок стає новим.
+    """
+
+    def __init__(self, max_states: int = 100000):
+        self.max_states = max_states
+        self._states: "OrderedDict[tuple, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def next_values(self, player_id: int, space: ProblemSpace) -> Tuple[str, tuple]:
+        """Наступна невідвідана точка простору для гравця: (тег сегмента, значення)"""
+        segment = space.pick_segment()
+        key = (player_id,) + space.key + (segment.tag,)
+
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = [random.getrandbits(32), 0]
+                self._states[key] = state
+                if len(self._states) > self.max_states:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(key)
+
+            seed, position = state
+            permutation = FullPeriodPermutation(segment.size, seed)
+            lcg_state = permutation.state_at(position)
+
+            steps = 0
+            while True:
+                steps += 1
+                if steps > 2 * permutation.modulus:
+                    raise ValueError(f"Problem space segment {segment.tag} has no valid points")
+                if position >= permutation.modulus:
+                    # Коло завершено - новий порядок обходу
+                    seed, position = seed + 1, 0
+                    permutation = FullPeriodPermutation(segment.size, seed)
+                    lcg_state = permutation.state_at(0)
+
+                index = permutation.scramble(lcg_state)
+                lcg_state = permutation.step(lcg_state)
+                position += 1
+
+                if index < segment.size:
+                    values = segment.decode(index)
+                    if values is not None:
+                        break
+
+            state[0], state[1] = seed, position
+
+        return segment.tag, values
+
+# Глобальний обхідник просторів задач
+space_walker = ProblemSpaceWalker()
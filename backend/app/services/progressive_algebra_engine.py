@@ -2,6 +2,7 @@
 Прогресивна система навчання алгебри з використанням сучасних педагогічних методик
 """
 
+import copy
 import random
 from typing import Dict, List, Any, Optional, Tuple
 from enum import Enum
@@ -9,6 +10,13 @@ from dataclasses import dataclass
 from app.schemas.battle import Problem
 from .error_analysis_engine import MathematicalMisconceptionDetector, PersonalizedRemediation
 
+# Пороги загальної майстерності для рівнів підтримки (GUIDED < 0.4 <= COLLABORATIVE < 0.7 <= INDEPENDENT)
+STAGE_THRESHOLDS = (0.4, 0.7)
+
+# Умови готовності до наступного рівня
+READY_MASTERY_THRESHOLD = 0.7
+READY_STREAK = 3
+
 class LearningStage(Enum):
     GUIDED = "guided"           # Повне керівництво з поясненнями
     COLLABORATIVE = "collaborative"  # Підказки та часткова допомога
@@ -228,9 +236,9 @@ class AdaptiveAlgebraEngine:
         # Визначаємо рівень підтримки
         overall_mastery = (student.balance_understanding + student.inverse_operations + student.equation_solving) / 3
         
-        if overall_mastery < 0.4:
+        if overall_mastery < STAGE_THRESHOLDS[0]:
             learning_stage = LearningStage.GUIDED
-        elif overall_mastery < 0.7:
+        elif overall_mastery < STAGE_THRESHOLDS[1]:
             learning_stage = LearningStage.COLLABORATIVE
         else:
             learning_stage = LearningStage.INDEPENDENT
@@ -305,13 +313,23 @@ class AdaptiveAlgebraEngine:
     def process_student_response(self, player_id: int, problem_data: Dict, 
                                 chosen_operation: str) -> Dict[str, Any]:
         """Обробляє відповідь студента з детальним аналізом"""
-        
-        student = self.student_data.get(player_id, StudentMastery())
+        response, student = self.grade_student_response(player_id, problem_data, chosen_operation)
+        self.commit_mastery(player_id, student)
+        return response
+
+    def grade_student_response(self, player_id: int, problem_data: Dict, chosen_operation: str,
+                               student: Optional[StudentMastery] = None) -> Tuple[Dict[str, Any], StudentMastery]:
+        """
+        Як process_student_response, але збережену майстерність не змінює:
+        повертає відповідь і оновлену копію (від student або збереженої),
+        яку фіксує commit_mastery
+        """
+        student = copy.deepcopy(student or self.student_data.get(player_id, StudentMastery()))
         steps = problem_data.get("balance_steps", [])
         current_step_idx = problem_data.get("current_step", 0)
         
         if current_step_idx >= len(steps):
-            return {"error": "Invalid step index"}
+            return {"error": "Invalid step index"}, student
             
         current_step = steps[current_step_idx]
         student.total_attempts += 1
@@ -374,8 +392,39 @@ class AdaptiveAlgebraEngine:
                 "next_step": current_step_idx  # Повторюємо той самий крок
             }
             
+        return response, student
+
+    def commit_mastery(self, player_id: int, student: StudentMastery) -> None:
+        """Зберігає майстерність, обчислену grade_student_response"""
         self.student_data[player_id] = student
-        return response
+
+    def mastery_snapshot(self, player_id: int, student: Optional[StudentMastery] = None) -> Dict[str, Any]:
+        """Знімок числових показників майстерності (для обчислення дельт)"""
+        student = student or self.student_data.get(player_id, StudentMastery())
+        return {
+            "balance_understanding": student.balance_understanding,
+            "inverse_operations": student.inverse_operations,
+            "equation_solving": student.equation_solving,
+            "consecutive_correct": student.consecutive_correct,
+            "total_attempts": student.total_attempts,
+            "error_patterns": dict(student.error_patterns),
+        }
+
+    def mastery_delta(self, player_id: int, before: Dict[str, Any],
+                      student: Optional[StudentMastery] = None) -> Dict[str, Any]:
+        """Зміни майстерності відносно знімка: прирости чисел та нові лічильники помилок"""
+        after = self.mastery_snapshot(player_id, student)
+        delta = {
+            field: round(after[field] - before[field], 6)
+            for field in after if field != "error_patterns" and after[field] != before[field]
+        }
+        changed_errors = {
+            error_type: count for error_type, count in after["error_patterns"].items()
+            if before["error_patterns"].get(error_type) != count
+        }
+        if changed_errors:
+            delta["error_patterns"] = changed_errors
+        return delta
 
     def _update_mastery_on_success(self, student: StudentMastery, step_type: str):
         """Оновлює майстерність при правильній відповіді"""
@@ -462,9 +511,9 @@ class AdaptiveAlgebraEngine:
             "equation_mastery": student.equation_solving,
             "streak": student.consecutive_correct,
             "ready_for_next_level": (
-                student.balance_understanding > 0.7 and 
-                student.inverse_operations > 0.7 and
-                student.consecutive_correct >= 3
+                student.balance_understanding > READY_MASTERY_THRESHOLD and 
+                student.inverse_operations > READY_MASTERY_THRESHOLD and
+                student.consecutive_correct >= READY_STREAK
             )
         }
 
@@ -0,0 +1,323 @@
+"""
+Рейди: клас проти одного великого ворога зі спільним HP
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+from app.core.counters import ShardedCounter
+from app.db import models, session
+from app.schemas import battle as battle_schema
+from .leaderboard import leaderboards
+from .player_cache import player_stats_cache
+
+TICK_INTERVAL = 0.5        # Частота розсилки HP, с
+CHECKPOINT_INTERVAL = 5.0  # Як часто шкода зберігається в базу, с
+HEARTBEAT_INTERVAL = 15.0
+RAID_KILL_XP = 50          # Нагорода кожному учаснику перемоги
+TOP_DAMAGE = 5
+RESULT_TTL = 60.0          # Скільки переможений рейд лишається доступним для глядачів, с
+
+class RaidConflict(ValueError):
+    """У класу вже є активний рейд"""
+
+def _sse(event: str, payload: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+class _Watcher:
+    __slots__ = ("wakeup",)
+
+    def __init__(self):
+        self.wakeup = asyncio.Event()
+
+class LiveRaid:
+    """Стан рейду в пам'яті. Удари лише додаються в шардований лічильник"""
+
+    def __init__(self, raid: models.Raid, enemy: battle_schema.Enemy):
+        self.id = raid.id
+        self.classroom = raid.classroom
+        self.enemy = enemy
+        self.max_hp = raid.max_hp
+        self.damage = raid.damage
+        self.persisted_damage = raid.damage
+        self.hits = ShardedCounter()
+        self.participants: Dict[int, List] = {}  # гравець -> [username, шкода]
+        self.defeated = raid.status == "defeated"
+        self.defeated_at = 0.0  # time.monotonic() перемоги
+        self.frame = b""
+        self.frame_version = 0
+        self.watchers: Set[_Watcher] = set()
+
+    @property
+    def hp(self) -> int:
+        return max(0, self.max_hp - self.damage)
+
+class RaidHub:
+    """
+    Удари з потоків обробки запитів лише додаються в ShardedCounter рейду -
+    жодного запису в базу на удар. Раз на TICK_INTERVAL цикл подій забирає
+    накопичене, оновлює HP і розсилає один кадр глядачам; раз на
+    CHECKPOINT_INTERVAL шкода зберігається в таблицю raids. Перемога
+    фіксується умовним UPDATE ... WHERE status = 'active', тож нагорода
+    видається рівно один раз навіть за кількох процесів сервера.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._raids: Dict[int, LiveRaid] = {}
+        self._by_class: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_checkpoint = time.monotonic()
+
+        self.hits = 0
+        self.checkpoints = 0
+        self.kills = 0
+
+    def _register(self, raid: models.Raid, enemy: battle_schema.Enemy) -> LiveRaid:
+        live = LiveRaid(raid, enemy)
+        live.frame = _sse("raid", self._state(live))
+        with self._lock:
+            self._raids[live.id] = live
+            if not live.defeated:
+                self._by_class[live.classroom] = live.id
+        return live
+
+    def load(self, db: Session) -> int:
+        """Відновлює активні рейди з останньої контрольної точки"""
+        rows = (
+            db.query(models.Raid, models.Enemy)
+            .join(models.Enemy, models.Enemy.id == models.Raid.enemy_id)
+            .filter(models.Raid.status == "active")
+            .all()
+        )
+        for raid, enemy in rows:
+            self._register(raid, battle_schema.Enemy.model_validate(enemy))
+        return len(rows)
+
+    def open(self, db: Session, classroom: str, enemy: models.Enemy, max_hp: int) -> LiveRaid:
+        with self._lock:
+            if classroom in self._by_class:
+                raise RaidConflict("Classroom already has an active raid")
+        enemy_state = battle_schema.Enemy.model_validate(enemy)
+        raid = models.Raid(classroom=classroom, enemy_id=enemy.id, max_hp=max_hp, damage=0,
+                           status="active", started_at=int(time.time() * 1000))
+        db.add(raid)
+        db.commit()
+        return self._register(raid, enemy_state)
+
+    def get(self, raid_id: int) -> Optional[LiveRaid]:
+        return self._raids.get(raid_id)
+
+    def active_for(self, classroom: Optional[str]) -> Optional[LiveRaid]:
+        raid_id = self._by_class.get(classroom)
+        return self._raids.get(raid_id) if raid_id is not None else None
+
+    def hit(self, raid_id: int, classroom: Optional[str], enemy_id: int,
+            player_id: int, username: str, damage: int) -> bool:
+        """O(1), без бази; викликається з потоків обробки відповідей"""
+        raid = self._raids.get(raid_id)
+        if raid is None or raid.defeated or raid.classroom != classroom:
+            return False
+        # Удар по іншому (слабшому) ворогу не повинен знімати HP боса
+        if raid.enemy.id != enemy_id:
+            return False
+        raid.hits.add((player_id, username), damage)
+        self.hits += 1
+        return True
+
+    def _state(self, raid: LiveRaid) -> Dict[str, Any]:
+        return {
+            "raid_id": raid.id,
+            "classroom": raid.classroom,
+            "max_hp": raid.max_hp,
+            "hp": raid.hp,
+            "attackers": len(raid.participants),
+            "status": "defeated" if raid.defeated else "active",
+        }
+
+    def state(self, raid: LiveRaid) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._state(raid), enemy=raid.enemy)
+
+    def tick(self) -> List[LiveRaid]:
+        """Забирає удари з лічильників; повертає рейди, HP яких дійшло до нуля"""
+        killed = []
+        for raid in list(self._raids.values()):
+            if raid.defeated:
+                if not raid.watchers and time.monotonic() - raid.defeated_at > RESULT_TTL:
+                    with self._lock:
+                        self._raids.pop(raid.id, None)
+                continue
+            total, by_player = raid.hits.drain()
+            if total:
+                with self._lock:
+                    raid.damage += total
+                    for (player_id, username), damage in by_player.items():
+                        entry = raid.participants.setdefault(player_id, [username, 0])
+                        entry[1] += damage
+                    raid.frame = _sse("raid", self._state(raid))
+                    raid.frame_version += 1
+                self._wake(raid)
+            # Перемога фіксується в checkpoint; якщо він не вдався - повторимо на наступному тіку
+            if raid.damage >= raid.max_hp:
+                killed.append(raid)
+        return killed
+
+    def _wake(self, raid: LiveRaid) -> None:
+        for watcher in raid.watchers:
+            watcher.wakeup.set()
+
+    def checkpoint(self, killed: List[LiveRaid]) -> None:
+        """Зберігає шкоду та фіксує перемоги; виконується в пулі потоків"""
+        db = session.SessionLocal()
+        try:
+            for raid in list(self._raids.values()):
+                if raid.defeated or raid in killed or raid.damage == raid.persisted_damage:
+                    continue
+                damage = raid.damage
+                db.execute(
+                    update(models.Raid)
+                    .where(models.Raid.id == raid.id, models.Raid.status == "active")
+                    .values(damage=damage)
+                )
+                raid.persisted_damage = damage
+            db.commit()
+            self.checkpoints += 1
+
+            for raid in killed:
+                self._resolve_kill(db, raid)
+        finally:
+            db.close()
+
+    def _resolve_kill(self, db: Session, raid: LiveRaid) -> None:
+        now = int(time.time() * 1000)
+        claimed = db.execute(
+            update(models.Raid)
+            .where(models.Raid.id == raid.id, models.Raid.status == "active")
+            .values(status="defeated", damage=raid.damage, defeated_at=now)
+        ).rowcount == 1
+
+        rewards = []
+        with self._lock:
+            participants = dict(raid.participants)
+        if claimed and participants:
+            # Один UPDATE на всіх учасників; версія зростає, як і при записі через ORM.
+            # Підвищення рівня - те саме правило, що й у apply_answer; у SET усі
+            # вирази бачать старі значення рядка
+            stats = models.PlayerStats
+            levelled = stats.xp + RAID_KILL_XP >= 100 * stats.level
+            rewards = db.execute(
+                update(stats)
+                .where(stats.owner_id.in_(participants))
+                .values(
+                    xp=stats.xp + RAID_KILL_XP,
+                    level=case((levelled, stats.level + 1), else_=stats.level),
+                    max_hp=case((levelled, stats.max_hp + 10), else_=stats.max_hp),
+                    hp=case((levelled, stats.max_hp + 10), else_=stats.hp),
+                    math_power=case((levelled, stats.math_power + 5), else_=stats.math_power),
+                    version=stats.version + 1,
+                )
+                .returning(stats.owner_id, stats.version, stats.xp, stats.level)
+                .execution_options(synchronize_session=False)
+            ).all()
+        db.commit()
+
+        for owner_id, version, xp, level in rewards:
+            player_stats_cache.invalidate(owner_id, version)
+            leaderboards.update(owner_id, participants[owner_id][0], raid.classroom, xp, level)
+
+        top = sorted(participants.items(), key=lambda item: -item[1][1])[:TOP_DAMAGE]
+        with self._lock:
+            raid.defeated = True
+            raid.defeated_at = time.monotonic()
+            raid.persisted_damage = raid.damage
+            if self._by_class.get(raid.classroom) == raid.id:
+                del self._by_class[raid.classroom]
+            raid.frame = _sse("defeated", dict(
+                self._state(raid),
+                reward_xp=RAID_KILL_XP if claimed else 0,
+                top=[{"username": username, "damage": damage} for _, (username, damage) in top],
+            ))
+            raid.frame_version += 1
+        if claimed:
+            self.kills += 1
+
+    async def _finish_kills(self, killed: List[LiveRaid]) -> None:
+        await run_in_threadpool(self.checkpoint, killed)
+        self._last_checkpoint = time.monotonic()
+        for raid in killed:
+            self._wake(raid)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TICK_INTERVAL)
+            try:
+                killed = self.tick()
+                if killed or time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL:
+                    await self._finish_kills(killed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # База тимчасово недоступна - шкода лишається в пам'яті до наступної спроби
+                print(f"Raid tick failed: {exc}")
+
+    async def stream(self, raid: LiveRaid, is_disconnected: Callable[[], Awaitable[bool]]):
+        """SSE одного глядача: останній кадр рейду на кожен тік, проміжні пропускаються"""
+        watcher = _Watcher()
+        raid.watchers.add(watcher)
+        try:
+            seen = None
+            while True:
+                watcher.wakeup.clear()
+                with self._lock:
+                    version, frame, defeated = raid.frame_version, raid.frame, raid.defeated
+                if version != seen:
+                    seen = version
+                    yield frame
+                if defeated or await is_disconnected():
+                    break
+                try:
+                    await asyncio.wait_for(watcher.wakeup.wait(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            raid.watchers.discard(watcher)
+
+    def start(self) -> None:
+        """Запускає тік рейдів; викликається з lifespan (у циклі подій)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Остання контрольна точка, щоб не втратити шкоду між тіками
+        await self._finish_kills(self.tick())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self._by_class),
+            "hits": self.hits,
+            "checkpoints": self.checkpoints,
+            "kills": self.kills,
+        }
+
+# Глобальний хаб рейдів
+raid_hub = RaidHub()
+
+def warm_raids() -> None:
+    db = session.SessionLocal()
+    try:
+        raid_hub.load(db)
+    finally:
+        db.close()
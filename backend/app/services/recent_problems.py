@@ -0,0 +1,76 @@
+"""
+Пам'ять нещодавно показаних задач для кожного гравця (кільцевий буфер + фільтр Блума)
+"""
+
+import threading
+from array import array
+from collections import OrderedDict
+
+class RecentProblemFilter:
+    """
+    Останні RING_SIZE відбитків гравця у фіксованих ~320 байтах.
+    Фільтр Блума дає швидке "точно не бачив"; позитив підтверджується
+    кільцем, тож витіснені відбитки не дають хибних повторів.
+    """
+
+    RING_SIZE = 32       # 32 × 8 байт
+    BLOOM_BITS = 512     # 64 байти
+    HASHES = 3
+
+    __slots__ = ("_ring", "_pos", "_bloom")
+
+    def __init__(self):
+        self._ring = array("q", [-1] * self.RING_SIZE)
+        self._pos = 0
+        self._bloom = bytearray(self.BLOOM_BITS // 8)
+
+    def _bits(self, fingerprint: int):
+        # Відбиток уже є хешем - беремо з нього незалежні 9-бітні зрізи
+        for i in range(self.HASHES):
+            yield (fingerprint >> (i * 9)) & (self.BLOOM_BITS - 1)
+
+    def seen(self, fingerprint: int) -> bool:
+        for bit in self._bits(fingerprint):
+            if not self._bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return fingerprint in self._ring
+
+    def add(self, fingerprint: int) -> None:
+        self._ring[self._pos] = fingerprint
+        self._pos = (self._pos + 1) % self.RING_SIZE
+
+        if self._pos == 0:
+            # Кільце пройшло повне коло - перебудовуємо фільтр лише з актуальних
+            # відбитків, щоб він не насичувався (амортизовано O(1) на вставку)
+            self._bloom = bytearray(self.BLOOM_BITS // 8)
+            for value in self._ring:
+                self._set_bits(value)
+        else:
+            self._set_bits(fingerprint)
+
+    def _set_bits(self, fingerprint: int) -> None:
+        for bit in self._bits(fingerprint):
+            self._bloom[bit >> 3] |= 1 << (bit & 7)
+
+class RecentProblemRegistry:
+    """Фільтри активних гравців з витісненням найдавніше активних (LRU)"""
+
+    def __init__(self, max_players: int = 10000):
+        self.max_players = max_players
+        self._filters: "OrderedDict[int, RecentProblemFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def for_player(self, player_id: int) -> RecentProblemFilter:
+        with self._lock:
+            recent = self._filters.get(player_id)
+            if recent is None:
+                recent = RecentProblemFilter()
+                self._filters[player_id] = recent
+                if len(self._filters) > self.max_players:
+                    self._filters.popitem(last=False)
+            else:
+                self._filters.move_to_end(player_id)
+            return recent
+
+# Глобальний реєстр нещодавніх задач
+recent_problems = RecentProblemRegistry()
@@ -0,0 +1,195 @@
+"""
+Інтервальне повторення помилок (SM-2) з чергами за часом повторення
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.db import models, session
+from .rollup_service import _upsert
+
+# Перші два інтервали фіксовані (як у SM-2, але в масштабі гри), далі - множення на easiness
+FIRST_INTERVAL = 10 * 60
+SECOND_INTERVAL = 24 * 3600
+MIN_EASINESS = 1.3
+FAST_ANSWER_MS = 5000  # Швидка правильна відповідь - оцінка 5 замість 4
+
+ItemKey = Tuple[str, str]  # (тема, заблудження)
+
+class _Item:
+    __slots__ = ("easiness", "interval", "repetitions", "due_at")
+
+    def __init__(self, easiness: float = 2.5, interval: int = 0, repetitions: int = 0, due_at: int = 0):
+        self.easiness = easiness
+        self.interval = interval
+        self.repetitions = repetitions
+        self.due_at = due_at
+
+    def review(self, quality: int, now: int) -> None:
+        """Крок SM-2: quality 0..5, менше 3 - повтор з початку"""
+        if quality < 3:
+            self.repetitions = 0
+            self.interval = FIRST_INTERVAL
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = FIRST_INTERVAL
+            elif self.repetitions == 2:
+                self.interval = SECOND_INTERVAL
+            else:
+                self.interval = int(self.interval * self.easiness)
+        self.easiness = max(MIN_EASINESS, self.easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.due_at = now + self.interval
+
+class ReviewScheduler:
+    """
+    Елементи гравця лежать у його купі за часом повторення, а глобальна купа
+    тримає по одному запису (найближчий термін, гравець) на гравця. Записи не
+    видаляються з купи при зміні - застарілі відкидаються при читанні. Тож
+    "наступне повторення гравця" - O(log n), а "хто має повторювати зараз"
+    проходить лише по гравцях, яким уже час, без перебору всіх.
+    Оновлюється слухачем пакетного запису журналу відповідей у тій самій
+    транзакції, що й агрегати.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[int, Dict[ItemKey, _Item]] = {}
+        self._player_heaps: Dict[int, List[Tuple[int, int, ItemKey]]] = {}
+        self._due_heap: List[Tuple[int, int]] = []
+        self._earliest: Dict[int, int] = {}  # гравець -> термін його запису в глобальній купі
+        self._seq = itertools.count()
+        self.table = models.ReviewItem.__table__
+
+    def _schedule(self, player_id: int, key: ItemKey, item: _Item) -> None:
+        heap = self._player_heaps.setdefault(player_id, [])
+        heapq.heappush(heap, (item.due_at, next(self._seq), key))
+        items = self._items[player_id]
+        if len(heap) > 4 * len(items) + 8:
+            # Забагато застарілих записів - перебудовуємо купу з актуальних елементів
+            heap[:] = [(item.due_at, next(self._seq), key) for key, item in items.items()]
+            heapq.heapify(heap)
+        self._refresh_earliest(player_id)
+
+    def _peek(self, player_id: int) -> Optional[Tuple[int, ItemKey]]:
+        """Найближчий актуальний запис купи гравця; застарілі записи відкидаються"""
+        heap = self._player_heaps.get(player_id)
+        items = self._items.get(player_id, {})
+        while heap:
+            due_at, _, key = heap[0]
+            item = items.get(key)
+            if item is not None and item.due_at == due_at:
+                return due_at, key
+            heapq.heappop(heap)
+        return None
+
+    def _refresh_earliest(self, player_id: int) -> None:
+        head = self._peek(player_id)
+        if head is None:
+            self._earliest.pop(player_id, None)
+            return
+        if self._earliest.get(player_id) != head[0]:
+            self._earliest[player_id] = head[0]
+            heapq.heappush(self._due_heap, (head[0], player_id))
+
+    def apply(self, conn, events: List[Dict[str, Any]]) -> None:
+        """Слухач журналу відповідей: помилки заводять елементи, відповіді до терміну їх повторюють"""
+        changed: Dict[Tuple[int, ItemKey], _Item] = {}
+        with self._lock:
+            for event in events:
+                player_id, topic = event["player_id"], event["topic"]
+                now = event["created_at"] // 1000
+                items = self._items.setdefault(player_id, {})
+
+                if not event["is_correct"]:
+                    key = (topic, event.get("misconception") or "")
+                    item = items.get(key)
+                    if item is None:
+                        item = items[key] = _Item()
+                    item.review(1, now)
+                    changed[(player_id, key)] = item
+                    self._schedule(player_id, key, item)
+                    continue
+
+                latency = event.get("latency_ms")
+                quality = 5 if latency is not None and latency < FAST_ANSWER_MS else 4
+                # Правильна відповідь зараховується лише елементам теми, яким уже час
+                for key, item in items.items():
+                    if key[0] == topic and item.due_at <= now:
+                        item.review(quality, now)
+                        changed[(player_id, key)] = item
+                        self._schedule(player_id, key, item)
+
+        if not changed:
+            return
+        rows = [
+            {"player_id": player_id, "topic": topic, "misconception": misconception,
+             "easiness": item.easiness, "interval": item.interval,
+             "repetitions": item.repetitions, "due_at": item.due_at}
+            for (player_id, (topic, misconception)), item in changed.items()
+        ]
+        stmt = _upsert(conn, self.table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["player_id", "topic", "misconception"],
+            set_={column: stmt.excluded[column] for column in ("easiness", "interval", "repetitions", "due_at")}
+        )
+        conn.execute(stmt, rows)
+
+    def next_review(self, player_id: int) -> Optional[Dict[str, Any]]:
+        """Найближче повторення гравця (може бути й у майбутньому)"""
+        with self._lock:
+            head = self._peek(player_id)
+            if head is None:
+                return None
+            due_at, (topic, misconception) = head
+            item = self._items[player_id][(topic, misconception)]
+            return {"topic": topic, "misconception": misconception or None, "due_at": due_at,
+                    "repetitions": item.repetitions, "interval": item.interval}
+
+    def due_topic(self, player_id: int, now: Optional[float] = None) -> Optional[str]:
+        """Тема найпростроченішого елемента гравця або None"""
+        review = self.next_review(player_id)
+        if review is None or review["due_at"] > (now or time.time()):
+            return None
+        return review["topic"]
+
+    def due_players(self, now: Optional[float] = None, limit: int = 100) -> List[Tuple[int, int]]:
+        """(гравець, найраніший термін) для тих, кому вже час, від найпрострочених"""
+        now = now or time.time()
+        found, seen = [], set()
+        with self._lock:
+            while self._due_heap and self._due_heap[0][0] <= now and len(found) < limit:
+                due_at, player_id = heapq.heappop(self._due_heap)
+                if self._earliest.get(player_id) != due_at or player_id in seen:
+                    continue  # Застарілий запис - у гравця вже інший найближчий термін
+                seen.add(player_id)
+                found.append((player_id, due_at))
+            # Повертаємо знайдені записи: гравці лишаються в черзі, доки не повторять
+            for player_id, due_at in found:
+                heapq.heappush(self._due_heap, (due_at, player_id))
+        return found
+
+    def load(self) -> int:
+        """Відновлює черги з review_items при старті"""
+        db = session.SessionLocal()
+        try:
+            rows = db.query(models.ReviewItem).all()
+            with self._lock:
+                self._items, self._player_heaps, self._due_heap, self._earliest = {}, {}, [], {}
+                for row in rows:
+                    key = (row.topic, row.misconception)
+                    item = self._items.setdefault(row.player_id, {})[key] = _Item(
+                        row.easiness, row.interval, row.repetitions, row.due_at
+                    )
+                    heapq.heappush(self._player_heaps.setdefault(row.player_id, []),
+                                   (item.due_at, next(self._seq), key))
+                for player_id in self._player_heaps:
+                    self._refresh_earliest(player_id)
+            return len(rows)
+        finally:
+            db.close()
+
+# Глобальний планувальник повторень
+review_scheduler = ReviewScheduler()
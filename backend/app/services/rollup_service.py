@@ -0,0 +1,229 @@
+"""
+Інкрементальні агрегати (rollups) відповідей для аналітики вчителя
+"""
+
+import time
+from collections import defaultdict
+from typing import Dict, List, Any, Optional
+from sqlalchemy import select, delete, func, literal, and_, cast, Integer
+from sqlalchemy.dialects import sqlite, postgresql
+from app.db import models, session
+
+# Розмір кошика у секундах для кожної деталізації
+GRANULARITIES = {
+    "hour": 3600,
+    "day": 86400,
+}
+
+def _upsert(conn, table):
+    """INSERT ... ON CONFLICT для поточного діалекту"""
+    if conn.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+class RollupEngine:
+    """
+    Підтримує погодинні та щоденні агрегати (гравець × тема) і лічильники
+    заблуджень. Оновлюється інкрементально при кожному пакетному записі
+    журналу відповідей і може бути ідемпотентно перерахований з журналу.
+    """
+
+    def __init__(self):
+        self.answer_table = models.AnswerRollup.__table__
+        self.misconception_table = models.MisconceptionRollup.__table__
+
+    def _classrooms(self, conn, player_ids) -> Dict[int, Optional[str]]:
+        users = models.User.__table__
+        rows = conn.execute(
+            select(users.c.id, users.c.classroom).where(users.c.id.in_(list(player_ids)))
+        )
+        return {row.id: row.classroom for row in rows}
+
+    def apply(self, conn, events: List[Dict[str, Any]]) -> None:
+        """Додає пакет подій до агрегатів у тій самій транзакції, що й журнал"""
+        if not events:
+            return
+
+        classrooms = self._classrooms(conn, {e["player_id"] for e in events})
+        answers = defaultdict(lambda: [0, 0, 0, 0])   # attempts, correct, latency_total, latency_samples
+        misconceptions = defaultdict(int)
+
+        for event in events:
+            seconds = event["created_at"] // 1000
+            for granularity, size in GRANULARITIES.items():
+                key = (granularity, seconds - seconds % size, event["player_id"], event["topic"])
+                totals = answers[key]
+                totals[0] += 1
+                totals[1] += 1 if event["is_correct"] else 0
+                if event.get("latency_ms") is not None:
+                    totals[2] += event["latency_ms"]
+                    totals[3] += 1
+                if event.get("misconception"):
+                    misconceptions[key + (event["misconception"],)] += 1
+
+        answer_rows = [
+            {
+                "granularity": g, "bucket_start": b, "player_id": p, "topic": t,
+                "classroom": classrooms.get(p),
+                "attempts": v[0], "correct": v[1],
+                "latency_total_ms": v[2], "latency_samples": v[3],
+            }
+            for (g, b, p, t), v in answers.items()
+        ]
+        stmt = _upsert(conn, self.answer_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["granularity", "bucket_start", "player_id", "topic"],
+            set_={
+                "classroom": stmt.excluded.classroom,
+                "attempts": self.answer_table.c.attempts + stmt.excluded.attempts,
+                "correct": self.answer_table.c.correct + stmt.excluded.correct,
+                "latency_total_ms": self.answer_table.c.latency_total_ms + stmt.excluded.latency_total_ms,
+                "latency_samples": self.answer_table.c.latency_samples + stmt.excluded.latency_samples,
+            }
+        )
+        conn.execute(stmt, answer_rows)
+
+        if misconceptions:
+            misconception_rows = [
+                {
+                    "granularity": g, "bucket_start": b, "player_id": p, "topic": t,
+                    "misconception": m, "classroom": classrooms.get(p), "count": n,
+                }
+                for (g, b, p, t, m), n in misconceptions.items()
+            ]
+            stmt = _upsert(conn, self.misconception_table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["granularity", "bucket_start", "player_id", "topic", "misconception"],
+                set_={
+                    "classroom": stmt.excluded.classroom,
+                    "count": self.misconception_table.c.count + stmt.excluded.count,
+                }
+            )
+            conn.execute(stmt, misconception_rows)
+
+    def rebuild(self, since: int = None, until: int = None) -> None:
+        """
+        Перераховує агрегати з журналу для проміжку [since, until) (секунди epoch,
+        вирівнюються по добі). Ідемпотентно: повторний виклик дає той самий результат.
+        """
+        day = GRANULARITIES["day"]
+        since = 0 if since is None else since - since % day
+        until = int(time.time()) + day if until is None else until - until % day + day
+
+        events = models.AnswerEvent.__table__
+        users = models.User.__table__
+
+        with session.engine.begin() as conn:
+            # Спершу видаляємо - це бере блокування на запис до читання журналу
+            for table in (self.answer_table, self.misconception_table):
+                conn.execute(delete(table).where(and_(
+                    table.c.bucket_start >= since, table.c.bucket_start < until
+                )))
+
+            in_range = and_(events.c.created_at >= since * 1000, events.c.created_at < until * 1000)
+
+            for granularity, size in GRANULARITIES.items():
+                bucket = (events.c.created_at // 1000) // size * size
+
+                conn.execute(self.answer_table.insert().from_select(
+                    ["granularity", "bucket_start", "player_id", "topic", "classroom",
+                     "attempts", "correct", "latency_total_ms", "latency_samples"],
+                    select(
+                        literal(granularity), bucket, events.c.player_id, events.c.topic,
+                        func.max(users.c.classroom),
+                        func.count(),
+                        func.sum(cast(events.c.is_correct, Integer)),
+                        func.coalesce(func.sum(events.c.latency_ms), 0),
+                        func.count(events.c.latency_ms),
+                    )
+                    .select_from(events.outerjoin(users, users.c.id == events.c.player_id))
+                    .where(in_range)
+                    .group_by(bucket, events.c.player_id, events.c.topic)
+                ))
+
+                conn.execute(self.misconception_table.insert().from_select(
+                    ["granularity", "bucket_start", "player_id", "topic", "misconception",
+                     "classroom", "count"],
+                    select(
+                        literal(granularity), bucket, events.c.player_id, events.c.topic,
+                        events.c.misconception,
+                        func.max(users.c.classroom),
+                        func.count(),
+                    )
+                    .select_from(events.outerjoin(users, users.c.id == events.c.player_id))
+                    .where(and_(in_range, events.c.misconception.isnot(None)))
+                    .group_by(bucket, events.c.player_id, events.c.topic, events.c.misconception)
+                ))
+
+    def class_topic_summary(self, db, classroom: str, granularity: str, since: int) -> List[Dict[str, Any]]:
+        """Точність і середній час відповіді по темах для класу, по кошиках"""
+        table = self.answer_table
+        rows = db.execute(
+            select(
+                table.c.bucket_start, table.c.topic,
+                func.sum(table.c.attempts).label("attempts"),
+                func.sum(table.c.correct).label("correct"),
+                func.sum(table.c.latency_total_ms).label("latency_total_ms"),
+                func.sum(table.c.latency_samples).label("latency_samples"),
+                func.count(func.distinct(table.c.player_id)).label("players"),
+            )
+            .where(and_(
+                table.c.classroom == classroom,
+                table.c.granularity == granularity,
+                table.c.bucket_start >= since,
+            ))
+            .group_by(table.c.bucket_start, table.c.topic)
+            .order_by(table.c.bucket_start, table.c.topic)
+        )
+
+        return [
+            {
+                "bucket_start": row.bucket_start,
+                "topic": row.topic,
+                "players": row.players,
+                "attempts": row.attempts,
+                "correct": row.correct,
+                "accuracy": row.correct / row.attempts if row.attempts else 0.0,
+                "mean_response_ms": (
+                    row.latency_total_ms / row.latency_samples if row.latency_samples else None
+                ),
+            }
+            for row in rows
+        ]
+
+    def class_misconception_summary(self, db, classroom: str, granularity: str, since: int,
+                                    limit: int = 5) -> Dict[str, Any]:
+        """Найчастіші заблудження класу та їх динаміка по кошиках"""
+        table = self.misconception_table
+        base = and_(
+            table.c.classroom == classroom,
+            table.c.granularity == granularity,
+            table.c.bucket_start >= since,
+        )
+
+        top = db.execute(
+            select(table.c.misconception, func.sum(table.c.count).label("count"))
+            .where(base)
+            .group_by(table.c.misconception)
+            .order_by(func.sum(table.c.count).desc())
+            .limit(limit)
+        ).all()
+        top_types = [row.misconception for row in top]
+
+        series = db.execute(
+            select(table.c.bucket_start, table.c.misconception, func.sum(table.c.count).label("count"))
+            .where(and_(base, table.c.misconception.in_(top_types)))
+            .group_by(table.c.bucket_start, table.c.misconception)
+            .order_by(table.c.bucket_start)
+        ) if top_types else []
+
+        return {
+            "top": [{"misconception": row.misconception, "count": row.count} for row in top],
+            "series": [
+                {"bucket_start": row.bucket_start, "misconception": row.misconception, "count": row.count}
+                for row in series
+            ],
+        }
+
+# Глобальний екземпляр движка агрегатів
+rollup_engine = RollupEngine()
@@ -0,0 +1,102 @@
+"""
+Класний дашборд вчителя: векторизовані розподіли майстерності з AdaptiveAlgebraEngine
+"""
+
+from typing import Dict, List, Any, Iterable, Tuple
+import numpy as np
+from .error_analysis_engine import MisconceptionType
+from .progressive_algebra_engine import (
+    AdaptiveAlgebraEngine, LearningStage, STAGE_THRESHOLDS,
+    READY_MASTERY_THRESHOLD, READY_STREAK
+)
+
+# Порядок рівнів відповідає індексам np.searchsorted по STAGE_THRESHOLDS
+STAGE_ORDER = [LearningStage.GUIDED, LearningStage.COLLABORATIVE, LearningStage.INDEPENDENT]
+
+# Стовпці матриці помилок: усі відомі заблудження + помилки без діагнозу
+MISCONCEPTION_COLUMNS = [m.value for m in MisconceptionType] + ["unknown_error"]
+_MISCONCEPTION_INDEX = {name: i for i, name in enumerate(MISCONCEPTION_COLUMNS)}
+
+MASTERY_FIELDS = ("balance_understanding", "inverse_operations", "equation_solving")
+
+def class_mastery_dashboard(engine: AdaptiveAlgebraEngine, students: Iterable[Tuple[int, str]],
+                            bins: int = 10, top_n: int = 5) -> Dict[str, Any]:
+    """
+    Обчислює розподіли класу одним векторизованим проходом.
+    students - пари (player_id, username); учні без даних алгебри пропускаються.
+    """
+    tracked = [(pid, name, engine.student_data[pid]) for pid, name in students
+               if pid in engine.student_data]
+    n = len(tracked)
+    edges = np.linspace(0.0, 1.0, bins + 1)
+
+    if n == 0:
+        return {
+            "students_tracked": 0,
+            "bin_edges": edges.tolist(),
+            "histograms": {field: [0] * bins for field in MASTERY_FIELDS},
+            "means": {field: 0.0 for field in MASTERY_FIELDS},
+            "stage_counts": {stage.value: 0 for stage in STAGE_ORDER},
+            "top_misconceptions": [],
+            "ready_for_next_level": [],
+        }
+
+    # Колонкове представлення: (3, n) майстерності та серія правильних поспіль
+    mastery = np.empty((len(MASTERY_FIELDS), n), dtype=np.float64)
+    streak = np.empty(n, dtype=np.int32)
+    errors = np.zeros((n, len(MISCONCEPTION_COLUMNS)), dtype=np.int32)
+
+    for i, (_, _, student) in enumerate(tracked):
+        mastery[0, i] = student.balance_understanding
+        mastery[1, i] = student.inverse_operations
+        mastery[2, i] = student.equation_solving
+        streak[i] = student.consecutive_correct
+        for error_type, count in student.error_patterns.items():
+            col = _MISCONCEPTION_INDEX.get(error_type)
+            if col is not None:
+                errors[i, col] = count
+
+    # Гістограми всіх трьох вимірів
+    histograms = {
+        field: np.histogram(mastery[row], bins=edges)[0].tolist()
+        for row, field in enumerate(MASTERY_FIELDS)
+    }
+
+    # Рівні підтримки - ті самі пороги, що й у assess_student_level
+    overall = mastery.mean(axis=0)
+    stage_idx = np.searchsorted(np.asarray(STAGE_THRESHOLDS), overall, side="right")
+    stage_counts = np.bincount(stage_idx, minlength=len(STAGE_ORDER))
+
+    # Повторювані заблудження (is_recurring у _analyze_error: частота > 2)
+    totals = errors.sum(axis=0)
+    recurring_students = (errors > 2).sum(axis=0)
+    order = np.argsort(-totals, kind="stable")[:top_n]
+    top_misconceptions = [
+        {
+            "misconception": MISCONCEPTION_COLUMNS[col],
+            "count": int(totals[col]),
+            "recurring_students": int(recurring_students[col]),
+        }
+        for col in order if totals[col] > 0
+    ]
+
+    # Готовність до наступного рівня - як у _get_mastery_feedback
+    ready = (
+        (mastery[0] > READY_MASTERY_THRESHOLD)
+        & (mastery[1] > READY_MASTERY_THRESHOLD)
+        & (streak >= READY_STREAK)
+    )
+    ready_students: List[Dict[str, Any]] = [
+        {"player_id": tracked[i][0], "username": tracked[i][1]}
+        for i in np.flatnonzero(ready)
+    ]
+
+    return {
+        "students_tracked": n,
+        "bin_edges": edges.tolist(),
+        "histograms": histograms,
+        "means": {field: float(mastery[row].mean()) for row, field in enumerate(MASTERY_FIELDS)},
+        "stage_counts": {STAGE_ORDER[i].value: int(c) for i, c in enumerate(stage_counts)},
+        "top_misconceptions": top_misconceptions,
+        "ready_for_next_level": ready_students,
+    }
@@ -0,0 +1,114 @@
+"""
+Масова генерація робочих аркушів: пул процесів та потокова видача NDJSON
+"""
+
+import json
+import multiprocessing
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple, Optional
+from app.schemas.battle import Problem
+from .math_service import generate_problem
+from .geometry_service import generate_geometry_problem
+from .problem_identity import problem_operands
+
+CHUNK_SIZE = 250          # Задач на одне завдання для процесу
+MAX_PROBLEMS = 10000      # Верхня межа одного аркуша
+MAX_STALE_CHUNKS = 3      # Скільки порожніх (лише дублікати) пакетів поспіль до зупинки
+
+TOPICS = ["addition", "subtraction", "multiplication", "geometry", "algebra"]
+GEOMETRY_CHALLENGES = ["area", "perimeter", "pythagorean"]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Лінивий пул процесів на всі ядра. Процеси запускаються через spawn:
+    на момент створення вже працюють фонові потоки (answer_log, classroom_feed,
+    raid_hub), і fork міг би успадкувати замок, захоплений одним із них
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def generate_one(topic: str, level: int, challenge_type: str = None) -> Problem:
+    """Одна задача з тих самих генераторів, що й у бою (алгебра - без адаптації)"""
+    if topic == "geometry" and challenge_type:
+        return generate_geometry_problem(level, challenge_type)
+    return generate_problem(topic, level)
+
+def generate_chunk(topic: str, level: int, count: int, seed: int,
+                   challenge_type: str = None) -> List[Tuple[tuple, str]]:
+    """
+    Виконується у процесі пулу. Глобальний random процесу належить лише цьому
+    завданню, тож seed задає пакет повністю.
+    Повертає пари (операнди, готовий JSON задачі).
+    """
+    random.seed(seed)
+    chunk = []
+    for _ in range(count):
+        problem = generate_one(topic, level, challenge_type)
+        chunk.append((
+            problem_operands(problem.data),
+            json.dumps(problem.model_dump(), ensure_ascii=False)
+        ))
+    return chunk
+
+def stream_worksheet(topic: str, level: int, count: int, seed: int,
+                     challenge_type: str = None) -> Iterator[bytes]:
+    """
+    Роздає пакети по пулу процесів і віддає унікальні задачі рядками NDJSON.
+    В обробці одночасно лише вікно пакетів; результати йдуть у порядку
+    подачі, тому однаковий seed дає однаковий аркуш.
+    """
+    pool = get_pool()
+    seeds = random.Random(seed)
+    window = 2 * (os.cpu_count() or 1)
+
+    pending = deque()
+    seen = set()
+    produced = 0
+    stale_chunks = 0
+
+    def submit():
+        pending.append(pool.submit(
+            generate_chunk, topic, level, CHUNK_SIZE, seeds.getrandbits(63), challenge_type
+        ))
+
+    try:
+        for _ in range(min(window, -(-count // CHUNK_SIZE))):
+            submit()
+
+        while pending and produced < count:
+            lines = []
+            for operands, payload in pending.popleft().result():
+                if operands in seen:
+                    continue
+                seen.add(operands)
+                lines.append(f'{{"index": {produced}, "problem": {payload}}}\n')
+                produced += 1
+                if produced >= count:
+                    break
+
+            stale_chunks = 0 if lines else stale_chunks + 1
+            if lines:
+                yield "".join(lines).encode("utf-8")
+
+            # Простір задач вичерпано - далі лише дублікати
+            if stale_chunks >= MAX_STALE_CHUNKS:
+                break
+            if produced < count:
+                submit()
+    finally:
+        for future in pending:
+            future.cancel()
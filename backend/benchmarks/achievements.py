@@ -0,0 +1,36 @@
+"""
+Бенчмарк рушія досягнень: вартість однієї відповіді залежно від кількості правил.
+
+Правила індексуються за (подія, тема), тож додаткові правила інших тем
+не мають впливати на час. Запуск з каталогу backend:
+    python -m benchmarks.achievements [кількість_відповідей]
+"""
+
+import random
+import sys
+import time
+from app.services.achievements import ANSWER, AchievementEngine, Rule, TOPICS, default_rules
+
+def build_engine(extra_rules: int) -> AchievementEngine:
+    rules = default_rules()
+    for number in range(extra_rules):
+        topic = TOPICS[number % len(TOPICS)]
+        # Недосяжні пороги - правила перевіряються, але не відкриваються
+        rules.append(Rule(f"bench_{number}", "bench", "bench", ANSWER, "correct", 10**9 + number, topic))
+    return AchievementEngine(rules)
+
+def bench(engine: AchievementEngine, number: int) -> float:
+    rng = random.Random(7)
+    events = [(rng.randrange(200), rng.choice(TOPICS), rng.random() < 0.7) for _ in range(number)]
+    started = time.perf_counter()
+    for player_id, topic, is_correct in events:
+        engine.record_answer(player_id, topic, is_correct, 25, 1, "Chaos Number", 50, 3, 3)
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"Відповідей: {number}")
+    for extra in (0, 100, 1000):
+        engine = build_engine(extra)
+        seconds = bench(engine, number)
+        print(f"  правил {len(engine.rules):>5}: {seconds / number * 1e6:6.2f} мкс на відповідь")
@@ -0,0 +1,77 @@
+"""
+Бенчмарк вартості однієї відповіді: REST POST /battle/answer проти кадру WebSocket.
+
+Працює на тимчасовій SQLite-базі з одним ворогом (додавання), щоб
+обидва шляхи виконували однакову роботу. Запуск з каталогу backend:
+    python -m benchmarks.battle_transport [кількість_відповідей]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# База створюється відносно поточного каталогу - переходимо у тимчасовий до імпорту застосунку
+sys.path.insert(0, os.getcwd())
+os.chdir(tempfile.mkdtemp(prefix="mathmancers-bench-"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+from app import auth  # noqa: E402
+from app.core.ratelimit import answer_limiter, generation_limiter  # noqa: E402
+from app.db import models, session  # noqa: E402
+
+def prepare_db() -> str:
+    db = session.SessionLocal()
+    try:
+        db.query(models.Enemy).filter(models.Enemy.math_topic != "addition").delete()
+        if not db.query(models.User).filter(models.User.username == "bench").first():
+            db.add(models.User(username="bench", email="bench@example.com", hashed_password="x"))
+        db.commit()
+    finally:
+        db.close()
+    return auth.create_access_token({"sub": "bench"})
+
+def report(label: str, seconds: float, number: int, baseline: float = None):
+    speedup = f"  x{baseline / seconds:.1f}" if baseline else ""
+    print(f"  {label:<28} {seconds / number * 1e3:7.3f} мс на відповідь{speedup}")
+
+def bench_rest(client: TestClient, headers: dict, number: int) -> float:
+    state = client.get("/api/v1/battle/start", headers=headers).json()
+    enemy_id, problem = state["enemy"]["id"], state["problem"]
+
+    started = time.perf_counter()
+    for _ in range(number):
+        result = client.post("/api/v1/battle/answer", headers=headers, json={
+            "enemy_id": enemy_id, "problem": problem, "answer": problem["answer"]
+        }).json()
+        problem = result["new_problem"]
+    return time.perf_counter() - started
+
+def bench_socket(client: TestClient, token: str, number: int) -> float:
+    with client.websocket_connect(f"/api/v1/battle/ws?token={token}") as socket:
+        problem = socket.receive_json()["state"]["problem"]
+
+        started = time.perf_counter()
+        for frame_id in range(number):
+            socket.send_json({"type": "answer", "id": frame_id, "answer": problem["answer"]})
+            problem = socket.receive_json()["result"]["new_problem"]
+        return time.perf_counter() - started
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    # Бенчмарк - один гравець, тож ліміти частоти лише заважали б
+    answer_limiter.rate = answer_limiter.burst = generation_limiter.rate = generation_limiter.burst = 1e9
+
+    with TestClient(main.app) as client:
+        token = prepare_db()
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Прогрів обох шляхів
+        bench_rest(client, headers, 20)
+        bench_socket(client, token, 20)
+
+        print(f"Відповідей: {number} (правильні, щоразу нова задача)")
+        rest = bench_rest(client, headers, number)
+        report("REST POST /battle/answer", rest, number)
+        report("WebSocket кадр answer", bench_socket(client, token, number), number, rest)
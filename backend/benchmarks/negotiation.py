@@ -0,0 +1,50 @@
+"""
+Бенчмарк кодувань відповідей бою: байти в мережі та час кодування
+для JSON / MessagePack, без стиснення та з gzip.
+
+Запуск з каталогу backend:
+    python -m benchmarks.negotiation [кількість_повторів]
+"""
+
+import gzip
+import sys
+import timeit
+from app.core.negotiation import COMPRESSION_LEVEL, COMPRESSION_THRESHOLD, msgpack
+from app.core.responses import dumps
+from app.schemas.battle import BattleState
+from app.services.math_service import generate_problem
+
+def build_payload(topic: str) -> dict:
+    return BattleState(
+        player_stats={"hp": 100, "max_hp": 100, "level": 3, "xp": 250, "math_power": 12,
+                      "owner": {"username": "bench", "email": "bench@example.com"}},
+        enemy={"id": 1, "name": "Бенчмарк", "max_hp": 100, "math_topic": topic},
+        enemy_current_hp=100,
+        problem=generate_problem(topic, 3, player_id=1),
+    ).model_dump()
+
+def encoders():
+    yield "json", dumps
+    yield "json+gzip", lambda content: gzip.compress(dumps(content), compresslevel=COMPRESSION_LEVEL)
+    if msgpack is not None:
+        yield "msgpack", lambda content: msgpack.packb(content, use_bin_type=True)
+        yield "msgpack+gzip", lambda content: gzip.compress(
+            msgpack.packb(content, use_bin_type=True), compresslevel=COMPRESSION_LEVEL
+        )
+
+def bench(topic: str, number: int):
+    payload = build_payload(topic)
+    baseline_size = len(dumps(payload))
+    print(f"BattleState ({topic}), поріг стиснення {COMPRESSION_THRESHOLD} байт:")
+
+    for name, encode in encoders():
+        size = len(encode(payload))
+        seconds = timeit.timeit(lambda: encode(payload), number=number)
+        print(f"  {name:<14} {size:7d} байт ({size / baseline_size:6.1%})  {seconds / number * 1e6:8.1f} мкс")
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    if msgpack is None:
+        print("msgpack не встановлено - вимірюємо лише JSON\n")
+    for topic in ("addition", "geometry", "algebra"):
+        bench(topic, number)
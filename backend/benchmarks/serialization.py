@@ -0,0 +1,92 @@
+"""
+Бенчмарк серіалізації відповідей бою: стандартний шлях FastAPI проти швидкого.
+
+Запуск з каталогу backend:
+    python -m benchmarks.serialization [кількість_повторів]
+"""
+
+import json
+import sys
+import timeit
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from app.core.responses import FastJSONResponse, orjson
+from app.schemas.battle import BattleState, Problem, BATTLE_STATE_PROFILES
+from app.services.math_service import generate_problem
+
+def build_state(topic: str) -> BattleState:
+    return BattleState(
+        player_stats={"hp": 100, "max_hp": 100, "level": 3, "xp": 250, "math_power": 12,
+                      "owner": {"username": "bench", "email": "bench@example.com"}},
+        enemy={"id": 1, "name": "Бенчмарк", "max_hp": 100, "math_topic": topic},
+        enemy_current_hp=100,
+        problem=generate_problem(topic, 3, player_id=1),
+    )
+
+def report(label: str, seconds: float, number: int, baseline: float = None):
+    per_call = seconds / number * 1e6
+    speedup = f"  x{baseline / seconds:.1f}" if baseline else ""
+    print(f"  {label:<42} {per_call:9.1f} мкс{speedup}")
+
+def bench_construction(number: int):
+    sample = generate_problem("algebra", 3, player_id=1)
+    kwargs = {"display_text": sample.display_text, "data": sample.data, "answer": sample.answer}
+
+    # Для Problem з data: dict[str, Any] валідація в pydantic-core дешевша
+    # за пітонівський model_construct, тому генератори лишаються на Problem(...)
+    print("Створення Problem (алгебра):")
+    validated = timeit.timeit(lambda: Problem(**kwargs), number=number)
+    constructed = timeit.timeit(lambda: Problem.model_construct(**kwargs), number=number)
+    report("Problem(...) з валідацією", validated, number)
+    report("Problem.model_construct(...)", constructed, number, validated)
+
+def bench_serialization(topic: str, number: int):
+    state = build_state(topic)
+    lean = BATTLE_STATE_PROFILES["lean"]
+
+    def stock():
+        # Те, що робить FastAPI з response_model: дамп, повторна валідація, jsonable_encoder, json
+        revalidated = BattleState.model_validate(state.model_dump())
+        return JSONResponse(jsonable_encoder(revalidated)).body
+
+    def fast_full():
+        return FastJSONResponse(state.model_dump()).body
+
+    def fast_lean():
+        return lean.render(state).body
+
+    print(f"Серіалізація BattleState ({topic}, {len(stock())} -> {len(fast_lean())} байт у lean):")
+    baseline = timeit.timeit(stock, number=number)
+    report("response_model + JSONResponse", baseline, number)
+    report("FastJSONResponse, усі поля", timeit.timeit(fast_full, number=number), number, baseline)
+    report("FastJSONResponse, профіль lean", timeit.timeit(fast_lean, number=number), number, baseline)
+
+def bench_endpoints(number: int):
+    state = build_state("algebra")
+    app = FastAPI()
+
+    @app.get("/stock", response_model=BattleState)
+    def stock():
+        return state
+
+    @app.get("/fast", response_model=BattleState)
+    def fast():
+        return FastJSONResponse(state.model_dump())
+
+    client = TestClient(app)
+    assert json.loads(client.get("/stock").content) == json.loads(client.get("/fast").content)
+
+    print("Повний запит через TestClient (алгебра):")
+    baseline = timeit.timeit(lambda: client.get("/stock"), number=number)
+    report("GET з response_model", baseline, number)
+    report("GET з FastJSONResponse", timeit.timeit(lambda: client.get("/fast"), number=number), number, baseline)
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Кодувальник: {'orjson' if orjson else 'json (orjson не встановлено)'}, повторів: {number}\n")
+    bench_construction(number)
+    for topic in ("addition", "geometry", "algebra"):
+        bench_serialization(topic, number)
+    bench_endpoints(max(1, number // 10))
@@ -1,8 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from sqlalchemy.orm.exc import StaleDataError
 from contextlib import asynccontextmanager
 from app.db import models, session
+from app.db.migrations import upgrade_schema
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1.endpoints import user, auth, battle, player
+from app.api.v1.endpoints import user, auth, battle, player, analytics, export, worksheet, metrics, leaderboard, raid, daily
+from app.core.responses import FastJSONResponse
+from app.services.answer_log import answer_log
+from app.services.rollup_service import rollup_engine
+from app.services.worksheet_service import shutdown_pool
+from app.services.math_service import warm_difficulty_index
+from app.services.hint_service import warm_hint_catalog
+from app.services.classroom_feed import classroom_feed
+from app.services.leaderboard import warm_leaderboards
+from app.services.raid_service import raid_hub, warm_raids
+from app.services.daily_challenge import daily_challenge
+from app.services.achievements import warm_achievements
+from app.services.review_scheduler import review_scheduler
 
 # --- ЛОГІКА ІНІЦІАЛІЗАЦІЇ ---
 def init_db():
@@ -10,6 +24,8 @@ def init_db():
     try:
         # Створюємо таблиці
         models.Base.metadata.create_all(bind=session.engine)
+        # Нові колонки в таблицях, створених попередніми версіями
+        upgrade_schema(session.engine)
 
         # Створюємо ворогів, якщо їх немає
         if db.query(models.Enemy).count() == 0:
@@ -33,12 +49,35 @@ async def lifespan(app: FastAPI):
     # Код, що виконується при старті
     print("Application startup...")
     init_db()
+    warm_difficulty_index()
+    warm_hint_catalog()
+    warm_leaderboards()
+    warm_raids()
+    warm_achievements()
+    review_scheduler.load()
+    answer_log.add_flush_listener(rollup_engine.apply)
+    answer_log.add_flush_listener(review_scheduler.apply)
+    answer_log.start()
+    classroom_feed.start()
+    raid_hub.start()
+    daily_challenge.start()
     yield
     # Код, що виконується при зупинці (якщо потрібно)
+    await raid_hub.stop()
+    await classroom_feed.stop()
+    daily_challenge.stop()
+    answer_log.stop()
+    shutdown_pool()
     print("Application shutdown...")
 
 # Ініціалізуємо FastAPI з нашим життєвим циклом
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# --- ОБРОБНИКИ ПОМИЛОК ---
+@app.exception_handler(StaleDataError)
+def stale_data_handler(request: Request, exc: StaleDataError):
+    # Паралельний запит уже змінив ту саму версію запису
+    return FastJSONResponse(status_code=409, content={"detail": "Record was modified concurrently, retry the request"})
 
 # --- MIDDLEWARE (CORS) ---
 origins = [
@@ -50,6 +89,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Інакше браузер не дасть клієнту з іншого origin прочитати ці заголовки
+    expose_headers=["Retry-After", "X-Worksheet-Seed"],
 )
 
 # --- ПІДКЛЮЧЕННЯ РОУТЕРІВ ---
@@ -57,6 +98,13 @@ app.include_router(user.router, prefix="/api/v1", tags=["users"])
 app.include_router(auth.router, prefix="/api/v1", tags=["auth"])
 app.include_router(battle.router, prefix="/api/v1", tags=["battle"])
 app.include_router(player.router, prefix="/api/v1", tags=["player"])
+app.include_router(analytics.router, prefix="/api/v1", tags=["analytics"])
+app.include_router(export.router, prefix="/api/v1", tags=["export"])
+app.include_router(worksheet.router, prefix="/api/v1", tags=["worksheets"])
+app.include_router(metrics.router, prefix="/api/v1", tags=["metrics"])
+app.include_router(leaderboard.router, prefix="/api/v1", tags=["leaderboard"])
+app.include_router(raid.router, prefix="/api/v1", tags=["raids"])
+app.include_router(daily.router, prefix="/api/v1", tags=["daily"])
 
 # --- КОРЕНЕВИЙ ЕНДПОІНТ ---
 @app.get("/")
@@ -0,0 +1,42 @@
+"""
+Адміністративні команди з командного рядка (з папки backend):
+
+    python manage.py set-role <username> <student|teacher|admin>
+
+Так призначається перший адміністратор; далі ролі змінює PUT /api/v1/users/{id}/role.
+"""
+
+import argparse
+import sys
+from typing import get_args
+from app.db import models, session
+from app.db.migrations import upgrade_schema
+from app.schemas.user import Role
+
+def set_role(username: str, role: str) -> int:
+    models.Base.metadata.create_all(bind=session.engine)
+    upgrade_schema(session.engine)
+    db = session.SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.username == username).first()
+        if user is None:
+            print(f"User not found: {username}", file=sys.stderr)
+            return 1
+        user.role = role
+        db.commit()
+        print(f"{username}: {role}")
+        return 0
+    finally:
+        db.close()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="MathMancers admin commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    set_role_parser = commands.add_parser("set-role", help="Assign a role to a user")
+    set_role_parser.add_argument("username")
+    set_role_parser.add_argument("role", choices=get_args(Role))
+    args = parser.parse_args()
+    return set_role(args.username, args.role)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,11 @@
 import axios from 'axios'
 import { useAuthStore } from '@/stores/auth'
 
+export const API_BASE_URL = 'http://127.0.0.1:8000/api/v1'
+
 // Створюємо екземпляр axios з базовими налаштуваннями
 const apiClient = axios.create({
-  baseURL: 'http://127.0.0.1:8000/api/v1',
+  baseURL: API_BASE_URL,
   headers: {
     'Content-Type': 'application/json',
   },
@@ -23,6 +25,50 @@ apiClient.interceptors.request.use(
   },
 )
 
+const ANSWER_RETRIES = 2
+
+const RETRYABLE_STATUSES = [429, 503]
+
+// Повторює запит при мережевих збоях та при 429/503 (з урахуванням Retry-After)
+const postWithRetry = async (url, payload, idempotencyKey) => {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await apiClient.post(url, payload, {
+        headers: { 'Idempotency-Key': idempotencyKey },
+      })
+    } catch (error) {
+      const status = error.response?.status
+      const retryable = !error.response || RETRYABLE_STATUSES.includes(status)
+      if (!retryable || attempt >= ANSWER_RETRIES) {
+        throw error
+      }
+      const retryAfter = Number(error.response?.headers?.['retry-after'])
+      const delay = retryAfter > 0 ? retryAfter * 1000 : 500 * (attempt + 1)
+      await new Promise((resolve) => setTimeout(resolve, delay))
+    }
+  }
+}
+
+// crypto.randomUUID є лише в secure context (https або localhost),
+// тож при відкритті по IP у локальній мережі збираємо UUID v4 вручну
+function newIdempotencyKey() {
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID()
+  }
+  const bytes = new Uint8Array(16)
+  if (typeof crypto !== 'undefined' && typeof crypto.getRandomValues === 'function') {
+    crypto.getRandomValues(bytes)
+  } else {
+    for (let i = 0; i < bytes.length; i++) {
+      bytes[i] = Math.floor(Math.random() * 256) ^ ((Date.now() >> (i % 4) * 8) & 0xff)
+    }
+  }
+  bytes[6] = (bytes[6] & 0x0f) | 0x40
+  bytes[8] = (bytes[8] & 0x3f) | 0x80
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('')
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`
+}
+
 // Експортуємо функції для кожного типу запиту
 export default {
   startBattle() {
@@ -30,17 +76,19 @@ export default {
   },
 
   // ОНОВЛЕНА функція submitAnswer з підтримкою операцій для алгебри
-  submitAnswer(enemyId, problemObject, answer = null, operation = null) {
+  submitAnswer(enemyId, problemObject, answer = null, operation = null, responseTimeMs = null) {
     const payload = {
       enemy_id: enemyId,
       problem: problemObject,
       answer: answer,
       operation: operation,
+      response_time_ms: responseTimeMs,
     }
 
     console.log('Sending to server:', payload) // Для налагодження
 
-    return apiClient.post('/battle/answer', payload)
+    // Один ключ на всі повтори: сервер не зарахує ту саму відповідь двічі
+    return postWithRetry('/battle/answer', payload, newIdempotencyKey())
   },
 
   getPlayerStats() {
@@ -0,0 +1,83 @@
+import { API_BASE_URL } from '@/services/api'
+
+// Канал бою через WebSocket: один раз автентифікуємось, далі лише короткі кадри
+export class BattleSocket {
+  constructor(token) {
+    this.token = token
+    this.socket = null
+    this.nextId = 1
+    this.pending = new Map()
+    this.initialState = null
+  }
+
+  get isOpen() {
+    return this.socket?.readyState === WebSocket.OPEN
+  }
+
+  // Підключається і повертає початковий стан бою
+  connect() {
+    const url = `${API_BASE_URL.replace(/^http/, 'ws')}/battle/ws?token=${encodeURIComponent(this.token)}`
+
+    return new Promise((resolve, reject) => {
+      this.socket = new WebSocket(url)
+
+      this.socket.onmessage = (event) => {
+        const frame = JSON.parse(event.data)
+
+        if (frame.id === null && frame.type === 'state') {
+          resolve(frame.state)
+          return
+        }
+
+        const request = this.pending.get(frame.id)
+        if (!request) return
+        this.pending.delete(frame.id)
+
+        if (frame.type === 'error') {
+          request.reject(frame)
+        } else {
+          request.resolve(frame.type === 'state' ? frame.state : frame.result)
+        }
+      }
+
+      this.socket.onclose = () => {
+        reject(new Error('Battle socket closed'))
+        for (const request of this.pending.values()) {
+          request.reject(new Error('Battle socket closed'))
+        }
+        this.pending.clear()
+      }
+    })
+  }
+
+  request(frame) {
+    if (!this.isOpen) {
+      return Promise.reject(new Error('Battle socket is not connected'))
+    }
+
+    const id = this.nextId++
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { resolve, reject })
+      this.socket.send(JSON.stringify({ ...frame, id }))
+    })
+  }
+
+  // Задача вже на сервері - надсилаємо лише відповідь або операцію
+  answer(answer = null, operation = null, responseTimeMs = null) {
+    return this.request({
+      type: 'answer',
+      answer,
+      operation,
+      response_time_ms: responseTimeMs,
+    })
+  }
+
+  start() {
+    return this.request({ type: 'start' })
+  }
+
+  close() {
+    this.socket?.close()
+    this.socket = null
+  }
+}